@@ -0,0 +1,248 @@
+"""Native ASGI entry point with async handlers for the hot endpoints.
+
+main:asgi_app wraps the whole Flask app in WsgiToAsgi, which runs every
+request on a thread pool, so it adds no concurrency over sync workers. Here
+the busy routes are served directly on the event loop:
+
+- POST /predict parses the form or JSON body, validates and scores on the
+  event loop; for a typical body that is a few microseconds of CPU. Bodies
+  larger than ASYNC_OFFLOAD_BYTES, and every request when
+  PREDICTION_CACHE=sqlite (the cached assessment reads and writes a
+  database), go through the same steps on a worker thread instead.
+- POST /predict/batch parses and scores on the event loop up to
+  ASYNC_OFFLOAD_BYTES of body (about 60 JSON or 400 CSV rows), and on a worker
+  thread above it.
+- POST /send-email parses the form (and any uploaded file), composes the
+  message (rendering the PDF report) and stores it in main.email_queue's
+  job table, all on a worker thread. SMTP delivery runs on the queue's
+  sender threads, so the event loop never waits on the mail server.
+
+Admission control (limits.py) is applied to /predict/batch and /send-email
+before their body is read, as in the Flask app, and to /predict once its
+small body is in, so a stalled upload never holds a /predict slot. It runs
+on a worker thread when the rate limits use the shared SQLite buckets.
+Every other route falls through to the Flask app via WsgiToAsgi.
+
+Serve with `uvicorn asgi:app` or `WORKER_CLASS=uvicorn gunicorn -c gunicorn_conf.py`.
+"""
+import asyncio
+import io
+import json
+import logging
+import os
+import time
+from urllib.parse import parse_qs
+
+from asgiref.wsgi import WsgiToAsgi
+from werkzeug.formparser import parse_form_data
+
+import main
+from limits import client_id, rejection
+from metrics import ADMISSION_REJECTIONS, REQUESTS, REQUEST_LATENCY, PREDICT_STAGE_LATENCY
+from schema import error_body, load_json_object
+
+logger = logging.getLogger(__name__)
+
+# Bodies larger than this are parsed and scored on a worker thread instead of the event loop
+ASYNC_OFFLOAD_BYTES = int(os.getenv("ASYNC_OFFLOAD_BYTES", str(16 * 1024)))
+# Largest request body read by the native handlers, as in the Flask app
+MAX_BODY_BYTES = main.MAX_REQUEST_BYTES
+
+# Calls that can block on SQLite in this configuration run on a worker thread
+OFFLOAD_ADMISSION = main.admission.blocking
+OFFLOAD_ASSESS = main.prediction_cache.backend == 'sqlite'
+
+flask_app = WsgiToAsgi(main.app)
+
+
+async def to_thread(func, *args):
+    """Run a blocking call on the loop's default thread pool"""
+    return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+
+class RequestTooLarge(Exception):
+    pass
+
+
+async def read_body(receive, limit=MAX_BODY_BYTES):
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > limit:
+            raise RequestTooLarge(f"Request body exceeds {limit} bytes")
+        chunks.append(chunk)
+        if not message.get('more_body', False):
+            break
+    return b''.join(chunks)
+
+
+def header(scope, name):
+    for key, value in scope['headers']:
+        if key == name:
+            return value.decode('latin-1')
+    return ''
+
+
+def parse_form(scope, body):
+    """Parse a urlencoded or multipart body into (form, files) MultiDicts"""
+    environ = {
+        'REQUEST_METHOD': 'POST',
+        'CONTENT_TYPE': header(scope, b'content-type'),
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': io.BytesIO(body),
+    }
+    _, form, files = parse_form_data(environ, max_form_memory_size=main.app.config['MAX_FORM_MEMORY_SIZE'])
+    return form, files
+
+
+async def send_json(send, status, body, headers=()):
+    payload = json.dumps(body).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(payload)).encode()),
+                    *headers],
+    })
+    await send({'type': 'http.response.body', 'body': payload})
+    return status
+
+
+def assess_body(scope, body):
+    with PREDICT_STAGE_LATENCY.time(stage='parse'):
+        if 'json' in header(scope, b'content-type'):
+            try:
+                values = load_json_object(body)
+            except ValueError as parse_error:
+                return 400, {'error': f"Could not parse JSON body: {str(parse_error)}"}
+        else:
+            values, _ = parse_form(scope, body)
+    with PREDICT_STAGE_LATENCY.time(stage='validate'):
+        features, errors = main.parse_features(values)
+    if errors:
+        return 400, error_body(errors)
+    return 200, main.assess(features)
+
+
+async def predict(scope, body):
+    if OFFLOAD_ASSESS or len(body) > ASYNC_OFFLOAD_BYTES:
+        return await to_thread(assess_body, scope, body)
+    return assess_body(scope, body)
+
+
+def batch_result(body, is_json, attribution):
+    return main.score_batch(main.parse_batch_rows(body, is_json), attribution)
+
+
+async def predict_batch(scope, body):
+    try:
+        is_json = 'json' in header(scope, b'content-type')
+        query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+        attribution = main.wants_attribution(query.get('attribution', [''])[0])
+        if len(body) > ASYNC_OFFLOAD_BYTES:
+            # Keep the event loop free while a large batch is parsed and scored
+            return 200, await to_thread(batch_result, body, is_json, attribution)
+        return 200, batch_result(body, is_json, attribution)
+    except main.BatchError as batch_error:
+        return batch_error.status, {'error': str(batch_error)}
+
+
+def queue_email(scope, body):
+    form, files = parse_form(scope, body)
+    msg, doctor_email = main.compose_email(form, files)
+    return main.email_queue.submit(main.EMAIL_SENDER, doctor_email, msg), doctor_email
+
+
+async def send_email(scope, body):
+    try:
+        # Parsing the form, rendering the PDF and the job table insert all block
+        job_id, doctor_email = await to_thread(queue_email, scope, body)
+        logger.info(f"Email job {job_id} queued for {doctor_email}")
+        return 202, main.email_accepted(job_id, doctor_email)
+    except main.InvalidEmailRequest as request_error:
+        return 400, {'error': str(request_error), 'success': False}
+    except main.AttachmentTooLarge as size_error:
+        return 413, {'error': str(size_error), 'success': False}
+
+
+# (method, path) -> (metrics endpoint label, handler)
+ROUTES = {
+    ('POST', '/predict'): ('predict', predict),
+    ('POST', '/predict/batch'): ('predict_batch', predict_batch),
+    ('POST', '/send-email'): ('send_email', send_email),
+}
+
+
+# Admitted once their body is in. A /predict body is small, and a client
+# stalling mid-upload must not hold a concurrency slot; the slow endpoints
+# are still turned away before their (large) body is read.
+ADMIT_AFTER_BODY = {'predict'}
+
+
+async def admit(endpoint, client):
+    if OFFLOAD_ADMISSION:
+        return await to_thread(main.admission.admit, endpoint, client)
+    return main.admission.admit(endpoint, client)
+
+
+async def reject(send, endpoint, status, retry_after, start):
+    ADMISSION_REJECTIONS.inc(endpoint=endpoint, reason='rate' if status == 429 else 'concurrency')
+    body, retry_after = rejection(status, retry_after)
+    await send_json(send, status, body, [(b'retry-after', retry_after.encode())])
+    REQUESTS.inc(endpoint=endpoint, status=f"{status // 100}xx")
+    REQUEST_LATENCY.observe(time.perf_counter() - start, endpoint=endpoint)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    route = ROUTES.get((scope.get('method'), scope.get('path'))) if scope['type'] == 'http' else None
+    if route is None:
+        return await flask_app(scope, receive, send)
+
+    endpoint, handler = route
+    start = time.perf_counter()
+    client = client_id((scope.get('client') or ('',))[0], lambda name: header(scope, name.lower().encode('latin-1')))
+    ticket = None
+    if endpoint not in ADMIT_AFTER_BODY:
+        status, ticket = await admit(endpoint, client)
+        if status is not None:
+            # Rejected before the body is read
+            return await reject(send, endpoint, status, ticket, start)
+    try:
+        limit = main.MAX_BATCH_BYTES if endpoint == 'predict_batch' else MAX_BODY_BYTES
+        length = header(scope, b'content-length')
+        if length.isdigit() and int(length) > limit:
+            # Declared too long: refuse without reading any of it
+            raise RequestTooLarge(f"Request body exceeds {limit} bytes")
+        body = await read_body(receive, limit)
+        if endpoint in ADMIT_AFTER_BODY:
+            status, ticket = await admit(endpoint, client)
+            if status is not None:
+                retry_after, ticket = ticket, None
+                return await reject(send, endpoint, status, retry_after, start)
+        status, body = await handler(scope, body)
+    except RequestTooLarge as size_error:
+        status, body = 413, {'error': str(size_error)}
+    except Exception as e:
+        logger.error(f"Error handling {scope['path']}: {str(e)}", exc_info=True)
+        status, body = 500, {'error': str(e)}
+    finally:
+        main.admission.release(ticket)
+    await send_json(send, status, body)
+    REQUESTS.inc(endpoint=endpoint, status=f"{status // 100}xx")
+    REQUEST_LATENCY.observe(time.perf_counter() - start, endpoint=endpoint)
@@ -0,0 +1,197 @@
+"""Fingerprinted, precompressed static assets and the cached index page.
+
+The build step copies every file under static/ to static/dist/ under a name
+that carries a hash of its content (js/script.js -> js/script.1f0c9a2b4d5e.js),
+writes a .gz and, when the brotli package is installed, a .br version next
+to it, and records the mapping in static/dist/manifest.json:
+
+    python assets.py
+
+Building is idempotent and cheap when nothing changed (outputs are named by
+content, so existing ones are kept), and the app runs it at import too, so a
+deploy never serves stale files. Old fingerprinted files are left in place
+for pages still referencing them.
+
+In templates, url_for('static', filename=...) then points at /assets/<the
+fingerprinted name>. Those responses come from memory, in the best encoding
+the client accepts, with a one-year immutable Cache-Control and an ETag.
+The rendered index page is kept in memory the same way and revalidated with
+its ETag. STATIC_ASSETS=off keeps the plain /static/ URLs and renders the
+index on every request, for editing templates and scripts without restarts.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+from collections import namedtuple
+
+from flask import Response, url_for
+
+from state import write_atomic
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, 'static')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+MANIFEST = 'manifest.json'
+
+# Fingerprinted names change with the content, so browsers may keep them forever
+IMMUTABLE = 'public, max-age=31536000, immutable'
+# The index keeps its URL; browsers revalidate it with the ETag on every visit
+REVALIDATE = 'no-cache'
+
+# Preferred first when the client accepts several equally
+ENCODINGS = ('br', 'gzip', 'identity') if brotli is not None else ('gzip', 'identity')
+SUFFIXES = {'br': '.br', 'gzip': '.gz', 'identity': ''}
+
+# Smaller files gain nothing from compression
+MIN_COMPRESS_BYTES = 256
+
+
+def compress(data):
+    """The encodings worth serving for data, as {encoding: bytes}"""
+    variants = {'identity': data}
+    if len(data) >= MIN_COMPRESS_BYTES:
+        # mtime=0 keeps the output, and so the build, reproducible
+        variants['gzip'] = gzip.compress(data, compresslevel=9, mtime=0)
+        if brotli is not None:
+            variants['br'] = brotli.compress(data, quality=11)
+    return variants
+
+
+def fingerprinted_name(path, data):
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+
+
+def build(static_dir=STATIC_DIR, dist_dir=DIST_DIR):
+    """Write fingerprinted and compressed copies of static_dir into dist_dir; return the manifest"""
+    manifest = {}
+    for root, dirs, files in os.walk(static_dir):
+        if os.path.abspath(root) == os.path.abspath(static_dir) and os.path.basename(dist_dir) in dirs:
+            dirs.remove(os.path.basename(dist_dir))
+        for name in sorted(files):
+            if name.startswith('.'):
+                continue
+            source = os.path.join(root, name)
+            path = os.path.relpath(source, static_dir).replace(os.sep, '/')
+            with open(source, 'rb') as f:
+                data = f.read()
+            target = fingerprinted_name(path, data)
+            manifest[path] = target
+            output = os.path.join(dist_dir, target)
+            expected = ENCODINGS if len(data) >= MIN_COMPRESS_BYTES else ('identity',)
+            if all(os.path.exists(output + SUFFIXES[encoding]) for encoding in expected):
+                continue
+            for encoding, content in compress(data).items():
+                write_atomic(output + SUFFIXES[encoding], content)
+    # Left alone when unchanged, so a prebuilt dist/ also works on a read-only checkout
+    encoded = json.dumps(manifest, indent=2, sort_keys=True).encode()
+    try:
+        with open(os.path.join(dist_dir, MANIFEST), 'rb') as f:
+            unchanged = f.read() == encoded
+    except FileNotFoundError:
+        unchanged = False
+    if not unchanged:
+        write_atomic(os.path.join(dist_dir, MANIFEST), encoded)
+    return manifest
+
+
+Variant = namedtuple('Variant', 'body etag')
+
+
+class Asset:
+    """One response body in every available encoding, served with ETag/304"""
+
+    def __init__(self, variants, mimetype, cache_control, tag):
+        self.mimetype = mimetype
+        self.cache_control = cache_control
+        self.variants = {encoding: Variant(body, f"{tag}-{encoding}") for encoding, body in variants.items()}
+
+    @classmethod
+    def from_bytes(cls, data, mimetype, cache_control):
+        return cls(compress(data), mimetype, cache_control, hashlib.sha256(data).hexdigest()[:16])
+
+    def response(self, request):
+        encoding = request.accept_encodings.best_match([e for e in ENCODINGS if e in self.variants]) or 'identity'
+        variant = self.variants[encoding]
+        if request.if_none_match.contains(variant.etag):
+            response = Response(status=304)
+        else:
+            response = Response(variant.body, mimetype=self.mimetype)
+            if encoding != 'identity':
+                response.headers['Content-Encoding'] = encoding
+        response.set_etag(variant.etag)
+        response.headers['Cache-Control'] = self.cache_control
+        response.headers['Vary'] = 'Accept-Encoding'
+        return response
+
+
+class StaticAssets:
+    """The fingerprinted files of a build, held in memory"""
+
+    def __init__(self, manifest=None, dist_dir=DIST_DIR):
+        self.manifest = manifest or {}
+        self.files = {}
+        for target in self.manifest.values():
+            variants = {}
+            for encoding, suffix in SUFFIXES.items():
+                if os.path.exists(os.path.join(dist_dir, target) + suffix):
+                    with open(os.path.join(dist_dir, target) + suffix, 'rb') as f:
+                        variants[encoding] = f.read()
+            mimetype = mimetypes.guess_type(target)[0] or 'application/octet-stream'
+            # The name carries the content hash, so it makes a fine entity tag
+            self.files[target] = Asset(variants, mimetype, IMMUTABLE, target)
+
+    @property
+    def enabled(self):
+        return bool(self.manifest)
+
+    @classmethod
+    def from_env(cls):
+        """Build (if anything changed) and load static/dist, unless STATIC_ASSETS=off"""
+        if os.getenv("STATIC_ASSETS", "on") == "off":
+            return cls()
+        try:
+            return cls(build())
+        except OSError as e:
+            # A read-only checkout: serve the plain /static/ files instead
+            logger.warning(f"Could not build fingerprinted static assets: {str(e)}")
+            return cls()
+
+    def url_for(self, endpoint, **values):
+        """url_for for templates: static files resolve to their fingerprinted copies"""
+        if endpoint == 'static' and values.get('filename') in self.manifest:
+            values['filename'] = self.manifest[values['filename']]
+            return url_for('assets', **values)
+        return url_for(endpoint, **values)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fingerprint and precompress the files under static/")
+    parser.add_argument('--static-dir', default=STATIC_DIR)
+    parser.add_argument('--dist-dir', default=None, help="output directory (default: <static-dir>/dist)")
+    args = parser.parse_args()
+
+    dist_dir = args.dist_dir or os.path.join(args.static_dir, 'dist')
+    manifest = build(args.static_dir, dist_dir)
+    for path, target in manifest.items():
+        sizes = ', '.join(f"{encoding} {os.path.getsize(os.path.join(dist_dir, target) + suffix):,} B"
+                          for encoding, suffix in SUFFIXES.items()
+                          if os.path.exists(os.path.join(dist_dir, target) + suffix))
+        print(f"{path} -> {target} ({sizes})")
+    if brotli is None:
+        print("brotli is not installed; wrote gzip versions only (pip install brotli)")
+
+
+if __name__ == '__main__':
+    main()
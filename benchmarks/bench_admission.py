@@ -0,0 +1,186 @@
+"""/predict latency while /send-email is flooded, with and without admission control.
+
+Starts gunicorn sync workers and keeps --flooders clients posting large
+pdfAttachment bodies to /send-email, each uploaded slowly over --upload
+seconds (a slow link or a deliberate flood). Every upload holds a sync
+worker while its body arrives. Meanwhile /predict requests arrive at a
+steady --rate, and their latency is measured three ways:
+
+- baseline: no flood;
+- flood, admission off: ADMISSION_CONTROL=off;
+- flood, admission on: the defaults of limits.py, so at most
+  SEND_EMAIL_CONCURRENCY uploads run at once and the rest get a fast 503.
+
+Each flooder sends its own X-Client header (RATE_LIMIT_CLIENT_HEADER), as
+many clients would: the concurrency limit answers 503 while all slots are
+busy, and once a flooder has spent its SEND_EMAIL_BURST the rate limit
+answers 429. The /predict client gets a rate limit high enough not to
+interfere.
+
+Usage: python benchmarks/bench_admission.py [--workers 4] [--flooders 12] [--rate 50] [--duration 6]
+"""
+import argparse
+import csv
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlencode
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from smtp_stub import SMTPStub  # noqa: E402
+
+OFF = {'ADMISSION_CONTROL': 'off'}
+ON = {'PREDICT_RATE': '10000', 'PREDICT_BURST': '10000'}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(workers, env):
+    port = free_port()
+    cmd = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn_conf.py',
+           '-b', f'127.0.0.1:{port}', '--backlog', '2048', '--log-level', 'warning']
+    proc = subprocess.Popen(cmd, cwd=BASE_DIR, env=dict(env, WEB_CONCURRENCY=str(workers)),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return proc, port
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("server did not start")
+
+
+def post(port, path, body, client, upload=0.0, timeout=30):
+    """POST body, spread over `upload` seconds; return (latency, status or None)"""
+    start = time.perf_counter()
+    status = None
+    try:
+        with socket.create_connection(('127.0.0.1', port), timeout=timeout) as sock:
+            sock.sendall((f"POST {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n"
+                          f"X-Client: {client}\r\nContent-Type: application/x-www-form-urlencoded\r\n"
+                          f"Content-Length: {len(body)}\r\n\r\n").encode())
+            pieces = 10 if upload else 1
+            step = -(-len(body) // pieces)
+            try:
+                for i in range(pieces):
+                    sock.sendall(body[i * step:(i + 1) * step])
+                    if upload:
+                        time.sleep(upload / pieces)
+            except OSError:
+                # Rejected early: the server answered and closed before the body was sent
+                pass
+            response = b''
+            while chunk := sock.recv(65536):
+                response += chunk
+            if response.startswith(b'HTTP/1.1 '):
+                status = int(response[9:12])
+    except OSError:
+        pass
+    return time.perf_counter() - start, status
+
+
+def flood(port, body, flooders, upload, stop):
+    """Keep `flooders` slow /send-email uploads in flight until stop is set"""
+    statuses = Counter()
+    lock = threading.Lock()
+
+    def flooder(i):
+        while not stop.is_set():
+            _, status = post(port, '/send-email', body, f'flooder-{i}', upload)
+            with lock:
+                statuses[status] += 1
+            if status in (429, 503):
+                # Ignore Retry-After and keep the pressure on
+                time.sleep(0.05)
+
+    threads = [threading.Thread(target=flooder, args=(i,)) for i in range(flooders)]
+    for thread in threads:
+        thread.start()
+    return threads, statuses
+
+
+def measure_predict(port, bodies, rate, duration, timeout):
+    """Open-loop /predict arrivals at `rate` per second; return latencies (ms) and failures"""
+    n = int(rate * duration)
+    results = [None] * n
+
+    def client(i):
+        results[i] = post(port, '/predict', bodies[i % len(bodies)], 'predict', timeout=timeout)
+
+    threads = []
+    start = time.perf_counter()
+    for i in range(n):
+        time.sleep(max(0.0, start + i / rate - time.perf_counter()))
+        thread = threading.Thread(target=client, args=(i,))
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    latencies = np.array([latency for latency, status in results if status == 200]) * 1000
+    return latencies, sum(status != 200 for _, status in results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="/predict p99 under a /send-email flood, admission control off vs on")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--flooders', type=int, default=12, help="concurrent slow /send-email uploads")
+    parser.add_argument('--upload', type=float, default=2.0, help="seconds each upload takes")
+    parser.add_argument('--attachment-kb', type=int, default=1024)
+    parser.add_argument('--rate', type=float, default=50, help="/predict requests per second")
+    parser.add_argument('--duration', type=float, default=6)
+    parser.add_argument('--timeout', type=float, default=30)
+    args = parser.parse_args()
+
+    stub = SMTPStub().start()
+    with open(os.path.join(BASE_DIR, 'Cardiovascular_Disease_Dataset.csv'), newline='') as f:
+        columns = ['age', 'gender', 'chestpain', 'restingBP', 'serumcholestrol', 'fastingbloodsugar',
+                   'restingrelectro', 'maxheartrate', 'exerciseangia', 'oldpeak', 'slope', 'noofmajorvessels']
+        names = ['age', 'gender', 'chestpain', 'trestbps', 'chol', 'fbs',
+                 'restecg', 'thalach', 'exang', 'oldpeak', 'slope', 'ca']
+        bodies = [urlencode({n: row[c] for n, c in zip(names, columns)}).encode() for row in csv.DictReader(f)]
+    email = urlencode({'patientid': 'flood', 'doctorEmail': 'doctor@example.com', 'message': 'flood',
+                       'pdfAttachment': 'data:application/pdf;base64,' + 'A' * (args.attachment_kb * 1024)}).encode()
+
+    print(f"{args.workers} sync workers, /predict at {args.rate:g}/s; flood: {args.flooders} uploads of "
+          f"{args.attachment_kb} KB over {args.upload:g} s each")
+    runs = [('baseline', ON, 0), ('flood, admission off', OFF, args.flooders), ('flood, admission on', ON, args.flooders)]
+    for name, limits, flooders in runs:
+        env = dict(os.environ, SMTP_HOST='127.0.0.1', SMTP_PORT=str(stub.port), SMTP_SECURITY='none',
+                   EMAIL='bench@example.com', PASSWORD='', PREDICTION_CACHE='off', RATE_LIMIT_CLIENT_HEADER='X-Client',
+                   STATE_DIR=tempfile.mkdtemp(prefix='heart-admission-'), **limits)
+        proc, port = start_server(args.workers, env)
+        stop = threading.Event()
+        try:
+            measure_predict(port, bodies, 20, 0.5, args.timeout)  # warm up
+            threads, statuses = flood(port, email, flooders, args.upload, stop)
+            time.sleep(args.upload if flooders else 0)
+            latencies, failed = measure_predict(port, bodies, args.rate, args.duration, args.timeout)
+            stop.set()
+            for thread in threads:
+                thread.join()
+        finally:
+            proc.terminate()
+            proc.wait()
+        p50, p99 = (np.percentile(latencies, [50, 99]) if len(latencies) else (float('nan'),) * 2)
+        emails = ', '.join(f"{status or 'error'}: {count}" for status, count in sorted(statuses.items(), key=str))
+        print(f"{name:22s} /predict p50 {p50:8.1f} ms  p99 {p99:8.1f} ms  failed {failed:<4d}"
+              f"  /send-email {emails or '-'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Peak Python memory of /send-email for a multi-megabyte PDF report, sent as
+a multipart file part and as the legacy base64 data URI form field.
+
+Delivery is not timed: the queued message is serialized in place of sending
+it, the same work the background sender does before talking to SMTP.
+
+Usage: python benchmarks/bench_attachment_memory.py [--mb 5]
+"""
+import argparse
+import base64
+import io
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+
+
+def fake_pdf(size):
+    body = os.urandom(size - 16)
+    return b'%PDF-1.3\n' + body + b'\n%%EOF\n'
+
+
+def serialize_only(sender, recipient, message):
+    message.as_string()
+    return 'benchmark'
+
+
+def measure(client, **kwargs):
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    response = client.post('/send-email', content_type='multipart/form-data', **kwargs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert response.status_code == 202, response.get_json()
+    return peak
+
+
+def run():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mb', type=float, default=5)
+    args = parser.parse_args()
+
+    main.email_queue.submit = serialize_only
+    client = main.app.test_client()
+    pdf = fake_pdf(int(args.mb * 1024 * 1024))
+    data_uri = 'data:application/pdf;base64,' + base64.b64encode(pdf).decode('ascii')
+    form = {'doctorEmail': 'doctor@example.com', 'patientid': '1'}
+
+    file_peak = measure(client, data=dict(form, pdfFile=(io.BytesIO(pdf), 'report.pdf')))
+    uri_peak = measure(client, data=dict(form, pdfAttachment=data_uri))
+
+    mb = 1024 * 1024
+    print(f"report size:              {len(pdf) / mb:6.1f} MB")
+    print(f"upload size, file part:   {len(pdf) / mb:6.1f} MB")
+    print(f"upload size, data URI:    {len(data_uri) / mb:6.1f} MB")
+    print(f"peak memory, file part:   {file_peak / mb:6.1f} MB")
+    print(f"peak memory, data URI:    {uri_peak / mb:6.1f} MB")
+
+
+if __name__ == '__main__':
+    run()
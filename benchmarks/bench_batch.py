@@ -0,0 +1,75 @@
+"""Compare rows/sec of /predict/batch against looping over /predict.
+
+Usage: python benchmarks/bench_batch.py [--rows 1000]
+"""
+import argparse
+import csv
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import app, dataset_columns  # noqa: E402
+
+DATASET = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                       'Cardiovascular_Disease_Dataset.csv')
+
+
+def load_rows(n_rows):
+    with open(DATASET, newline='') as f:
+        rows = list(csv.DictReader(f))
+    # Repeat the dataset if more rows are requested than it holds
+    return [rows[i % len(rows)] for i in range(n_rows)]
+
+
+def bench_single(client, rows):
+    start = time.perf_counter()
+    for row in rows:
+        form = {dataset_columns[col]: row[col] for col in dataset_columns}
+        response = client.post('/predict', data=form)
+        assert response.status_code == 200, response.get_json()
+    return time.perf_counter() - start
+
+
+def bench_batch(client, rows, as_csv):
+    if as_csv:
+        buf = io.StringIO()
+        writer = csv.DictWriter(buf, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+        kwargs = {'data': buf.getvalue(), 'content_type': 'text/csv'}
+    else:
+        kwargs = {'json': rows}
+    start = time.perf_counter()
+    response = client.post('/predict/batch', **kwargs)
+    elapsed = time.perf_counter() - start
+    body = response.get_json()
+    assert response.status_code == 200 and body['scored'] == len(rows), body
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000)
+    args = parser.parse_args()
+
+    rows = load_rows(args.rows)
+    client = app.test_client()
+    # Warm up routes before timing
+    bench_single(client, rows[:5])
+    bench_batch(client, rows[:5], as_csv=False)
+
+    single = bench_single(client, rows)
+    batch_json = bench_batch(client, rows, as_csv=False)
+    batch_csv = bench_batch(client, rows, as_csv=True)
+
+    print(f"rows: {len(rows)}")
+    print(f"loop over /predict:    {len(rows) / single:12.0f} rows/sec")
+    print(f"/predict/batch (JSON): {len(rows) / batch_json:12.0f} rows/sec  ({single / batch_json:.1f}x)")
+    print(f"/predict/batch (CSV):  {len(rows) / batch_csv:12.0f} rows/sec  ({single / batch_csv:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""Import time and RSS of a fresh worker importing main, for the pickle,
+NumPy-only .npz and memory-mapped registry .npy serving modes.
+
+Usage: python benchmarks/bench_cold_start.py [--runs 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = r"""
+import json, sys, time
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+rss_kb = next(int(line.split()[1]) for line in open('/proc/self/status') if line.startswith('VmRSS:'))
+print(json.dumps({
+    'import_s': elapsed,
+    'rss_mb': rss_kb / 1024,
+    'heavy_modules': sorted(m for m in ('sklearn', 'scipy', 'uvicorn', 'asgiref') if m in sys.modules)
+}))
+"""
+
+MODES = {
+    'pickle': 'heart_disease_model4.pkl',
+    'npz': 'heart_disease_model4.npz',
+    'npy': 'models/heart_disease_model4.npy',
+}
+
+
+def measure(model_file):
+    env = dict(os.environ, MODEL_PATH=os.path.join(BASE_DIR, model_file))
+    out = subprocess.run([sys.executable, '-c', PROBE], cwd=BASE_DIR, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    for mode, model_file in MODES.items():
+        samples = [measure(model_file) for _ in range(args.runs)]
+        import_ms = statistics.median(s['import_s'] for s in samples) * 1000
+        rss_mb = statistics.median(s['rss_mb'] for s in samples)
+        heavy = ', '.join(samples[0]['heavy_modules']) or 'none'
+        print(f"{mode:7s} import {import_ms:7.1f} ms   RSS {rss_mb:6.1f} MB   heavy modules: {heavy}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""Head-of-line blocking by slow clients: gunicorn sync workers against the
+uvicorn worker serving the native asgi:app.
+
+Starts each server with the same number of worker processes, then opens
+/predict connections at a steady arrival rate. A share of the clients are
+slow (a mobile upload): they send the request headers, pause, then send the
+body. A sync worker is held while it waits for that body, so the fast
+clients queued behind it wait too; the async worker keeps serving the fast
+clients while the slow ones upload. The fast clients' latency is reported.
+
+Usage: python benchmarks/bench_concurrency.py [--workers 2] [--rate 100] [--slow-share 0 0.05 0.2] [--pause 0.2]
+"""
+import argparse
+import csv
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from smtp_stub import SMTPStub  # noqa: E402
+
+SERVERS = {
+    'sync': ['-k', 'sync', 'main:app'],
+    'uvicorn': ['-k', 'uvicorn.workers.UvicornWorker', 'asgi:app'],
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(kind, workers, env):
+    port = free_port()
+    cmd = [sys.executable, '-m', 'gunicorn', '-w', str(workers), '-b', f'127.0.0.1:{port}',
+           '--timeout', '120', '--backlog', '2048', '--log-level', 'warning'] + SERVERS[kind]
+    proc = subprocess.Popen(cmd, cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return proc, port
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f"{kind} server did not start")
+
+
+def slow_request(port, path, body, pause, timeout):
+    """POST with a pause between headers and body; return (latency, ok)"""
+    start = time.perf_counter()
+    try:
+        with socket.create_connection(('127.0.0.1', port), timeout=timeout) as sock:
+            sock.sendall((f"POST {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n"
+                          f"Content-Type: application/x-www-form-urlencoded\r\n"
+                          f"Content-Length: {len(body)}\r\n\r\n").encode())
+            time.sleep(pause)
+            sock.sendall(body)
+            response = b''
+            while chunk := sock.recv(65536):
+                response += chunk
+        ok = response.startswith((b'HTTP/1.1 200', b'HTTP/1.1 202'))
+    except OSError:
+        ok = False
+    return time.perf_counter() - start, ok
+
+
+def run_level(port, path, bodies, clients, rate, slow_every, pause, timeout):
+    """Start `clients` connections at `rate` per second, every `slow_every`-th
+    one slow; return the latency of the fast ones"""
+    results = [None] * clients
+    slow = [bool(slow_every) and i % slow_every == 0 for i in range(clients)]
+
+    def client(i):
+        results[i] = slow_request(port, path, bodies[i % len(bodies)], pause if slow[i] else 0, timeout)
+
+    threads = []
+    start = time.perf_counter()
+    for i in range(clients):
+        # Open-loop arrivals: client i starts at i / rate regardless of how the server keeps up
+        time.sleep(max(0.0, start + i / rate - time.perf_counter()))
+        thread = threading.Thread(target=client, args=(i,))
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    fast = [r for r, is_slow in zip(results, slow) if not is_slow]
+    latencies = np.array([r[0] for r in fast if r[1]]) * 1000
+    return {
+        'fast': len(fast),
+        'failed': sum(not r[1] for r in results),
+        'p50_ms': float(np.percentile(latencies, 50)) if len(latencies) else float('nan'),
+        'p99_ms': float(np.percentile(latencies, 99)) if len(latencies) else float('nan'),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Slow-client head-of-line blocking: sync vs uvicorn workers")
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--rate', type=float, default=100, help="new connections per second")
+    parser.add_argument('--duration', type=float, default=3, help="seconds of arrivals per level")
+    parser.add_argument('--slow-share', nargs='+', type=float, default=[0, 0.05, 0.2],
+                        help="fraction of clients that pause before sending the body")
+    parser.add_argument('--pause', type=float, default=0.2, help="seconds a slow client waits between headers and body")
+    parser.add_argument('--timeout', type=float, default=30)
+    args = parser.parse_args()
+
+    stub = SMTPStub().start()
+    env = dict(os.environ, SMTP_HOST='127.0.0.1', SMTP_PORT=str(stub.port), SMTP_SECURITY='none',
+               EMAIL='bench@example.com', PASSWORD='', PREDICTION_CACHE='off',
+               STATE_DIR=tempfile.mkdtemp(prefix='heart-concurrency-'), ADMISSION_CONTROL='off')
+    with open(os.path.join(BASE_DIR, 'Cardiovascular_Disease_Dataset.csv'), newline='') as f:
+        columns = ['age', 'gender', 'chestpain', 'restingBP', 'serumcholestrol', 'fastingbloodsugar',
+                   'restingrelectro', 'maxheartrate', 'exerciseangia', 'oldpeak', 'slope', 'noofmajorvessels']
+        names = ['age', 'gender', 'chestpain', 'trestbps', 'chol', 'fbs',
+                 'restecg', 'thalach', 'exang', 'oldpeak', 'slope', 'ca']
+        bodies = [urlencode({n: row[c] for n, c in zip(names, columns)}).encode() for row in csv.DictReader(f)]
+
+    print(f"{args.workers} worker processes per server, {args.rate:g} connections/s, "
+          f"{args.pause * 1000:.0f} ms slow-client pause; latency of the fast clients")
+    for kind in SERVERS:
+        proc, port = start_server(kind, args.workers, env)
+        try:
+            run_level(port, '/predict', bodies, 4, 100, 0, 0, args.timeout)  # warm up
+            clients = int(args.rate * args.duration)
+            for share in args.slow_share:
+                slow_every = round(1 / share) if share else 0
+                r = run_level(port, '/predict', bodies, clients, args.rate, slow_every, args.pause, args.timeout)
+                print(f"{kind:8s} slow={share:<5.0%} fast clients={r['fast']:<5d} failed={r['failed']:<4d} "
+                      f"p50 {r['p50_ms']:8.1f} ms  p99 {r['p99_ms']:8.1f} ms")
+        finally:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == '__main__':
+    main()
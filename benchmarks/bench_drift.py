@@ -0,0 +1,97 @@
+"""Overhead of the drift monitor (drift.py) on predictions, and the cost of GET /drift.
+
+- DriftMonitor.observe alone: one row (what /predict records) and per row
+  of /predict/batch-sized batches.
+- /predict through the Flask test client, with the result cache off so
+  every request is scored and recorded: time per request, and the time of
+  its 'drift' stage from heart_predict_stage_duration_seconds, with the
+  monitor disabled (the stage timer alone) and enabled.
+- Aggregating /drift over --workers per-worker files.
+
+Usage: python benchmarks/bench_drift.py [--requests 5000] [--workers 16]
+"""
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import timeit
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATASET = os.path.join(BASE_DIR, 'Cardiovascular_Disease_Dataset.csv')
+
+
+def per_call_us(run, number):
+    return min(timeit.repeat(run, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drift monitor overhead per prediction and /drift aggregation cost")
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=16, help="per-worker files summed by /drift")
+    args = parser.parse_args()
+
+    os.environ.update(STATE_DIR=tempfile.mkdtemp(prefix='heart-drift-'), PREDICTION_CACHE='off',
+                      ADMISSION_CONTROL='off', DRIFT_MONITOR='on')
+    sys.path.insert(0, BASE_DIR)
+    import main as app_main
+    import metrics
+    from drift import DriftMonitor
+    from metrics import PREDICT_STAGE_LATENCY
+    from train import FEATURE_COLUMNS, load_training_data
+
+    version, model = app_main.models.current()
+    X, _ = load_training_data(DATASET)
+    probabilities = model.score(X)[1]
+    monitor = app_main.drift_monitor
+
+    print("DriftMonitor.observe")
+    rows = iter(range(10 ** 9))
+
+    def one_row():
+        i = next(rows) % len(X)
+        monitor.observe(version, model, X[i:i + 1], probabilities[i:i + 1])
+
+    print(f"  {'1 row':12s} {per_call_us(one_row, 20000):8.2f} us/row")
+    for size in (100, 1000):
+        elapsed = per_call_us(lambda: monitor.observe(version, model, X[:size], probabilities[:size]), 200)
+        print(f"  {f'batch of {size}':12s} {elapsed / size:8.2f} us/row")
+
+    print("\n/predict end to end (Flask test client, PREDICTION_CACHE=off)")
+    client = app_main.app.test_client()
+    with open(DATASET, newline='') as f:
+        bodies = [dict(zip(app_main.feature_names, (row[col] for col in FEATURE_COLUMNS)))
+                  for row in csv.DictReader(f)]
+    calls = iter(range(10 ** 9))
+
+    def predict():
+        client.post('/predict', data=bodies[next(calls) % len(bodies)])
+
+    def stage_seconds():
+        values = metrics.collect()
+        slot = PREDICT_STAGE_LATENCY._index[('drift',)] + len(PREDICT_STAGE_LATENCY.buckets)
+        return values[slot + 1], values[slot + 2]
+
+    for mode, current in (('off', DriftMonitor(app_main.feature_names)), ('on', monitor)):
+        app_main.drift_monitor = current
+        rounds = []
+        for _ in range(5):
+            total, count = stage_seconds()
+            elapsed = timeit.timeit(predict, number=args.requests // 5)
+            total_after, count_after = stage_seconds()
+            rounds.append((elapsed / (args.requests // 5) * 1e6, (total_after - total) / (count_after - count) * 1e6))
+        request_us, stage_us = min(rounds)
+        print(f"  drift monitor {mode:3s} {request_us:8.1f} us/request, drift stage {stage_us:6.2f} us")
+
+    # Fill one file per simulated worker, then time the aggregation behind /drift
+    window = monitor.window(version, model)
+    values = window._array().copy()
+    for pid in range(args.workers):
+        values.tofile(os.path.join(window.directory, f"{10 ** 6 + pid}.dat"))
+    elapsed = per_call_us(lambda: monitor.report(version, model), 50) / 1000
+    report = monitor.report(version, model)
+    print(f"\n/drift over {report['workers']} worker files ({report['predictions']:,} predictions): {elapsed:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,199 @@
+"""Rule evaluation cost: the original per-row if-chains against the rule
+table, both row by row (/predict) and vectorized (/predict/batch), at 1, 1k
+and 1M rows. Also checks that all three give identical output (the table
+returns tuples where the if-chains built lists).
+
+Usage: python benchmarks/bench_rules.py [--rows 1 1000 1000000]
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model import load_model  # noqa: E402
+from rules import evaluate_rules, get_contributing_factors, get_recommendations  # noqa: E402
+from train import FEATURE_COLUMNS  # noqa: E402
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATASET = os.path.join(BASE_DIR, 'Cardiovascular_Disease_Dataset.csv')
+
+
+def reference_recommendations(probability, prediction, features):
+    # The if-chain main.py used before the rule table
+    risk_percentage = probability * 100
+    age = features[0]
+    cholesterol = features[4]
+    blood_sugar = features[5]
+    
+    lifestyle_recs = []
+    monitoring_recs = []
+    medical_recs = []
+    
+    # Age-specific recommendations
+    if age > 60:
+        lifestyle_recs.append("Consider low-impact exercises like swimming or walking")
+        if risk_percentage > 50:
+            monitoring_recs.append("More frequent check-ups recommended for seniors with elevated risk")
+    else:
+        lifestyle_recs.append("Regular moderate to vigorous exercise is recommended")
+    
+    # Cholesterol-specific recommendations
+    if cholesterol > 200:
+        lifestyle_recs.append("Focus on reducing saturated fat and increasing fiber in your diet")
+        lifestyle_recs.append("Consider foods rich in omega-3 fatty acids")
+        monitoring_recs.append("Regular cholesterol monitoring every 3-6 months")
+        
+    # Blood sugar-specific recommendations
+    if blood_sugar == 1:
+        lifestyle_recs.append("Monitor carbohydrate intake and follow a balanced diet")
+        lifestyle_recs.append("Maintain regular meal times to help control blood sugar")
+        monitoring_recs.append("Regular blood glucose testing as advised by your doctor")
+    
+    # General recommendations based on risk
+    if risk_percentage < 30:
+        medical_recs.append("Discuss these results at your next regular check-up")
+        medical_recs.append("Continue preventive healthcare measures")
+    elif risk_percentage < 70:
+        medical_recs.append("Schedule an appointment with your doctor within the next month")
+        medical_recs.append("Consider discussing preventive medications with your healthcare provider")
+    else:
+        medical_recs.append("Seek prompt medical attention to discuss these results")
+        medical_recs.append("Consult with a cardiologist for specialized care")
+        
+    return {
+        "lifestyle": lifestyle_recs,
+        "monitoring": monitoring_recs,
+        "medical": medical_recs
+    }
+
+
+def reference_factors(features, prediction):
+    # The if-chain main.py used before the rule table
+    # Extract features for easier reference
+    age, gender, chestpain, trestbps, chol, fbs, restecg, thalach, exang, oldpeak, slope, ca = features
+    
+    factors = []
+    
+    # Only include factors that significantly contribute to the prediction
+    if age > 60:
+        factors.append({
+            "name": "Age",
+            "value": f"{int(age)} years",
+            "description": "Age is a significant risk factor for heart disease.",
+            "impact": "high",
+            "icon": "👴"
+        })
+    
+    if chol > 240:
+        factors.append({
+            "name": "Cholesterol",
+            "value": f"{int(chol)} mg/dl",
+            "description": "Cholesterol is significantly above recommended levels.",
+            "impact": "high",
+            "icon": "🔴"
+        })
+    elif chol > 200:
+        factors.append({
+            "name": "Cholesterol",
+            "value": f"{int(chol)} mg/dl",
+            "description": "Cholesterol is above optimal levels.",
+            "impact": "medium",
+            "icon": "🟠"
+        })
+    
+    if trestbps >= 140:
+        factors.append({
+            "name": "Blood Pressure",
+            "value": f"{int(trestbps)} mm Hg",
+            "description": "Blood pressure is in the hypertension range.",
+            "impact": "high",
+            "icon": "📈"
+        })
+    
+    if exang == 1:
+        factors.append({
+            "name": "Exercise Angina",
+            "value": "Present",
+            "description": "Chest pain during exercise indicates restricted blood flow to the heart.",
+            "impact": "high",
+            "icon": "⚡"
+        })
+    
+    if ca > 0:
+        factors.append({
+            "name": "Major Vessels",
+            "value": f"{int(ca)}",
+            "description": f"{int(ca)} major blood vessel(s) show significant blockage.",
+            "impact": "high",
+            "icon": "🚧"
+        })
+    
+    if oldpeak > 2:
+        factors.append({
+            "name": "ST Depression",
+            "value": f"{oldpeak:.1f}",
+            "description": "Significant ST depression indicates abnormal heart activity during exercise.",
+            "impact": "high", 
+            "icon": "📉"
+        })
+    
+    return factors
+
+
+def per_row(recommend, factors, X, probabilities):
+    rows = X.tolist()
+    return ([recommend(p, 0, row) for p, row in zip(probabilities.tolist(), rows)],
+            [factors(row, 0) for row in rows])
+
+
+def same(output, reference):
+    recommendations, factors = output
+    return (all({section: list(messages) for section, messages in row.items()} == expected
+                for row, expected in zip(recommendations, reference[0]))
+            and all(list(row) == expected for row, expected in zip(factors, reference[1]))
+            and len(recommendations) == len(reference[0]) and len(factors) == len(reference[1]))
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rule evaluation: if-chains vs rule table")
+    parser.add_argument('--rows', nargs='+', type=int, default=[1, 1000, 1000000])
+    parser.add_argument('--repeat', type=int, default=5, help="best of this many runs")
+    args = parser.parse_args()
+
+    with open(DATASET, newline='') as f:
+        base = np.array([[float(row[col]) for col in FEATURE_COLUMNS] for row in csv.DictReader(f)])
+    model = load_model(os.path.join(BASE_DIR, 'heart_disease_model4.npz'))
+
+    for n_rows in args.rows:
+        X = base[np.arange(n_rows) % len(base)]
+        probabilities = model.score(X)[1]
+        runs = {
+            'if-chain': lambda: per_row(reference_recommendations, reference_factors, X, probabilities),
+            'table row-by-row': lambda: per_row(get_recommendations, get_contributing_factors, X, probabilities),
+            'table vectorized': lambda: evaluate_rules(X, probabilities),
+        }
+        outputs = {}
+        times = {}
+        for name, run in runs.items():
+            times[name] = min(timed(run)[0] for _ in range(args.repeat if n_rows < 100000 else 1))
+            outputs[name] = run()
+        identical = all(same(output, outputs['if-chain']) for output in outputs.values())
+        print(f"\n{n_rows} rows (outputs identical: {identical})")
+        for name, elapsed in times.items():
+            print(f"  {name:18s} {elapsed * 1000:10.3f} ms  {elapsed / n_rows * 1e6:8.2f} us/row  "
+                  f"{times['if-chain'] / elapsed:6.1f}x")
+
+
+if __name__ == '__main__':
+    main()
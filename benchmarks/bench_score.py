@@ -0,0 +1,70 @@
+"""Per-call latency of the fused LogisticRegression.score() against the old
+predict() + predict_proba() pair, and a check that both agree on
+heart_disease_model4.pkl.
+
+The baseline is the pickle itself, loaded explicitly: its sklearn
+StandardScaler, weights and bias run the forward pass the app used before
+the scaler was folded. It is compared with score() on the same pickle and
+on the shipped heart_disease_model4.npz artifact.
+
+Usage: python benchmarks/bench_score.py [--calls 20000]
+"""
+import argparse
+import csv
+import os
+import sys
+import timeit
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from model import load_npz, load_pickle  # noqa: E402
+from train import FEATURE_COLUMNS  # noqa: E402
+
+DATASET = os.path.join(BASE_DIR, 'Cardiovascular_Disease_Dataset.csv')
+baseline = load_pickle(os.path.join(BASE_DIR, 'heart_disease_model4.pkl'))
+
+
+def reference_forward(X):
+    # The forward pass predict()/predict_proba() ran before the scaler was folded
+    X = baseline.scaler.transform(np.asarray(X))
+    z = np.dot(X, baseline.weights) + baseline.bias
+    return 1 / (1 + np.exp(-z))
+
+
+def reference_request(X):
+    # Old request path: one forward pass for the label, another for the probability
+    prediction = (reference_forward(X) > 0.5).astype(int)
+    y_pred = reference_forward(X)
+    probabilities = np.column_stack([1 - y_pred, y_pred])
+    return prediction, probabilities[:, 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--calls', type=int, default=20000)
+    args = parser.parse_args()
+
+    with open(DATASET, newline='') as f:
+        X = np.array([[float(row[col]) for col in FEATURE_COLUMNS] for row in csv.DictReader(f)])
+
+    # Agreement on every row of the dataset
+    ref_labels, ref_proba = reference_request(X)
+    print(f"rows compared:          {len(X)}")
+    models = {'pickle': baseline, 'npz': load_npz(os.path.join(BASE_DIR, 'heart_disease_model4.npz'))}
+    for name, model in models.items():
+        labels, proba = model.score(X)
+        print(f"score() on the {name:6s}  labels identical: {bool(np.array_equal(labels, ref_labels))}, "
+              f"max |probability diff|: {np.max(np.abs(proba - ref_proba)):.3e}")
+
+    row = X[:1]
+    old = timeit.timeit(lambda: reference_request(row), number=args.calls) / args.calls
+    new = timeit.timeit(lambda: models['npz'].score(row), number=args.calls) / args.calls
+    print(f"predict + predict_proba: {old * 1e6:8.1f} us/call")
+    print(f"score (fused):           {new * 1e6:8.1f} us/call  ({old / new:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Bytes transferred and worker time per page load, plain static files vs
+fingerprinted, precompressed assets with a cached index (assets.py).
+
+Each mode runs in its own process (STATIC_ASSETS=off, then on) and drives
+the Flask app in-process like a browser accepting gzip and br:
+
+- first visit: GET / and every local script/stylesheet the page links;
+- repeat visit: the same, honouring what the first responses said about
+  caching. Fresh entries (max-age, immutable) are not requested at all;
+  the rest are revalidated with If-None-Match / If-Modified-Since.
+
+Bytes are response headers plus body. Worker time is the CPU time spent in
+the app per page load.
+
+Usage: python benchmarks/bench_static.py [--loads 500]
+"""
+import argparse
+import gzip
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEADERS = {'Accept-Encoding': 'gzip, deflate, br'}
+
+
+def response_bytes(response):
+    head = sum(len(f"{name}: {value}\r\n") for name, value in response.headers.items())
+    return head + len(response.data)
+
+
+def page_load(client, cache):
+    """One page load; fills and uses cache {url: response headers}; return (bytes, requests)"""
+    total = requests = 0
+    urls = ['/']
+    while urls:
+        url = urls.pop(0)
+        headers = dict(HEADERS)
+        cached = cache.get(url)
+        if cached is not None:
+            control = cached.get('Cache-Control', '')
+            if 'immutable' in control or re.search(r'max-age=[1-9]', control):
+                continue
+            if 'ETag' in cached:
+                headers['If-None-Match'] = cached['ETag']
+            if 'Last-Modified' in cached:
+                headers['If-Modified-Since'] = cached['Last-Modified']
+        response = client.get(url, headers=headers)
+        requests += 1
+        total += response_bytes(response)
+        if response.status_code == 200:
+            cache[url] = dict(response.headers)
+            if url == '/':
+                body = response.data
+                if response.headers.get('Content-Encoding') == 'gzip':
+                    body = gzip.decompress(body)
+                urls += re.findall(r'(?:src|href)="(/(?:static|assets)/[^"]+)"', body.decode())
+    return total, requests
+
+
+def child(loads):
+    sys.path.insert(0, BASE_DIR)
+    import main
+    client = main.app.test_client()
+    results = {}
+    for visit in ('first', 'repeat'):
+        page_load(client, {})  # warm up
+        elapsed = 0.0
+        for _ in range(loads):
+            cache = {}
+            if visit == 'repeat':
+                page_load(client, cache)
+            start = time.process_time()
+            size, requests = page_load(client, cache)
+            elapsed += time.process_time() - start
+        results[visit] = {'bytes': size, 'requests': requests, 'cpu_ms': elapsed / loads * 1000}
+    print(json.dumps(results))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Page load cost: plain static files vs fingerprinted assets")
+    parser.add_argument('--loads', type=int, default=500)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(args.loads)
+
+    print(f"{'mode':8s} {'visit':7s} {'requests':>8s} {'bytes':>8s} {'worker ms':>10s}")
+    for mode in ('off', 'on'):
+        env = dict(os.environ, STATIC_ASSETS=mode, STATE_DIR=tempfile.mkdtemp(prefix='heart-static-'),
+                   ADMISSION_CONTROL='off')
+        output = subprocess.run([sys.executable, __file__, '--child', '--loads', str(args.loads)],
+                                env=env, cwd=BASE_DIR, capture_output=True, text=True, check=True).stdout
+        results = json.loads(output.strip().splitlines()[-1])
+        for visit, r in results.items():
+            print(f"{'before' if mode == 'off' else 'after':8s} {visit:7s} {r['requests']:8d} {r['bytes']:8,d} "
+                  f"{r['cpu_ms']:10.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""Time to convergence of train.py's solvers against the notebook's loop.
+
+The dataset is enlarged synthetically: rows are resampled from
+Cardiovascular_Disease_Dataset.csv and the continuous columns get a little
+Gaussian noise, then written to a temporary CSV so the streamed CSV read is
+timed too. The baseline is the notebook's fit(): full-batch gradient
+descent with learning_rate=0.01, max_iter=1000, lambda_=0.01 and the cost
+printed every 100 iterations (verbose=True, as the notebook ran it).
+
+Usage: python benchmarks/bench_train.py [--rows 200000 1000000]
+"""
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from train import (FEATURE_COLUMNS, TARGET_COLUMN, accuracy, compute_cost, load_training_data,  # noqa: E402
+                   train, train_test_split)
+
+DATASET = os.path.join(BASE_DIR, 'Cardiovascular_Disease_Dataset.csv')
+CONTINUOUS = ['age', 'restingBP', 'serumcholestrol', 'maxheartrate', 'oldpeak']
+
+
+def write_enlarged_csv(path, n_rows, seed=0):
+    """Resample the dataset to n_rows with jitter on the continuous columns"""
+    with open(DATASET, newline='') as f:
+        rows = list(csv.DictReader(f))
+    rng = np.random.default_rng(seed)
+    columns = ['patientid'] + FEATURE_COLUMNS + [TARGET_COLUMN]
+    base = np.array([[float(row[c]) for c in columns] for row in rows])
+    std = base.std(axis=0)
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for start in range(0, n_rows, 100000):
+            sample = base[rng.integers(0, len(base), min(100000, n_rows - start))]
+            for c in CONTINUOUS:
+                j = columns.index(c)
+                sample[:, j] = np.maximum(0, sample[:, j] + rng.normal(0, 0.05 * std[j], len(sample)))
+            writer.writerows(np.round(sample, 1).tolist())
+
+
+def notebook_fit(X, y, learning_rate=0.01, max_iter=1000, lambda_=0.01):
+    """The notebook's LogisticRegression.fit, with verbose=True cost reporting"""
+    m, n_features = X.shape
+    weights = np.random.randn(n_features) * 0.01
+    bias = 0
+    for i in range(max_iter):
+        predictions = 1 / (1 + np.exp(-np.clip(np.dot(X, weights) + bias, -500, 500)))
+        dw = (1 / m) * np.dot(X.T, (predictions - y)) + (lambda_ / m) * weights
+        db = (1 / m) * np.sum(predictions - y)
+        weights -= learning_rate * dw
+        bias -= learning_rate * db
+        if i % 100 == 0:
+            compute_cost(X, y, weights, bias, lambda_)
+    return weights, bias
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Training time: train.py solvers vs the notebook loop")
+    parser.add_argument('--rows', nargs='+', type=int, default=[200000, 1000000])
+    args = parser.parse_args()
+
+    for n_rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'train.csv')
+            write_enlarged_csv(path, n_rows)
+            start = time.perf_counter()
+            X, y = load_training_data(path)
+            read_s = time.perf_counter() - start
+        X_train, X_test, y_train, y_test = train_test_split(X, y, 0.3, 2)
+        print(f"\n{n_rows} rows (CSV read {read_s:.2f} s, {n_rows / read_s:,.0f} rows/s)")
+
+        # The notebook scales first, then fits on the scaled matrix
+        reference = train(X_train, y_train, 'newton')
+        X_scaled = reference.scaler.transform(X_train)
+        np.random.seed(0)
+        start = time.perf_counter()
+        weights, bias = notebook_fit(X_scaled, y_train)
+        elapsed = time.perf_counter() - start
+        reference.weights, reference.bias = weights, bias
+        reference.fold_scaler()
+        print(f"  {'notebook':8s} {elapsed:8.3f} s  1000 iterations  "
+              f"cost {compute_cost(X_scaled, y_train, weights, bias, 0.01):.6f}  "
+              f"test accuracy {accuracy(reference, X_test, y_test):.4f}")
+
+        for solver in ('newton', 'sgd'):
+            start = time.perf_counter()
+            model = train(X_train, y_train, solver)
+            elapsed = time.perf_counter() - start
+            print(f"  {solver:8s} {elapsed:8.3f} s  {model.max_iter:4d} {'iterations' if solver == 'newton' else 'epochs    '}  "
+                  f"cost {compute_cost(X_scaled, y_train, model.weights, model.bias, 0.01):.6f}  "
+                  f"test accuracy {accuracy(model, X_test, y_test):.4f}")
+
+
+if __name__ == '__main__':
+    main()
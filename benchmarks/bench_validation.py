@@ -0,0 +1,134 @@
+"""Per-request parsing and validation cost of /predict inputs.
+
+Times, per request, decoding the body (urlencoded form through Werkzeug, or
+JSON) and validating the 12 fields, both with the original parse_features
+loop (first error only, list of floats, then np.array for the model) and
+with the compiled FeatureSchema (all errors, straight into a float64 array).
+Also checks that both accept and reject the same requests.
+
+Usage: python benchmarks/bench_validation.py [--requests 20000]
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import timeit
+from urllib.parse import urlencode
+
+import numpy as np
+from werkzeug.formparser import parse_form_data
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from schema import FeatureSchema  # noqa: E402
+from train import FEATURE_COLUMNS  # noqa: E402
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATASET = os.path.join(BASE_DIR, 'Cardiovascular_Disease_Dataset.csv')
+
+# As in main.py
+validation_ranges = {
+    'age': (20, 80), 'gender': (0, 1), 'chestpain': (0, 3), 'trestbps': (94, 200), 'chol': (0, 602),
+    'fbs': (0, 1), 'restecg': (0, 2), 'thalach': (71, 202), 'exang': (0, 1), 'oldpeak': (0, 6.2),
+    'slope': (0, 3), 'ca': (0, 3)
+}
+feature_names = ['age', 'gender', 'chestpain', 'trestbps', 'chol', 'fbs',
+                 'restecg', 'thalach', 'exang', 'oldpeak', 'slope', 'ca']
+
+
+def reference_parse_features(values):
+    # The loop main.py used before FeatureSchema
+    features = []
+    for feature in feature_names:
+        value = values.get(feature)
+        if value is None or value == '':
+            return None, f"Missing required parameter: {feature}"
+        try:
+            value = float(value)
+        except ValueError:
+            return None, f"Invalid value for {feature}: {value}. Must be a number."
+        min_val, max_val = validation_ranges.get(feature, (float('-inf'), float('inf')))
+        if value < min_val or value > max_val:
+            return None, f"Value for {feature} must be between {min_val} and {max_val}."
+        features.append(value)
+    return features, None
+
+
+def parse_form(body):
+    environ = {
+        'REQUEST_METHOD': 'POST',
+        'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': io.BytesIO(body),
+    }
+    return parse_form_data(environ)[1]
+
+
+def reference(values):
+    features, error = reference_parse_features(values)
+    return np.array([features]) if error is None else error
+
+
+def as_number(value):
+    # JSON clients send numbers; keep what does not parse as the string it was
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def per_request_us(run, bodies, n_requests):
+    calls = iter(range(n_requests))
+
+    def one():
+        run(bodies[next(calls) % len(bodies)])
+
+    return min(timeit.repeat(one, number=n_requests // 5, repeat=5)) / (n_requests // 5) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="/predict input parsing: loop vs compiled schema")
+    parser.add_argument('--requests', type=int, default=20000)
+    args = parser.parse_args()
+
+    schema = FeatureSchema(feature_names, validation_ranges)
+    with open(DATASET, newline='') as f:
+        rows = [dict(zip(feature_names, (row[col] for col in FEATURE_COLUMNS))) for row in csv.DictReader(f)]
+    invalid = [dict(row, age='abc', chol='9999', ca='') for row in rows[:100]]
+    cases = {
+        'valid': rows,
+        'three bad fields': invalid,
+    }
+
+    for case, values in cases.items():
+        forms = [urlencode(row).encode() for row in values]
+        objects = [json.dumps({name: as_number(value) for name, value in row.items()}).encode() for row in values]
+        decoded_forms = [parse_form(body) for body in forms]
+        decoded_objects = [json.loads(body) for body in objects]
+        agree = all(isinstance(reference(form), str) == (schema.parse(form)[1] is not None)
+                    and isinstance(reference(obj), str) == (schema.parse(obj)[1] is not None)
+                    for form, obj in zip(decoded_forms, decoded_objects))
+        print(f"\n{case} ({len(values)} distinct requests, same accept/reject decisions: {agree})")
+        timings = {
+            'decode form (werkzeug)': (lambda body: parse_form(body), forms),
+            'decode JSON': (lambda body: json.loads(body), objects),
+            'validate form, loop': (reference, decoded_forms),
+            'validate form, schema': (schema.parse, decoded_forms),
+            'validate JSON, schema': (schema.parse, decoded_objects),
+            'form end to end, loop': (lambda body: reference(parse_form(body)), forms),
+            'form end to end, schema': (lambda body: schema.parse(parse_form(body)), forms),
+            'JSON end to end, schema': (lambda body: schema.parse(json.loads(body)), objects),
+        }
+        baseline = None
+        for name, (run, bodies) in timings.items():
+            elapsed = per_request_us(run, bodies, args.requests)
+            if name == 'form end to end, loop':
+                baseline = elapsed
+            note = f"  {baseline / elapsed:5.1f}x" if baseline and name.endswith('schema') else ''
+            print(f"  {name:26s} {elapsed:8.2f} us/request{note}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""Per-worker unique and shared memory of gunicorn, with and without preload.
+
+Starts gunicorn with gunicorn_conf.py for each combination of PRELOAD (0/1)
+and model artifact (the pickle, which pulls in scikit-learn, and the
+memory-mapped registry .npy), sends some /predict traffic so every worker
+has served requests, then reads /proc/<pid>/smaps_rollup of the master and
+each worker:
+
+- unique (USS): Private_Clean + Private_Dirty, memory only that worker holds
+- shared: Shared_Clean + Shared_Dirty, pages mapped by other processes too
+- PSS: unique plus each shared page divided by the number of sharers
+
+The total PSS of master plus workers is what the server costs the host.
+Linux only.
+
+Usage: python benchmarks/bench_worker_memory.py [--workers 8] [--requests 2000]
+"""
+import argparse
+import csv
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from urllib.parse import urlencode
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATASET = os.path.join(BASE_DIR, 'Cardiovascular_Disease_Dataset.csv')
+
+MODELS = {
+    'pickle': {'MODEL_PATH': os.path.join(BASE_DIR, 'heart_disease_model4.pkl')},
+    'registry': {'MODEL_REGISTRY': os.path.join(BASE_DIR, 'models')},
+}
+COLUMNS = {'age': 'age', 'gender': 'gender', 'chestpain': 'chestpain', 'restingBP': 'trestbps',
+           'serumcholestrol': 'chol', 'fastingbloodsugar': 'fbs', 'restingrelectro': 'restecg',
+           'maxheartrate': 'thalach', 'exerciseangia': 'exang', 'oldpeak': 'oldpeak', 'slope': 'slope',
+           'noofmajorvessels': 'ca'}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def smaps_rollup(pid):
+    """Memory totals of one process in kB"""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                values[parts[0].rstrip(':')] = int(parts[1])
+    return {
+        'unique': values['Private_Clean'] + values['Private_Dirty'],
+        'shared': values['Shared_Clean'] + values['Shared_Dirty'],
+        'pss': values['Pss'],
+        'rss': values['Rss'],
+    }
+
+
+def children(pid):
+    with open(f'/proc/{pid}/task/{pid}/children') as f:
+        return [int(child) for child in f.read().split()]
+
+
+def drive(port, bodies, n_requests, concurrency=8):
+    """Send n_requests /predict calls so every worker has imported and served"""
+    work = iter(range(n_requests))
+    lock = threading.Lock()
+
+    def client():
+        while True:
+            with lock:
+                i = next(work, None)
+            if i is None:
+                return
+            request = urllib.request.Request(f'http://127.0.0.1:{port}/predict', data=bodies[i % len(bodies)])
+            urllib.request.urlopen(request, timeout=30).read()
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def measure(preload, model, workers, bodies, n_requests):
+    port = free_port()
+    env = dict(os.environ, PRELOAD='1' if preload else '0', PREDICTION_CACHE='off', ADMISSION_CONTROL='off',
+               STATE_DIR=tempfile.mkdtemp(prefix='heart-memory-'), **MODELS[model])
+    if model == 'registry':
+        env.pop('MODEL_PATH', None)
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn_conf.py', '-w', str(workers),
+         '-b', f'127.0.0.1:{port}', '--log-level', 'warning'],
+        cwd=BASE_DIR, env=env)
+    try:
+        deadline = time.time() + 120
+        while len(children(server.pid)) < workers or not _listening(port):
+            if time.time() > deadline:
+                raise RuntimeError("gunicorn did not start")
+            time.sleep(0.2)
+        drive(port, bodies, n_requests)
+        time.sleep(0.5)
+        master = smaps_rollup(server.pid)
+        worker_stats = [smaps_rollup(pid) for pid in children(server.pid)]
+    finally:
+        server.terminate()
+        server.wait()
+    return master, worker_stats
+
+
+def _listening(port):
+    try:
+        socket.create_connection(('127.0.0.1', port), timeout=1).close()
+        return True
+    except OSError:
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="gunicorn per-worker memory with and without preload")
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    with open(DATASET, newline='') as f:
+        bodies = [urlencode({name: row[col] for col, name in COLUMNS.items()}).encode() for row in csv.DictReader(f)]
+
+    print(f"{args.workers} workers, {args.requests} /predict requests; MB per worker (mean), totals for the server")
+    print(f"{'preload':8s} {'model':9s} {'unique':>8s} {'shared':>8s} {'pss':>8s} {'rss':>8s}   {'total pss':>9s}")
+    for preload in (False, True):
+        for model in MODELS:
+            master, workers = measure(preload, model, args.workers, bodies, args.requests)
+            mean = {k: sum(w[k] for w in workers) / len(workers) / 1024 for k in ('unique', 'shared', 'pss', 'rss')}
+            total_pss = (master['pss'] + sum(w['pss'] for w in workers)) / 1024
+            print(f"{'on' if preload else 'off':8s} {model:9s} {mean['unique']:8.1f} {mean['shared']:8.1f} "
+                  f"{mean['pss']:8.1f} {mean['rss']:8.1f}   {total_pss:9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,306 @@
+"""Reproducible load test for /predict and /send-email.
+
+Starts gunicorn with gunicorn_conf.py for each entry point: sync workers
+on the Flask app (main:app), uvicorn workers on the wrapped Flask app
+(main:asgi_app) and on the native ASGI handlers (asgi:app). Each server is
+driven over HTTP at several concurrency levels, with payloads sampled from
+Cardiovascular_Disease_Dataset.csv and /send-email delivering to a local
+SMTP stub. Reports p50/p95/p99 latency and throughput, saves the results
+as JSON and can compare against an earlier run, exiting non-zero on a
+regression.
+
+Worker counts are gunicorn_conf.py's defaults unless --workers is given.
+Admission control is off unless --admission is given, which runs with the
+shipped default limits. --slow-clients keeps that many extra connections
+sending the same endpoint's bodies, each stalling --stall seconds after its
+headers, as a slow upload would; they are not counted in the results
+beyond the emails they deliver.
+
+Usage:
+    python benchmarks/loadtest.py --output run.json
+    python benchmarks/loadtest.py --compare run.json --max-regression 0.15
+"""
+import argparse
+import csv
+import http.client
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from rules import FEATURE_NAMES  # noqa: E402
+from smtp_stub import SMTPStub  # noqa: E402
+from train import FEATURE_COLUMNS  # noqa: E402
+
+DATASET = os.path.join(BASE_DIR, 'Cardiovascular_Disease_Dataset.csv')
+ENDPOINTS = {'predict': '/predict', 'send-email': '/send-email'}
+# Per target: WORKER_CLASS for gunicorn_conf.py and the app it serves
+SERVERS = {
+    'wsgi': ('sync', 'main:app'),
+    'asgi': ('uvicorn', 'main:asgi_app'),
+    'native': ('uvicorn', 'asgi:app'),
+}
+
+
+def load_payloads(n, seed):
+    """Sample n /predict form payloads from the dataset"""
+    with open(DATASET, newline='') as f:
+        rows = list(csv.DictReader(f))
+    rng = random.Random(seed)
+    return [{name: row[col] for name, col in zip(FEATURE_NAMES, FEATURE_COLUMNS)} for row in rng.choices(rows, k=n)]
+
+
+def email_payload(form):
+    return dict(form, doctorEmail='doctor@example.com', patientid='loadtest',
+                message='Load test', predictionResult='Low risk of heart disease', probability='10%')
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(target, workers, env):
+    """Start gunicorn with gunicorn_conf.py serving target; return (process, port)"""
+    worker_class, app = SERVERS[target]
+    port = free_port()
+    env = dict(env, WORKER_CLASS=worker_class)
+    if workers:
+        env['WEB_CONCURRENCY'] = str(workers)
+    cmd = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn_conf.py', '-b', f'127.0.0.1:{port}',
+           '--backlog', '2048', '--log-level', 'warning', app]
+    proc = subprocess.Popen(cmd, cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return proc, port
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f"{target} server did not start")
+
+
+def post(port, path, body, timeout=30):
+    """POST a form body on a new connection; return the status code, or None if the request failed"""
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+    try:
+        connection.request('POST', path, body, {'Content-Type': 'application/x-www-form-urlencoded'})
+        response = connection.getresponse()
+        response.read()
+        return response.status
+    except OSError:
+        return None
+    finally:
+        connection.close()
+
+
+def run(port, path, bodies, concurrency):
+    """Send bodies to the server from `concurrency` client threads"""
+    encoded = [urlencode(body).encode() for body in bodies]
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    work = iter(encoded)
+
+    def client():
+        nonlocal errors
+        while True:
+            with lock:
+                body = next(work, None)
+            if body is None:
+                return
+            start = time.perf_counter()
+            status = post(port, path, body)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                errors += status is None or status >= 400
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, time.perf_counter() - start
+
+
+def stalled_client(port, path, body, stall, stop):
+    """Send body to path over and over, waiting `stall` seconds between the headers and the body"""
+    head = (f"POST {path} HTTP/1.1\r\nHost: 127.0.0.1\r\n"
+            f"Content-Type: application/x-www-form-urlencoded\r\nContent-Length: {len(body)}\r\n"
+            f"Connection: close\r\n\r\n").encode()
+    while not stop.is_set():
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=stall + 30) as s:
+                s.sendall(head)
+                stop.wait(stall)
+                s.sendall(body)
+                while s.recv(65536):
+                    pass
+        except OSError:
+            stop.wait(0.1)
+
+
+def start_stalled_clients(port, path, body, count, stall):
+    """Start `count` stalled_client threads; return the event that stops them"""
+    stop = threading.Event()
+    encoded = urlencode(body).encode()
+    for _ in range(count):
+        threading.Thread(target=stalled_client, args=(port, path, encoded, stall, stop), daemon=True).start()
+    # Let them connect and send their headers before the measured run
+    time.sleep(min(stall, 0.5))
+    return stop
+
+
+def summarize(target, endpoint, concurrency, latencies, errors, wall):
+    ms = np.array(latencies) * 1000
+    return {
+        'target': target,
+        'endpoint': endpoint,
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': int(errors),
+        'throughput_rps': len(latencies) / wall,
+        'mean_ms': float(ms.mean()),
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p95_ms': float(np.percentile(ms, 95)),
+        'p99_ms': float(np.percentile(ms, 99)),
+    }
+
+
+def wait_for_delivery(stub, expected, timeout):
+    """Wait until the SMTP stub has accepted `expected` messages; return the time taken"""
+    start = time.perf_counter()
+    while stub.messages < expected and time.perf_counter() - start < timeout:
+        time.sleep(0.01)
+    return time.perf_counter() - start
+
+
+def compare(results, baseline_path, max_regression):
+    """Print the change against a previous run; return the regressed rows"""
+    with open(baseline_path) as f:
+        baseline = {(r['target'], r['endpoint'], r['concurrency']): r for r in json.load(f)['results']}
+    regressions = []
+    print(f"\nComparison with {baseline_path} (max regression {max_regression:.0%}):")
+    for result in results:
+        base = baseline.get((result['target'], result['endpoint'], result['concurrency']))
+        if base is None:
+            continue
+        p95_change = result['p95_ms'] / base['p95_ms'] - 1
+        rps_change = result['throughput_rps'] / base['throughput_rps'] - 1
+        regressed = p95_change > max_regression or rps_change < -max_regression
+        if regressed:
+            regressions.append(result)
+        print(f"  {result['target']:6s} {result['endpoint']:10s} c={result['concurrency']:<4d} "
+              f"p95 {p95_change:+7.1%}  throughput {rps_change:+7.1%}  {'REGRESSION' if regressed else 'ok'}")
+    return regressions
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /predict and /send-email")
+    parser.add_argument('--targets', nargs='+', default=['wsgi', 'asgi', 'native'],
+                        choices=['wsgi', 'asgi', 'native'])
+    parser.add_argument('--endpoints', nargs='+', default=list(ENDPOINTS), choices=list(ENDPOINTS))
+    parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 4, 16])
+    parser.add_argument('--requests', type=int, default=500, help="requests per concurrency level")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, help="gunicorn workers (default: gunicorn_conf.py's)")
+    parser.add_argument('--cache', action='store_true', help="leave the prediction cache on")
+    parser.add_argument('--admission', action='store_true', help="leave admission control on, with the default limits")
+    parser.add_argument('--slow-clients', type=int, default=0, help="extra clients that stall before sending their body")
+    parser.add_argument('--stall', type=float, default=2.0, help="seconds a slow client waits before its body")
+    parser.add_argument('--smtp-delay', type=float, default=0.0, help="seconds the SMTP stub stalls per message")
+    parser.add_argument('--output', help="write results as JSON to this file")
+    parser.add_argument('--compare', help="earlier JSON results to compare against")
+    parser.add_argument('--max-regression', type=float, default=0.10)
+    args = parser.parse_args()
+
+    # Servers deliver to the SMTP stub, keep state in a scratch dir and score every request
+    stub = SMTPStub(delay=args.smtp_delay).start()
+    env = dict(os.environ, SMTP_HOST='127.0.0.1', SMTP_PORT=str(stub.port), SMTP_SECURITY='none',
+               EMAIL='loadtest@example.com', PASSWORD='')
+    if not args.admission:
+        env['ADMISSION_CONTROL'] = 'off'
+    if not args.cache:
+        env['PREDICTION_CACHE'] = 'off'
+    payloads = load_payloads(args.requests, args.seed)
+
+    results = []
+    for target in args.targets:
+        state_dir = tempfile.mkdtemp(prefix='heart-loadtest-')
+        proc, port = start_server(target, args.workers, dict(env, STATE_DIR=state_dir))
+        try:
+            for endpoint in args.endpoints:
+                path = ENDPOINTS[endpoint]
+                bodies = payloads if endpoint == 'predict' else [email_payload(p) for p in payloads]
+                # Warm up every worker outside the timed run, and let the warm-up
+                # emails arrive before counting deliveries
+                delivered_before = stub.messages
+                _, errors, _ = run(port, path, bodies[:20], 4)
+                if endpoint == 'send-email':
+                    wait_for_delivery(stub, delivered_before + 20 - errors, timeout=60)
+                for concurrency in args.concurrency:
+                    stop = start_stalled_clients(port, path, bodies[0], args.slow_clients, args.stall)
+                    delivered_before = stub.messages
+                    latencies, errors, wall = run(port, path, bodies, concurrency)
+                    stop.set()
+                    result = summarize(target, endpoint, concurrency, latencies, errors, wall)
+                    if endpoint == 'send-email':
+                        drain = wait_for_delivery(stub, delivered_before + len(bodies) - errors, timeout=120)
+                        result['delivered'] = stub.messages - delivered_before
+                        result['delivery_rps'] = result['delivered'] / (wall + drain)
+                    results.append(result)
+                    print(f"{target:6s} {result['endpoint']:10s} c={concurrency:<4d} "
+                          f"{result['throughput_rps']:9.1f} req/s  p50 {result['p50_ms']:7.2f} ms  "
+                          f"p95 {result['p95_ms']:7.2f} ms  p99 {result['p99_ms']:7.2f} ms  errors {errors}"
+                          + (f"  delivered {result['delivered']} ({result['delivery_rps']:.1f}/s)"
+                             if endpoint == 'send-email' else ''))
+        finally:
+            proc.terminate()
+            proc.wait()
+
+    report = {
+        'meta': {
+            'git_revision': git_revision(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'cpu_count': os.cpu_count(),
+            'args': vars(args),
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare and compare(results, args.compare, args.max_regression):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
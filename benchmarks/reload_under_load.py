@@ -0,0 +1,161 @@
+"""Check that switching model versions under concurrent load drops nothing.
+
+Builds a scratch registry with two versions (the shipped model and one
+retrained by train.py with a different regularization), starts gunicorn on
+it, and keeps /predict busy from several client threads while the main
+thread flips the active version through POST /admin/model. Every response
+must be a 200 carrying one of the two versions, and its probability must be
+exactly what that version computes for the inputs (so no request is ever
+scored by a half-swapped model). Exits non-zero on any failure.
+
+The repo has no test suite, so this script is the reload-under-load test
+the registry was asked to ship with; it needs gunicorn and runs in CI or
+by hand like the other benchmarks.
+
+Usage: python benchmarks/reload_under_load.py [--workers 4] [--clients 8] [--duration 10] [--flip-every 0.25]
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from urllib.parse import urlencode
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from model import load_model  # noqa: E402
+from registry import ModelRegistry  # noqa: E402
+from train import FEATURE_COLUMNS, load_training_data, train  # noqa: E402
+
+DATASET = os.path.join(BASE_DIR, 'Cardiovascular_Disease_Dataset.csv')
+FEATURE_NAMES = ['age', 'gender', 'chestpain', 'trestbps', 'chol', 'fbs',
+                 'restecg', 'thalach', 'exang', 'oldpeak', 'slope', 'ca']
+TOKEN = 'reload-under-load-check'
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def build_registry(root):
+    """Publish the shipped model as v1 and a retrained one as v2; activate v1"""
+    registry = ModelRegistry(root=root, load=False)
+    registry.publish(load_model(os.path.join(BASE_DIR, 'heart_disease_model4.npz')), 'v1')
+    X, y = load_training_data(DATASET)
+    registry.publish(train(X, y, 'newton', lambda_=50.0), 'v2')
+    registry.activate('v1')
+    return {version: load_model(registry.path(version)) for version in ('v1', 'v2')}
+
+
+def post(port, path, data, headers=None):
+    request = urllib.request.Request(f'http://127.0.0.1:{port}{path}', data=data, headers=headers or {})
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Flip model versions under load and check no request fails")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--flip-every', type=float, default=0.25, help="seconds between version switches")
+    args = parser.parse_args()
+
+    with open(DATASET, newline='') as f:
+        rows = [[float(row[c]) for c in FEATURE_COLUMNS] for row in csv.DictReader(f)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = os.path.join(tmp, 'models')
+        models = build_registry(root)
+        port = free_port()
+        env = dict(os.environ, MODEL_REGISTRY=root, MODEL_RELOAD_INTERVAL='0.05', ADMIN_TOKEN=TOKEN,
+                   PREDICTION_CACHE='off', STATE_DIR=os.path.join(tmp, 'state'), ADMISSION_CONTROL='off')
+        env.pop('MODEL_PATH', None)
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-w', str(args.workers), '-k', 'gthread', '--threads', '4',
+             '-b', f'127.0.0.1:{port}', '--log-level', 'warning', 'main:app'],
+            cwd=BASE_DIR, env=env)
+        try:
+            deadline = time.time() + 60
+            while True:
+                try:
+                    socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                    break
+                except OSError:
+                    if time.time() > deadline:
+                        raise SystemExit("Server did not start")
+                    time.sleep(0.2)
+
+            stop = threading.Event()
+            lock = threading.Lock()
+            served = Counter()
+            failures = []
+
+            def client(seed):
+                rng = random.Random(seed)
+                while not stop.is_set():
+                    features = rng.choice(rows)
+                    status, body = post(port, '/predict', urlencode(dict(zip(FEATURE_NAMES, features))).encode())
+                    with lock:
+                        if status != 200 or body is None:
+                            failures.append(f"HTTP {status}")
+                            continue
+                        version = body.get('model_version')
+                        if version not in models:
+                            failures.append(f"unknown version {version!r}")
+                            continue
+                        expected = float(models[version].score(np.array([features]))[1][0])
+                        if body['probability'] != expected:
+                            failures.append(f"{version} probability {body['probability']} != {expected}")
+                        served[version] += 1
+
+            threads = [threading.Thread(target=client, args=(i,)) for i in range(args.clients)]
+            for thread in threads:
+                thread.start()
+            flips = 0
+            headers = {'Authorization': f'Bearer {TOKEN}', 'Content-Type': 'application/json'}
+            end = time.time() + args.duration
+            while time.time() < end:
+                time.sleep(args.flip_every)
+                version = 'v2' if flips % 2 == 0 else 'v1'
+                status, _ = post(port, '/admin/model', json.dumps({'version': version}).encode(), headers)
+                if status != 200:
+                    failures.append(f"activate {version}: HTTP {status}")
+                flips += 1
+            stop.set()
+            for thread in threads:
+                thread.join()
+        finally:
+            server.terminate()
+            server.wait()
+
+    total = sum(served.values()) + len(failures)
+    print(f"{total} requests, {flips} version switches, served by version: {dict(served)}")
+    if failures:
+        print(f"FAILED: {len(failures)} bad responses, e.g. {failures[:5]}")
+        sys.exit(1)
+    if len(served) < 2:
+        print("FAILED: only one version was ever served")
+        sys.exit(1)
+    print("OK: no request failed and every response matched its model version")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Minimal local SMTP server for benchmarks: accepts and discards every message.
+
+Speaks just enough SMTP (EHLO/HELO, MAIL, RCPT, DATA, RSET, NOOP, QUIT) for
+smtplib, without TLS or authentication. Point the app at it with
+SMTP_HOST=127.0.0.1, SMTP_PORT=<port>, SMTP_SECURITY=none.
+
+Usage: python benchmarks/smtp_stub.py [--port 8025] [--delay 0]
+"""
+import argparse
+import socketserver
+import threading
+import time
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode('ascii') + b'\r\n')
+
+    def handle(self):
+        server = self.server
+        self.reply('220 localhost stub ESMTP')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('ascii', 'replace').strip().upper()
+            if command.startswith('EHLO'):
+                self.wfile.write(b'250-localhost\r\n250 8BITMIME\r\n')
+            elif command.startswith(('HELO', 'MAIL', 'RCPT', 'RSET', 'NOOP')):
+                self.reply('250 OK')
+            elif command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline() not in (b'.\r\n', b''):
+                    pass
+                if server.delay:
+                    time.sleep(server.delay)
+                with server.lock:
+                    server.messages += 1
+                self.reply('250 OK queued')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class SMTPStub(socketserver.ThreadingTCPServer):
+    """Threaded SMTP sink; `messages` counts accepted messages"""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=0, delay=0.0):
+        super().__init__((host, port), _Handler)
+        self.delay = delay
+        self.messages = 0
+        self.lock = threading.Lock()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local SMTP sink for benchmarks")
+    parser.add_argument('--port', type=int, default=8025)
+    parser.add_argument('--delay', type=float, default=0.0, help="seconds to stall before accepting each message")
+    args = parser.parse_args()
+    stub = SMTPStub(port=args.port, delay=args.delay)
+    print(f"SMTP stub listening on 127.0.0.1:{stub.port}")
+    stub.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
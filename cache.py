@@ -0,0 +1,189 @@
+"""Bounded, TTL-evicting cache of full /predict responses.
+
+Keys are the model version plus the normalized 12-feature tuple. Two backends are available:
+
+- MemoryResultCache: an LRU dict private to each worker (the default).
+- SQLiteResultCache: a table under STATE_DIR, so all gunicorn workers on a
+  host share hits. Every few puts, expired entries are dropped and, if the
+  table has outgrown maxsize, the oldest ones with them.
+
+Hit, miss and eviction counters are kept per worker process.
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from state import SQLiteConnections, state_path
+
+# Each worker sweeps the SQLite cache after this many puts (fewer for small caches)
+SWEEP_EVERY = 100
+
+
+def cache_key(features, version=''):
+    """Normalize the 12 inputs into a hashable key (1 and 1.0 map to the same entry).
+
+    The model version is part of the key, so a model swap never serves
+    results computed by the previous model.
+    """
+    return (version,) + tuple(float(value) for value in features)
+
+
+class MemoryResultCache:
+    """Thread-safe LRU cache with a per-entry time to live"""
+    backend = 'memory'
+
+    def __init__(self, maxsize=10000, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is not None and entry[0] <= now:
+                # Expired - drop it and treat as a miss
+                del self._items[key]
+                self.evictions += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            self._items[key] = (expires, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+    def stats(self):
+        return {
+            'backend': self.backend,
+            'enabled': True,
+            'pid': os.getpid(),
+            'size': len(self),
+            'maxsize': self.maxsize,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+class SQLiteResultCache(MemoryResultCache):
+    """Result cache in a SQLite table shared by every worker on the host"""
+    backend = 'sqlite'
+
+    def __init__(self, maxsize=10000, ttl=300, path=None):
+        super().__init__(maxsize=maxsize, ttl=ttl)
+        self.path = path or state_path('prediction_cache.db')
+        self._connect = SQLiteConnections(self.path)
+        # Between sweeps the table can exceed maxsize by this many entries per worker
+        self.sweep_every = max(1, min(SWEEP_EVERY, maxsize // 10))
+        self._puts = 0
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT, expires REAL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS results_expires ON results (expires)")
+
+    @staticmethod
+    def _encode_key(key):
+        return ','.join(repr(value) for value in key)
+
+    def get(self, key):
+        now = time.time()
+        row = self._connect().execute(
+            "SELECT value FROM results WHERE key = ? AND expires > ?", (self._encode_key(key), now)
+        ).fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key, value):
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?)",
+                (self._encode_key(key), json.dumps(value), now + self.ttl)
+            )
+        # Counting the table is a full scan, so it is only done every sweep_every puts
+        with self._lock:
+            self._puts += 1
+            sweep = self._puts % self.sweep_every == 0
+        if sweep:
+            self.sweep(now)
+
+    def sweep(self, now=None):
+        """Drop expired entries, then the oldest ones beyond maxsize"""
+        now = time.time() if now is None else now
+        conn = self._connect()
+        with conn:
+            evicted = conn.execute("DELETE FROM results WHERE expires <= ?", (now,)).rowcount
+            excess = conn.execute("SELECT COUNT(*) FROM results").fetchone()[0] - self.maxsize
+            if excess > 0:
+                evicted += conn.execute(
+                    "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY expires LIMIT ?)",
+                    (excess,)
+                ).rowcount
+        if evicted:
+            with self._lock:
+                self.evictions += evicted
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM results")
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+
+class NullResultCache:
+    """Stand-in used when the cache is switched off"""
+    backend = 'none'
+
+    def get(self, key):
+        return None
+
+    def put(self, key, value):
+        pass
+
+    def clear(self):
+        pass
+
+    def stats(self):
+        return {'backend': self.backend, 'enabled': False, 'pid': os.getpid()}
+
+
+def make_result_cache():
+    """Build the prediction cache from the PREDICTION_CACHE* environment variables"""
+    backend = os.getenv("PREDICTION_CACHE", "memory").lower()
+    maxsize = int(os.getenv("PREDICTION_CACHE_SIZE", "10000"))
+    ttl = float(os.getenv("PREDICTION_CACHE_TTL", "300"))
+    if backend in ('off', 'none', '0', 'false'):
+        return NullResultCache()
+    if backend == 'sqlite':
+        return SQLiteResultCache(maxsize=maxsize, ttl=ttl)
+    return MemoryResultCache(maxsize=maxsize, ttl=ttl)
@@ -0,0 +1,299 @@
+"""Input drift and score distribution monitor over live predictions.
+
+For each of the 12 features and the predicted probability, every worker
+keeps in its own memory-mapped file
+(STATE_DIR/drift/<model version>/<pid>.dat):
+
+- the count, sum and sum of squares of (value - training mean), for a
+  streaming mean and variance in constant memory. Centring on the training
+  mean keeps the sum of squares from losing precision.
+- counts over fixed bins. For a feature these are the deciles of the
+  reference data (fewer bins for features with few distinct values); for
+  the probability, the deciles of the model's scores on the reference rows.
+
+Recording a prediction appends it to a per-worker queue. Every FLUSH_ROWS
+rows, or at the first prediction after FLUSH_INTERVAL seconds, the queue is
+binned and added to the file in a few vectorized operations, with no locks
+or syscalls, so a prediction costs around a microsecond. An idle worker
+holds at most FLUSH_ROWS rows back until it serves again. As in metrics.py,
+threads of one worker can rarely lose an update to a race.
+
+GET /drift sums the files of all workers, live and exited, for the served
+model version. It compares each live histogram with the reference one by
+the population stability index,
+
+    PSI = sum over bins of (live - reference) * ln(live / reference)
+
+with both proportions floored at PSI_FLOOR. Below 0.1 is usually read as
+stable, 0.1-0.25 as a moderate shift and above 0.25 as a significant one.
+
+The reference rows are read from DRIFT_REFERENCE (default: the training
+CSV) when the app loads: a uniform sample of at most MAX_REFERENCE_ROWS,
+drawn while the file is read in chunks, so a large file is never held
+whole. Each model version gets its own window, with its
+score bins, the first time it is served, so a new model starts a new
+comparison. DRIFT_MONITOR=off disables the monitor. Call clear() once when
+the server starts (see gunicorn_conf.on_starting) to drop the counts of a
+previous run.
+"""
+import glob
+import logging
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+from state import state_dir
+from train import iter_csv_chunks
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DRIFT_DIR = state_dir('drift')
+
+# Bins per series: the deciles of the reference data
+N_BINS = 10
+# Per series: count, sum and sum of squares of the centred values, then the bin counts
+N_STATS = 3
+# Rows are queued per worker and added to its file in batches of this many, or
+# at the first prediction after FLUSH_INTERVAL seconds, whichever comes first
+FLUSH_ROWS = 64
+FLUSH_INTERVAL = 1.0
+# Keeps empty bins from making the PSI infinite
+PSI_FLOOR = 1e-4
+PSI_MODERATE = 0.1
+PSI_SIGNIFICANT = 0.25
+# Reference rows kept in memory to score each new model version
+MAX_REFERENCE_ROWS = 100000
+
+
+def sample_reference(path, max_rows=MAX_REFERENCE_ROWS, seed=0):
+    """The features of a uniform random sample of at most max_rows rows of a training CSV, in file order.
+
+    Every row gets a random key and the max_rows smallest keys are kept as
+    the chunks go by, so memory stays at max_rows plus one chunk.
+    """
+    rng = np.random.default_rng(seed)
+    kept = keys = rows = None
+    n_rows = 0
+    for X, _ in iter_csv_chunks(path):
+        chunk_rows = np.arange(n_rows, n_rows + len(X))
+        n_rows += len(X)
+        if kept is None:
+            kept, keys, rows = X, rng.random(len(X)), chunk_rows
+        else:
+            kept = np.concatenate([kept, X])
+            keys = np.concatenate([keys, rng.random(len(X))])
+            rows = np.concatenate([rows, chunk_rows])
+        if len(keys) > max_rows:
+            smallest = np.argpartition(keys, max_rows)[:max_rows]
+            kept, keys, rows = kept[smallest], keys[smallest], rows[smallest]
+    if kept is None:
+        raise ValueError(f"{path} has no rows")
+    return kept[np.argsort(rows)]
+
+
+def bin_edges(values, n_bins=N_BINS):
+    """Inner edges splitting values into (at most) n_bins equally populated bins"""
+    edges = np.unique(np.quantile(values, np.arange(1, n_bins) / n_bins))
+    # An edge at the minimum would only add an empty first bin
+    return edges[edges > values.min()]
+
+
+def bin_index(data, edges):
+    """The bin of every value of data (rows x series): how many inner edges are <= the value"""
+    return (data[:, :, None] >= edges).sum(axis=2)
+
+
+def psi(live, reference):
+    live = np.maximum(live, PSI_FLOOR)
+    reference = np.maximum(reference, PSI_FLOOR)
+    return float(np.sum((live - reference) * np.log(live / reference)))
+
+
+def psi_status(value):
+    if value is None:
+        return 'no data'
+    if value >= PSI_SIGNIFICANT:
+        return 'significant'
+    if value >= PSI_MODERATE:
+        return 'moderate'
+    return 'stable'
+
+
+class Reference:
+    """Bins, bin proportions, mean and standard deviation of each series of the reference data"""
+
+    def __init__(self, names, data):
+        self.names = list(names)
+        self.mean = data.mean(axis=0)
+        self.std = data.std(axis=0)
+        columns = [bin_edges(column) for column in data.T]
+        self.n_bins = [len(edges) + 1 for edges in columns]
+        # Padded with +inf, which no value reaches, so every series has N_BINS bins
+        self.edges = np.full((len(columns), N_BINS - 1), np.inf)
+        for i, edges in enumerate(columns):
+            self.edges[i, :len(edges)] = edges
+        bins = bin_index(data, self.edges)
+        self.proportions = np.array([np.bincount(column, minlength=N_BINS) for column in bins.T]) / len(data)
+
+
+class Window:
+    """Live statistics of one model version, in this worker's file and summed over all workers"""
+
+    def __init__(self, reference, directory):
+        self.reference = reference
+        self.directory = directory
+        # One column per series: the stats, then the bin counts
+        self.shape = (N_STATS + N_BINS, len(reference.names))
+        # Offset of each series' first bin in the flattened values
+        self._first_bin = N_STATS * self.shape[1] + np.arange(self.shape[1])
+        self._pid = None
+        self._values = None
+        self._pending = []
+        self._pending_rows = 0
+        self._flush_at = 0.0
+
+    def _array(self):
+        # One file per process; a forked worker must not write into its parent's
+        if self._pid != os.getpid():
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"{os.getpid()}.dat")
+            # A plain ndarray view: arithmetic on np.memmap objects is several times slower
+            self._values = np.asarray(np.memmap(path, dtype=np.float64, mode='w+', shape=self.shape))
+            self._pid = os.getpid()
+        return self._values
+
+    def add(self, X, probabilities):
+        """Queue scored rows; they are binned and added to the file FLUSH_ROWS at a time"""
+        self._pending.append((X, probabilities))
+        self._pending_rows += len(X)
+        if self._pending_rows >= FLUSH_ROWS or time.monotonic() >= self._flush_at:
+            self.flush()
+
+    def flush(self):
+        # Swapping the list is atomic under the GIL; a row another thread queues
+        # into the old list at that moment may be lost, as in metrics.py
+        pending, self._pending = self._pending, []
+        self._pending_rows = 0
+        self._flush_at = time.monotonic() + FLUSH_INTERVAL
+        if not pending:
+            return
+        data = np.column_stack([np.concatenate([X for X, _ in pending]),
+                                np.concatenate([np.ravel(p) for _, p in pending])])
+        values = self._array()
+        centred = data - self.reference.mean
+        values[0] += len(data)
+        values[1] += centred.sum(axis=0)
+        values[2] += (centred * centred).sum(axis=0)
+        bins = bin_index(data, self.reference.edges) * self.shape[1] + self._first_bin
+        values += np.bincount(bins.ravel(), minlength=values.size).reshape(values.shape)
+
+    def collect(self):
+        """Sum the values written by every worker; return (totals, number of files)"""
+        total = np.zeros(self.shape)
+        files = 0
+        for path in glob.glob(os.path.join(self.directory, '*.dat')):
+            values = np.fromfile(path, dtype=np.float64)
+            # Files written with a different layout cannot be merged
+            if values.size == total.size:
+                total += values.reshape(self.shape)
+                files += 1
+        return total, files
+
+
+class DriftMonitor:
+    """Per-feature and probability drift against the reference data, per model version"""
+
+    def __init__(self, feature_names, features=None, directory=DRIFT_DIR):
+        self.names = list(feature_names) + ['probability']
+        self.features = features
+        self.directory = directory
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.features is not None
+
+    @classmethod
+    def from_env(cls, feature_names):
+        """Read the reference rows from DRIFT_REFERENCE, unless DRIFT_MONITOR=off"""
+        if os.getenv("DRIFT_MONITOR", "on") == "off":
+            return cls(feature_names)
+        path = os.getenv("DRIFT_REFERENCE", os.path.join(BASE_DIR, 'Cardiovascular_Disease_Dataset.csv'))
+        try:
+            features = sample_reference(path)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Drift monitor disabled; could not read reference data {path}: {str(e)}")
+            return cls(feature_names)
+        return cls(feature_names, features)
+
+    def window(self, version, model):
+        """The window of a model version, binning the model's scores on the reference rows when first used"""
+        window = self._windows.get(version)
+        if window is None:
+            with self._lock:
+                window = self._windows.get(version)
+                if window is None:
+                    probabilities = model.score(self.features)[1]
+                    reference = Reference(self.names, np.column_stack([self.features, probabilities]))
+                    window = Window(reference, os.path.join(self.directory, version))
+                    self._windows[version] = window
+        return window
+
+    def observe(self, version, model, X, probabilities):
+        """Record scored rows: X (rows x 12 features, not modified afterwards) and their probabilities"""
+        if self.features is not None:
+            self.window(version, model).add(X, probabilities)
+
+    def report(self, version, model):
+        """Live statistics and PSI of every series, summed over all workers"""
+        if self.features is None:
+            return {'enabled': False}
+        window = self.window(version, model)
+        # Include what this worker has queued; other workers' queues are at most FLUSH_ROWS rows
+        window.flush()
+        totals, workers = window.collect()
+        reference = window.reference
+        series = {}
+        for i, name in enumerate(reference.names):
+            count, total, squares = totals[:N_STATS, i]
+            n_bins = reference.n_bins[i]
+            expected = reference.proportions[i, :n_bins]
+            stats = {'count': int(count), 'mean': None, 'std': None, 'psi': None}
+            if count:
+                mean = total / count
+                stats['mean'] = float(reference.mean[i] + mean)
+                stats['std'] = float(np.sqrt(max(0.0, squares / count - mean * mean)))
+                stats['psi'] = psi(totals[N_STATS:N_STATS + n_bins, i] / count, expected)
+            stats['status'] = psi_status(stats['psi'])
+            stats['reference_mean'] = float(reference.mean[i])
+            stats['reference_std'] = float(reference.std[i])
+            stats['bins'] = {
+                'edges': reference.edges[i, :n_bins - 1].tolist(),
+                'reference': expected.tolist(),
+                'live': (totals[N_STATS:N_STATS + n_bins, i] / max(count, 1)).tolist(),
+            }
+            series[name] = stats
+        probability = series.pop('probability')
+        drifted = sorted((name for name, stats in series.items() if stats['status'] == 'significant'),
+                         key=lambda name: -series[name]['psi'])
+        return {
+            'enabled': True,
+            'model_version': version,
+            'predictions': probability['count'],
+            'workers': workers,
+            'thresholds': {'moderate': PSI_MODERATE, 'significant': PSI_SIGNIFICANT},
+            'drifted_features': drifted,
+            'probability': probability,
+            'features': series,
+        }
+
+
+def clear(directory=DRIFT_DIR):
+    """Remove the counts of previous runs; call once before workers start"""
+    for path in glob.glob(os.path.join(directory, '*')):
+        shutil.rmtree(path, ignore_errors=True)
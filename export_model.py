@@ -0,0 +1,37 @@
+"""Export the pickled model to a dependency-free .npz artifact.
+
+The artifact holds the weights, bias and scaler mean/scale, so serving with
+MODEL_PATH=heart_disease_model4.npz imports only NumPy (no scikit-learn).
+
+Usage: python export_model.py [--input heart_disease_model4.pkl] [--output heart_disease_model4.npz]
+"""
+import argparse
+import os
+
+import numpy as np
+
+from model import load_model, export_npz
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the pickled model to a .npz artifact")
+    parser.add_argument('--input', default=os.path.join(BASE_DIR, 'heart_disease_model4.pkl'))
+    parser.add_argument('--output', default=os.path.join(BASE_DIR, 'heart_disease_model4.npz'))
+    args = parser.parse_args()
+
+    model = load_model(args.input)
+    export_npz(model, args.output)
+
+    # Make sure the artifact scores exactly like the pickle it came from
+    exported = load_model(args.output)
+    X = model.scaler.mean_ + np.random.default_rng(0).standard_normal((1000, len(model.weights))) * model.scaler.scale_
+    if not np.array_equal(model.score(X)[1], exported.score(X)[1]):
+        raise SystemExit("Exported artifact does not reproduce the pickled model's scores")
+
+    print(f"Exported {args.input} -> {args.output} ({os.path.getsize(args.output)} bytes)")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,17 +1,82 @@
 # Gunicorn configuration file
+import gc
 import multiprocessing
+import os
+
+# WORKER_CLASS=sync (default) serves the Flask app with one request per worker at a time.
+# WORKER_CLASS=uvicorn serves asgi:app, whose async handlers keep many connections per worker.
+WORKER_CLASS = os.getenv("WORKER_CLASS", "sync")
+# Exported for the app: limits.py sizes the default /predict concurrency limit by it
+os.environ["WORKER_CLASS"] = WORKER_CLASS
 
 # Number of worker processes
-workers = multiprocessing.cpu_count() * 2 + 1
+if WORKER_CLASS == "uvicorn":
+    # Async workers don't block on I/O, so one per core is enough
+    workers = multiprocessing.cpu_count()
+else:
+    workers = multiprocessing.cpu_count() * 2 + 1
+# WEB_CONCURRENCY overrides the count; it is also exported for the app
+# (limits.py sizes the /predict concurrency limit by it). -w on the command
+# line still wins, so set WEB_CONCURRENCY instead when the limit matters.
+workers = int(os.getenv("WEB_CONCURRENCY", str(workers)))
+os.environ["WEB_CONCURRENCY"] = str(workers)
 
 # Socket to bind
 bind = "0.0.0.0:10000"
 
-# Use the standard sync worker instead of Uvicorn
-worker_class = "sync"
-
-# Application object - point directly to the Flask app
-wsgi_app = "main:app"
+if WORKER_CLASS == "uvicorn":
+    # Native ASGI handlers for /predict, /predict/batch and /send-email
+    worker_class = "uvicorn.workers.UvicornWorker"
+    wsgi_app = "asgi:app"
+else:
+    # Use the standard sync worker instead of Uvicorn
+    worker_class = "sync"
+    # Application object - point directly to the Flask app
+    wsgi_app = "main:app"
 
 # Timeout settings
-timeout = 120
\ No newline at end of file
+timeout = 120
+
+# PRELOAD=1 (default) imports the app, NumPy, Flask and the model once in the
+# master; workers are forked from it and share those pages copy-on-write.
+# Registry models are memory-mapped .npy files, so their weights stay in the
+# page cache once for all workers, even after a hot reload. Code changes then
+# need a full restart rather than a HUP.
+preload_app = os.getenv("PRELOAD", "1") == "1"
+
+if preload_app:
+    # Keep the garbage collector from freeing holes into, and later writing
+    # to, pages the workers will share while the app is imported. gunicorn
+    # preloads before on_starting, which freezes what the import allocated
+    # and switches the collector back on for the master's lifetime.
+    gc.disable()
+
+
+def on_starting(server):
+    if preload_app:
+        gc.freeze()
+        gc.enable()
+    # Drop per-worker metric and drift files left by a previous run before any worker starts
+    import drift
+    import metrics
+    metrics.clear()
+    drift.clear()
+    if server.cfg.workers != workers:
+        server.log.warning(f"Running {server.cfg.workers} workers, but the /predict concurrency limit was sized "
+                           f"for {workers}; set WEB_CONCURRENCY rather than -w")
+
+
+def pre_fork(server, worker):
+    if preload_app:
+        # Move everything the master allocated into the permanent generation, so
+        # collections in the workers never touch (and copy) the shared pages.
+        # Sender threads, SQLite connections and metric files are created
+        # lazily per process, so nothing else needs doing around the fork.
+        gc.freeze()
+
+
+def post_worker_init(worker):
+    # Start each worker's email senders as it boots, so jobs that a killed or
+    # recycled worker left in the queue are resumed without waiting for a new email
+    import main
+    main.email_queue.start()
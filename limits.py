@@ -0,0 +1,277 @@
+"""Admission control: per-client rate limits and per-endpoint concurrency limits.
+
+With sync workers every request holds a whole worker until it finishes, so a
+burst of large /send-email uploads can occupy all of them and leave nothing
+for / and /predict. Each limited endpoint therefore gets, on every host:
+
+- a token bucket per client (RATE requests per second, bursts up to BURST),
+  kept in a SQLite table under STATE_DIR so all workers draw from the same
+  bucket. Over the limit the request gets 429 with Retry-After.
+- at most CONCURRENCY requests in flight across all workers. The slots are
+  lock files under STATE_DIR taken with a non-blocking flock, so a crashed
+  worker never leaks one. With every slot taken the request gets 503 at once,
+  before its body is read, instead of waiting for a worker.
+
+Limits are read from <ENDPOINT>_RATE, <ENDPOINT>_BURST and
+<ENDPOINT>_CONCURRENCY (e.g. SEND_EMAIL_CONCURRENCY=2); 0 disables a limit,
+and ADMISSION_CONTROL=off disables them all (for load tests). With sync
+workers the /predict concurrency defaults to the number of gunicorn workers
+(WEB_CONCURRENCY); with async workers (WORKER_CLASS=uvicorn) /predict has
+no concurrency limit by default, since one worker serves many at once.
+
+Rate limits are opt-in, because they are only as good as the client key.
+Behind a reverse proxy every request comes from the proxy's address, so
+keying on it would put the whole site in one bucket. Set
+RATE_LIMIT_CLIENT_HEADER to the header the proxy fills in (e.g.
+X-Forwarded-For). The client is then the entry TRUSTED_PROXY_HOPS places
+from the right (default 1, the address the nearest proxy saw); entries
+further left come from the client and can be forged. When the app is
+exposed directly, set RATE_LIMIT_BY_PEER=1 to key on the socket address.
+Without either, only the concurrency limits apply.
+
+The shared buckets need SQLite 3.35 or later (UPSERT ... RETURNING). With
+an older SQLite, or RATE_LIMIT_STORE=worker, each worker keeps its own
+buckets in memory; a client may then get up to one bucket's worth per
+worker.
+"""
+import fcntl
+import logging
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+from state import SQLiteConnections, state_dir, state_path
+
+logger = logging.getLogger(__name__)
+
+Limit = namedtuple('Limit', 'rate burst concurrency')
+
+# Defaults per endpoint; keep the concurrency of the slow endpoints below the
+# number of workers so some are always free for the rest. A concurrency of
+# None means one per sync worker, and no limit under async workers, which
+# each serve many requests at once.
+DEFAULT_LIMITS = {
+    'predict': Limit(rate=20.0, burst=40, concurrency=None),
+    'predict_batch': Limit(rate=1.0, burst=5, concurrency=2),
+    'send_email': Limit(rate=0.2, burst=5, concurrency=2),
+}
+
+# Header naming the client when behind a proxy (e.g. X-Forwarded-For)
+CLIENT_HEADER = os.getenv("RATE_LIMIT_CLIENT_HEADER", "")
+# Proxies in front of the app that append to CLIENT_HEADER; the client is that many entries from the right
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "1"))
+# Key rate limits on the socket peer address (only when clients connect directly)
+BY_PEER = os.getenv("RATE_LIMIT_BY_PEER", "0") == "1"
+
+# UPSERT ... RETURNING, which the shared buckets are updated with
+SHARED_BUCKETS_SQLITE = (3, 35, 0)
+
+
+def worker_count():
+    """Workers on this host: WEB_CONCURRENCY (set by gunicorn_conf.py), else gunicorn_conf's default"""
+    return int(os.getenv("WEB_CONCURRENCY", str((os.cpu_count() or 1) * 2 + 1)))
+
+
+def async_workers():
+    """Whether gunicorn runs async workers (WORKER_CLASS=uvicorn, exported by gunicorn_conf.py)"""
+    return os.getenv("WORKER_CLASS", "sync") == "uvicorn"
+
+
+def rate_limits_enabled():
+    return bool(CLIENT_HEADER) or BY_PEER
+
+
+def limits_from_env(defaults=DEFAULT_LIMITS):
+    if os.getenv("ADMISSION_CONTROL", "on") == "off":
+        return {}
+    rate_limits = rate_limits_enabled()
+    if not rate_limits:
+        logger.info("Rate limits are off; set RATE_LIMIT_CLIENT_HEADER (behind a proxy) "
+                    "or RATE_LIMIT_BY_PEER=1 to enable them")
+    limits = {}
+    for endpoint, default in defaults.items():
+        prefix = endpoint.upper()
+        concurrency = default.concurrency
+        if concurrency is None:
+            concurrency = 0 if async_workers() else worker_count()
+        limits[endpoint] = Limit(
+            rate=float(os.getenv(f"{prefix}_RATE", str(default.rate))) if rate_limits else 0.0,
+            burst=float(os.getenv(f"{prefix}_BURST", str(default.burst))),
+            concurrency=int(os.getenv(f"{prefix}_CONCURRENCY", str(concurrency))),
+        )
+    return limits
+
+
+class RateLimiter:
+    """Token buckets keyed by (endpoint, client) in a SQLite table shared by every worker"""
+
+    def __init__(self, path=None):
+        self.path = path or state_path('rate_limits.db')
+        self._connect = SQLiteConnections(self.path, isolation_level=None, synchronous='NORMAL')
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS buckets "
+                         "(key TEXT PRIMARY KEY, tokens REAL, updated REAL, allowed INTEGER)")
+
+    def acquire(self, key, rate, burst):
+        """Take one token from the bucket; return 0 if allowed, else seconds until a token is free"""
+        now = time.time()
+        # One statement refills, checks and takes the token, so concurrent
+        # workers cannot both spend the last one. SET expressions all see the
+        # row as it was before the update.
+        row = self._connect().execute(
+            """
+            INSERT INTO buckets (key, tokens, updated, allowed) VALUES (:key, :burst - 1, :now, 1)
+            ON CONFLICT(key) DO UPDATE SET
+                tokens = min(:burst, tokens + max(0, :now - updated) * :rate)
+                         - (min(:burst, tokens + max(0, :now - updated) * :rate) >= 1),
+                allowed = min(:burst, tokens + max(0, :now - updated) * :rate) >= 1,
+                updated = max(updated, :now)
+            RETURNING allowed, tokens
+            """,
+            {'key': key, 'rate': rate, 'burst': burst, 'now': now}
+        ).fetchone()
+        if random.random() < 0.001:
+            self.purge(now)
+        allowed, tokens = row
+        return 0.0 if allowed else (1 - tokens) / rate
+
+    def purge(self, now=None):
+        # Buckets idle for an hour are full again; dropping them changes nothing
+        now = time.time() if now is None else now
+        self._connect().execute("DELETE FROM buckets WHERE updated < ?", (now - 3600,))
+
+
+class WorkerRateLimiter:
+    """Token buckets kept in this worker's memory, for when the shared ones are unavailable"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def acquire(self, key, rate, burst):
+        """Take one token from the bucket; return 0 if allowed, else seconds until a token is free"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            allowed = tokens >= 1
+            self._buckets[key] = (tokens - allowed, now)
+            if len(self._buckets) > 100000:
+                # Idle buckets are full again; dropping them changes nothing
+                self._buckets = {k: v for k, v in self._buckets.items() if now - v[1] < 3600}
+        return 0.0 if allowed else (1 - tokens) / rate
+
+
+def make_rate_limiter():
+    """Shared SQLite buckets, or per-worker ones with RATE_LIMIT_STORE=worker or an old SQLite"""
+    if os.getenv("RATE_LIMIT_STORE", "shared") == "worker":
+        return WorkerRateLimiter()
+    if sqlite3.sqlite_version_info < SHARED_BUCKETS_SQLITE:
+        logger.warning(f"SQLite {sqlite3.sqlite_version} is older than 3.35; "
+                       f"rate limit buckets are kept per worker instead of shared")
+        return WorkerRateLimiter()
+    return RateLimiter()
+
+
+class ConcurrencyLimiter:
+    """At most `limit` holders at a time across all workers, using flock'ed slot files"""
+
+    def __init__(self, name, limit, directory=None):
+        self.limit = limit
+        directory = directory or state_dir('slots')
+        self._paths = [os.path.join(directory, f"{name}.{i}") for i in range(limit)]
+        self._lock = threading.Lock()
+        self._pid = None
+        self._files = []
+        self._held = set()
+
+    def _slot_files(self):
+        # Lock files are opened once per process; flock locks belong to the open file
+        if self._pid != os.getpid():
+            self._files = [os.open(path, os.O_RDWR | os.O_CREAT, 0o644) for path in self._paths]
+            self._held = set()
+            self._pid = os.getpid()
+        return self._files
+
+    def try_acquire(self):
+        """Take a free slot without waiting; return its index, or None when all are busy"""
+        with self._lock:
+            for i, fd in enumerate(self._slot_files()):
+                if i in self._held:
+                    # Another thread of this process has it; flock would let us share it
+                    continue
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+                self._held.add(i)
+                return i
+        return None
+
+    def release(self, slot):
+        with self._lock:
+            fcntl.flock(self._files[slot], fcntl.LOCK_UN)
+            self._held.discard(slot)
+
+
+class AdmissionControl:
+    """Rate and concurrency limits for the endpoints named in limits"""
+
+    def __init__(self, limits):
+        self.limits = {endpoint: limit for endpoint, limit in limits.items() if limit.rate > 0 or limit.concurrency > 0}
+        self._rates = make_rate_limiter() if any(limit.rate > 0 for limit in self.limits.values()) else None
+        # admit() may wait on the shared SQLite buckets; async callers should run it on a thread
+        self.blocking = isinstance(self._rates, RateLimiter)
+        self._slots = {endpoint: ConcurrencyLimiter(endpoint, limit.concurrency)
+                       for endpoint, limit in self.limits.items() if limit.concurrency > 0}
+
+    def admit(self, endpoint, client):
+        """Return (None, ticket) to go ahead, or (status, retry_after) to turn the request away.
+
+        Pass the ticket to release() once the response is done.
+        """
+        limit = self.limits.get(endpoint)
+        if limit is None:
+            return None, None
+        if limit.rate > 0:
+            retry_after = self._rates.acquire(f"{endpoint}:{client}", limit.rate, limit.burst)
+            if retry_after:
+                return 429, retry_after
+        slots = self._slots.get(endpoint)
+        if slots is None:
+            return None, None
+        slot = slots.try_acquire()
+        if slot is None:
+            return 503, 1.0
+        return None, (slots, slot)
+
+    @staticmethod
+    def release(ticket):
+        if ticket is not None:
+            slots, slot = ticket
+            slots.release(slot)
+
+
+def client_id(remote_addr, get_header):
+    """The client a rate limit applies to; get_header looks up a request header by name"""
+    if CLIENT_HEADER:
+        forwarded = get_header(CLIENT_HEADER)
+        if forwarded:
+            # Trusted proxies append on the right; anything left of them is the client's to forge
+            entries = [entry.strip() for entry in forwarded.split(',')]
+            return entries[max(0, len(entries) - TRUSTED_PROXY_HOPS)]
+    return remote_addr or 'unknown'
+
+
+def rejection(status, retry_after):
+    """The JSON body and Retry-After header value for a request turned away with status"""
+    if status == 429:
+        message = "Too many requests from this client; retry later"
+    else:
+        message = "Server is at capacity for this endpoint; retry shortly"
+    return {'error': message, 'retry_after': round(retry_after, 3)}, str(max(1, math.ceil(retry_after)))
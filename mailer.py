@@ -0,0 +1,279 @@
+"""Background email delivery over a small pool of persistent SMTP connections.
+
+Request handlers hand a finished MIME message to EmailQueue.submit() and get
+a job id back straight away. The serialized message is stored with the job
+in a SQLite table under STATE_DIR, which is the queue: sender threads in
+every worker claim pending rows from it, keep one authenticated SMTP
+connection open each, and record the outcome there, so any gunicorn worker
+can answer a status query for any job.
+
+A claimed job is leased to its sender for SMTP_JOB_LEASE seconds. If the
+worker is killed or recycled (max_requests) before delivery, the job is
+still in the table and another sender claims it when it is due or its lease
+runs out, so delivery is at least once. Failed sends are retried with
+exponential backoff by setting when the row is next due, not by holding a
+thread. Senders start in each worker after it boots (see
+gunicorn_conf.post_worker_init), or on the first submit() outside gunicorn.
+"""
+import logging
+import os
+import queue
+import smtplib
+import ssl
+import threading
+import time
+import uuid
+
+from metrics import EMAIL_JOBS, SMTP_SEND_LATENCY
+from state import SQLiteConnections, state_path
+
+logger = logging.getLogger(__name__)
+
+# SMTP configuration - point SMTP_HOST/SMTP_PORT at a local stand-in server for testing
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "465"))
+# "ssl" for implicit TLS (port 465), "starttls" to upgrade a plain connection, "none" for local test servers
+SMTP_SECURITY = os.getenv("SMTP_SECURITY", "ssl").lower()
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "2"))
+# Retries after the first attempt: a job is tried up to SMTP_MAX_RETRIES + 1 times
+SMTP_MAX_RETRIES = int(os.getenv("SMTP_MAX_RETRIES", "3"))
+SMTP_RETRY_BACKOFF = float(os.getenv("SMTP_RETRY_BACKOFF", "1.0"))
+# Close a pooled connection after this many idle seconds, before the server drops it
+SMTP_IDLE_TIMEOUT = float(os.getenv("SMTP_IDLE_TIMEOUT", "60"))
+# Seconds a sender owns a claimed job; past that another sender may take it over
+SMTP_JOB_LEASE = float(os.getenv("SMTP_JOB_LEASE", "300"))
+# Idle senders look for due retries and abandoned jobs this often
+SMTP_POLL_INTERVAL = float(os.getenv("SMTP_POLL_INTERVAL", "1.0"))
+
+# Errors that will not go away by sending again
+PERMANENT_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused)
+
+
+class JobStore:
+    """Email jobs and their messages in a SQLite table shared by all workers"""
+    def __init__(self, path):
+        self.path = path
+        # Autocommit; claim() opens its own transaction
+        self._connect = SQLiteConnections(path, timeout=10, isolation_level=None, synchronous='NORMAL')
+        with self._connect() as conn:
+            # WAL without a full fsync per commit keeps submit() cheap enough for the event loop
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY, status TEXT, recipient TEXT, attempts INTEGER,"
+                " error TEXT, created REAL, updated REAL)"
+            )
+            # Columns added when the table became the queue; older tables gain them here
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column in ('sender TEXT', 'message TEXT', 'due REAL'):
+                if column.split()[0] not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column}")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (due) "
+                         "WHERE status IN ('queued', 'sending', 'retrying')")
+    
+    def create(self, job_id, sender, recipient, message):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, recipient, attempts, error, created, updated, sender, message, due)"
+                " VALUES (?, 'queued', ?, 0, NULL, ?, ?, ?, ?, ?)",
+                (job_id, recipient, now, now, sender, message, now)
+            )
+    
+    def claim(self, lease):
+        """Take the oldest due job for lease seconds; return (job_id, sender, recipient, message, attempt) or None.
+
+        Due jobs are new ones, retries whose backoff has passed and jobs whose
+        sender's lease ran out (its worker died, say).
+        """
+        now = time.time()
+        conn = self._connect()
+        # IMMEDIATE takes the write lock up front, so two senders cannot claim the same row
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT id, status, sender, recipient, message, attempts FROM jobs"
+                " WHERE status IN ('queued', 'sending', 'retrying') AND due <= ? ORDER BY due LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = 'sending', attempts = attempts + 1, due = ?, updated = ? WHERE id = ?",
+                    (now + lease, now, row[0])
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if row is None:
+            return None
+        job_id, status, sender, recipient, message, attempts = row
+        if status == 'sending':
+            logger.warning(f"Email job {job_id} was abandoned during attempt {attempts}; resuming it")
+        return job_id, sender, recipient, message, attempts + 1
+    
+    def finish(self, job_id, status, attempts, error=None, retry_at=None):
+        """Record the outcome of an attempt: 'sent', 'failed', or 'retrying' again at retry_at"""
+        with self._connect() as conn:
+            if status == 'retrying':
+                conn.execute(
+                    "UPDATE jobs SET status = ?, attempts = ?, error = ?, updated = ?, due = ? WHERE id = ?",
+                    (status, attempts, error, time.time(), retry_at, job_id)
+                )
+            else:
+                # The message is no longer needed once the job is done
+                conn.execute(
+                    "UPDATE jobs SET status = ?, attempts = ?, error = ?, updated = ?, message = NULL WHERE id = ?",
+                    (status, attempts, error, time.time(), job_id)
+                )
+    
+    def get(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, status, recipient, attempts, error, created, updated FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ('job_id', 'status', 'recipient', 'attempts', 'error', 'created', 'updated')
+        return dict(zip(keys, row))
+
+
+class SMTPConnection:
+    """One persistent, authenticated SMTP connection, reopened on demand"""
+    def __init__(self, host, port, security, username, password, timeout):
+        self.host = host
+        self.port = port
+        self.security = security
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.server = None
+    
+    def open(self):
+        if self.security == 'ssl':
+            server = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout,
+                                      context=ssl.create_default_context())
+        else:
+            server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.security == 'starttls':
+                server.starttls(context=ssl.create_default_context())
+        if self.username and self.password:
+            server.login(self.username, self.password)
+        self.server = server
+        logger.info(f"Opened SMTP connection to {self.host}:{self.port}")
+    
+    def send(self, sender, recipient, message):
+        if self.server is None:
+            self.open()
+        self.server.sendmail(sender, recipient, message)
+    
+    def close(self):
+        if self.server is None:
+            return
+        try:
+            self.server.quit()
+        except Exception:
+            pass
+        self.server = None
+
+
+class EmailQueue:
+    """Jobs in the shared JobStore, drained by a pool of sender threads in each worker"""
+    def __init__(self, username=None, password=None, host=SMTP_HOST, port=SMTP_PORT,
+                 security=SMTP_SECURITY, pool_size=SMTP_POOL_SIZE, max_retries=SMTP_MAX_RETRIES,
+                 retry_backoff=SMTP_RETRY_BACKOFF, idle_timeout=SMTP_IDLE_TIMEOUT,
+                 timeout=SMTP_TIMEOUT, lease=SMTP_JOB_LEASE, poll_interval=SMTP_POLL_INTERVAL,
+                 store_path=None):
+        self.username = username
+        self.password = password
+        self.host = host
+        self.port = port
+        self.security = security
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.store = JobStore(store_path or state_path('email_jobs.db'))
+        # Wakes this worker's idle senders when it queues a job
+        self._wakeup = queue.Queue()
+        self._lock = threading.Lock()
+        self._pid = None
+    
+    def start(self):
+        """Start this process's sender threads, once; they also resume jobs other workers left behind"""
+        # Threads do not survive fork, so they are started in the process that sends
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._wakeup = queue.Queue()
+            for i in range(self.pool_size):
+                thread = threading.Thread(target=self._run, name=f"smtp-sender-{i}", daemon=True)
+                thread.start()
+            self._pid = os.getpid()
+    
+    def submit(self, sender, recipient, message):
+        """Queue a message (a MIME object or string) and return its job id"""
+        job_id = uuid.uuid4().hex
+        # Serialized now, so the job can be sent by any worker even if this one dies
+        if not isinstance(message, str):
+            message = message.as_string()
+        self.store.create(job_id, sender, recipient, message)
+        self.start()
+        self._wakeup.put(None)
+        return job_id
+    
+    def status(self, job_id):
+        return self.store.get(job_id)
+    
+    def _run(self):
+        connection = SMTPConnection(self.host, self.port, self.security, self.username,
+                                    self.password, self.timeout)
+        idle_since = time.monotonic()
+        while True:
+            try:
+                job = self.store.claim(self.lease)
+            except Exception as e:
+                logger.error(f"Could not claim an email job: {str(e)}")
+                job = None
+            if job is not None:
+                try:
+                    self._deliver(connection, *job)
+                except Exception as e:
+                    # E.g. the job table stayed locked; the job's lease runs out and it is claimed again
+                    logger.error(f"Could not deliver email job {job[0]}: {str(e)}", exc_info=True)
+                idle_since = time.monotonic()
+                continue
+            if time.monotonic() - idle_since >= self.idle_timeout:
+                connection.close()
+            try:
+                self._wakeup.get(timeout=self.poll_interval)
+            except queue.Empty:
+                pass
+    
+    def _deliver(self, connection, job_id, sender, recipient, message, attempt):
+        start = time.perf_counter()
+        try:
+            connection.send(sender, recipient, message)
+        except Exception as smtp_error:
+            SMTP_SEND_LATENCY.observe(time.perf_counter() - start, outcome='error')
+            # Drop the connection - the next attempt starts from a fresh login
+            connection.close()
+            logger.error(f"SMTP error for job {job_id} (attempt {attempt}): {str(smtp_error)}")
+            if isinstance(smtp_error, PERMANENT_ERRORS) or attempt > self.max_retries:
+                EMAIL_JOBS.inc(status='failed')
+                self.store.finish(job_id, 'failed', attempt, str(smtp_error))
+            else:
+                retry_at = time.time() + self.retry_backoff * 2 ** (attempt - 1)
+                self.store.finish(job_id, 'retrying', attempt, str(smtp_error), retry_at=retry_at)
+            return
+        SMTP_SEND_LATENCY.observe(time.perf_counter() - start, outcome='sent')
+        EMAIL_JOBS.inc(status='sent')
+        self.store.finish(job_id, 'sent', attempt)
+        logger.info(f"Email job {job_id} sent to {recipient} (attempt {attempt})")
@@ -1,317 +1,358 @@
-from flask import Flask, render_template, request, jsonify
-import pickle
+from flask import Flask, Response, g, render_template, request, jsonify
+from werkzeug.exceptions import RequestEntityTooLarge
 import numpy as np
 import os
-import uvicorn
+import time
 from dotenv import load_dotenv
 load_dotenv()
 # Add email functionality
-import smtplib
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
-import ssl
 import logging
 from email.mime.base import MIMEBase
 from email import encoders
 import base64
+import hmac
 import re
-from sklearn.preprocessing import StandardScaler
-
-# Add WSGI to ASGI adapter - fix the import
-from asgiref.wsgi import WsgiToAsgi
-
-# Define a custom LogisticRegression class that EXACTLY matches your implementation
-class LogisticRegression:
-    def __init__(self, learning_rate=0.01, max_iter=1000, lambda_=0.01, verbose=False, scaler=None):
-        self.learning_rate = learning_rate
-        self.max_iter = max_iter
-        self.lambda_ = lambda_
-        self.verbose = verbose
-        self.scaler = scaler
-        self.weights = None
-        self.bias = None
-    
-    def predict(self, X):
-        # Convert to numpy array if needed
-        X = np.asarray(X)
-        # Apply scaler if available
-        if hasattr(self, 'scaler') and self.scaler is not None:
-            X = self.scaler.transform(X)
-        # Calculate z = X.W + b
-        z = np.dot(X, self.weights) + self.bias
-        # Apply sigmoid function
-        y_pred = 1 / (1 + np.exp(-z))
-        # Convert to binary predictions (0 or 1)
-        return (y_pred > 0.5).astype(int)
-    
-    def predict_proba(self, X):
-        # Convert to numpy array if needed
-        X = np.asarray(X)
-        # Apply scaler if available
-        if hasattr(self, 'scaler') and self.scaler is not None:
-            X = self.scaler.transform(X)
-        # Calculate z = X.W + b
-        z = np.dot(X, self.weights) + self.bias
-        # Apply sigmoid function to get probabilities
-        y_pred = 1 / (1 + np.exp(-z))
-        # Return probabilities for both classes [P(0), P(1)]
-        return np.column_stack([1 - y_pred, y_pred])
+import csv
+import io
+import json
+from urllib.parse import urlencode
+
+from registry import ModelRegistry
+from mailer import EmailQueue
+from report import ReportCache, render_report, report_key
+from cache import cache_key, make_result_cache
+from rules import evaluate_rules, get_recommendations, get_contributing_factors
+from schema import VALIDATION_RANGES, FeatureSchema, error_body, load_json_object
+from limits import AdmissionControl, client_id, limits_from_env, rejection
+from assets import REVALIDATE, Asset, StaticAssets
+from drift import DriftMonitor
+import metrics
+from metrics import (REQUESTS, REQUEST_LATENCY, PREDICT_STAGE_LATENCY, PREDICTION_CACHE_LOOKUPS,
+                     BATCH_ROWS, ADMISSION_REJECTIONS)
 
 app = Flask(__name__)
 
-# Create an ASGI application with the correct class name
-asgi_app = WsgiToAsgi(app)
+def __getattr__(name):
+    # Create the ASGI application only when something asks for main:asgi_app,
+    # so sync workers never import asgiref
+    if name == 'asgi_app':
+        from asgiref.wsgi import WsgiToAsgi
+        global asgi_app
+        asgi_app = WsgiToAsgi(app)
+        return asgi_app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Register the LogisticRegression class in the main module
-# This is crucial - we need to make the class available with the EXACT same name
-# that was used when the model was pickled
-import sys
-sys.modules['__main__'].LogisticRegression = LogisticRegression
-
-# Load the model
+# Load the model from the versioned registry in ./models (see registry.py),
+# or from the single file named by MODEL_PATH. Registry versions are
+# memory-mapped .npy files and switch without a restart; call
+# models.current() per request rather than holding on to a model.
 try:
-    model_path = os.path.join(os.path.dirname(__file__), 'heart_disease_model4.pkl')
-    with open(model_path, 'rb') as f:
-        logger.info("Loading model from %s", model_path)
-        model = pickle.load(f)
-        logger.info("Model loaded successfully: %s", type(model).__name__)
-        
-        # Check if model has expected attributes
-        if hasattr(model, 'weights'):
-            logger.info(f"Model weights shape: {model.weights.shape}")
-        else:
-            logger.error("Model does not have 'weights' attribute!")
-            
-        if hasattr(model, 'bias'):
-            logger.info(f"Model bias: {model.bias}")
-        else:
-            logger.error("Model does not have 'bias' attribute!")
+    models = ModelRegistry.from_env()
+    version, model = models.current()
+    logger.info("Model %s loaded successfully: %s", version, type(model).__name__)
+    
+    # Check if model has expected attributes
+    if hasattr(model, 'weights'):
+        logger.info(f"Model weights shape: {model.weights.shape}")
+    else:
+        logger.error("Model does not have 'weights' attribute!")
         
+    if hasattr(model, 'bias'):
+        logger.info(f"Model bias: {model.bias}")
+    else:
+        logger.error("Model does not have 'bias' attribute!")
+    
 except Exception as e:
     logger.error("Error loading model: %s", str(e))
     logger.error("Traceback:", exc_info=True)
     raise
 
+# Bearer token for the /admin endpoints; they are disabled when it is unset
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN") or None
+# Example values and short tokens would let anyone switch the live model
+PLACEHOLDER_TOKENS = {'change-me', 'changeme', 'secret', 'admin', 'token', 'your_admin_token'}
+MIN_ADMIN_TOKEN_LENGTH = 16
+if ADMIN_TOKEN is not None and (ADMIN_TOKEN.lower() in PLACEHOLDER_TOKENS or len(ADMIN_TOKEN) < MIN_ADMIN_TOKEN_LENGTH):
+    logger.error(f"ADMIN_TOKEN is a placeholder or shorter than {MIN_ADMIN_TOKEN_LENGTH} characters; "
+                 f"admin endpoints are disabled. Generate one with: python -c 'import secrets; print(secrets.token_urlsafe(32))'")
+    ADMIN_TOKEN = None
+
 # Define validation ranges based on the dataset
-validation_ranges = {
-    'age': (20, 80),
-    'gender': (0, 1),
-    'chestpain': (0, 3),
-    'trestbps': (94, 200),
-    'chol': (0, 602),
-    'fbs': (0, 1),
-    'restecg': (0, 2),
-    'thalach': (71, 202),
-    'exang': (0, 1),
-    'oldpeak': (0, 6.2),
-    'slope': (0, 3),
-    'ca': (0, 3)
+validation_ranges = VALIDATION_RANGES
+
+# Expected feature names (must match the model's training features)
+feature_names = ['age', 'gender', 'chestpain', 'trestbps', 'chol', 'fbs',
+                 'restecg', 'thalach', 'exang', 'oldpeak', 'slope', 'ca']
+
+feature_index = {name: i for i, name in enumerate(feature_names)}
+feature_name_array = np.array(feature_names, dtype=object)
+
+# Column names used in Cardiovascular_Disease_Dataset.csv, mapped to the feature names above
+dataset_columns = {
+    'age': 'age',
+    'gender': 'gender',
+    'chestpain': 'chestpain',
+    'restingBP': 'trestbps',
+    'serumcholestrol': 'chol',
+    'fastingbloodsugar': 'fbs',
+    'restingrelectro': 'restecg',
+    'maxheartrate': 'thalach',
+    'exerciseangia': 'exang',
+    'oldpeak': 'oldpeak',
+    'slope': 'slope',
+    'noofmajorvessels': 'ca'
 }
 
+# Range bounds as arrays, in feature order, for vectorized validation
+range_min = np.array([validation_ranges[name][0] for name in feature_names], dtype=float)
+range_max = np.array([validation_ranges[name][1] for name in feature_names], dtype=float)
+
+# Compiled once from validation_ranges; checks the inputs of /predict, /report and /send-email
+feature_schema = FeatureSchema(feature_names, validation_ranges)
+
+# Rendered PDF reports, keyed by a hash of the model version and the 12 inputs
+report_cache = ReportCache(maxsize=int(os.getenv("REPORT_CACHE_SIZE", "256")))
+
+# Full /predict responses for recently seen inputs (PREDICTION_CACHE=off disables it)
+prediction_cache = make_result_cache()
+
+# Upper bound on the number of patients accepted in one batch request
+MAX_BATCH_ROWS = int(os.getenv("MAX_BATCH_ROWS", "50000"))
+# Batch bodies may be larger than any other request: allow up to 1 KiB per row
+MAX_BATCH_BYTES = MAX_BATCH_ROWS * 1024
+
 # Email configuration
 EMAIL_SENDER = os.getenv("EMAIL")
 # This should be an app password, not your regular Gmail password
 EMAIL_PASSWORD = os.getenv("PASSWORD")
 DOCTOR_EMAIL = "s.f.meisser87@gmail.com"
 
-def get_recommendations(probability, prediction, features):
-    """Generate personalized recommendations based on risk level and features"""
-    risk_percentage = probability * 100
-    age = features[0]
-    gender = features[1]
-    cholesterol = features[4]
-    blood_sugar = features[5]
-    
-    lifestyle_recs = []
-    monitoring_recs = []
-    medical_recs = []
-    
-    # Age-specific recommendations
-    if age > 60:
-        lifestyle_recs.append("Consider low-impact exercises like swimming or walking")
-        if risk_percentage > 50:
-            monitoring_recs.append("More frequent check-ups recommended for seniors with elevated risk")
-    else:
-        lifestyle_recs.append("Regular moderate to vigorous exercise is recommended")
+# Largest PDF report accepted by /send-email, in bytes
+MAX_PDF_BYTES = int(os.getenv("MAX_PDF_BYTES", str(10 * 1024 * 1024)))
+# Read uploads in multiples of 57 bytes so every chunk encodes to whole 76-character base64 lines
+PDF_ENCODE_CHUNK = 57 * 1024
+# Let the legacy data URI field through form parsing; its size is checked against MAX_PDF_BYTES later
+app.config['MAX_FORM_MEMORY_SIZE'] = MAX_PDF_BYTES * 4 // 3 + 1024
+# Largest request body: the data URI form (the biggest legitimate /send-email body) plus
+# room for the other fields and multipart framing. Longer bodies get a 413 before
+# anything is read, so an oversized pdfFile part is never spooled to disk.
+MAX_REQUEST_BYTES = app.config['MAX_FORM_MEMORY_SIZE'] + 64 * 1024
+app.config['MAX_CONTENT_LENGTH'] = MAX_REQUEST_BYTES
+
+# Outgoing emails are delivered by background senders over pooled SMTP connections
+email_queue = EmailQueue(username=EMAIL_SENDER, password=EMAIL_PASSWORD)
+
+# Per-client rate limits and per-endpoint concurrency limits, shared by all workers (see limits.py)
+admission = AdmissionControl(limits_from_env())
+
+# Fingerprinted, precompressed copies of static/ (see assets.py); templates link to them
+static_assets = StaticAssets.from_env()
+if static_assets.enabled:
+    app.jinja_env.globals['url_for'] = static_assets.url_for
+# The rendered index page; it has no per-request content
+index_page = None
+
+# Live input and score distributions against the training CSV, summed over workers by /drift (see drift.py)
+drift_monitor = DriftMonitor.from_env(feature_names)
+if drift_monitor.enabled:
+    # Bin the served model's scores on the reference rows now rather than on the first request
+    drift_monitor.window(version, model)
+
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+@app.before_request
+def batch_body_limit():
+    if request.endpoint == 'predict_batch':
+        request.max_content_length = MAX_BATCH_BYTES
+
+@app.before_request
+def admit_request():
+    # Turn excess requests away before their body is read, rather than queueing them for a worker
+    status, detail = admission.admit(request.endpoint, client_id(request.remote_addr, request.headers.get))
+    if status is not None:
+        ADMISSION_REJECTIONS.inc(endpoint=request.endpoint, reason='rate' if status == 429 else 'concurrency')
+        body, retry_after = rejection(status, detail)
+        return jsonify(body), status, {'Retry-After': retry_after}
+    g.admission_ticket = detail
+
+@app.teardown_request
+def release_admission(exc):
+    admission.release(g.pop('admission_ticket', None))
+
+@app.after_request
+def record_request(response):
+    endpoint = request.endpoint if request.endpoint in metrics.ENDPOINTS else 'other'
+    status = f"{response.status_code // 100}xx"
+    if status in metrics.STATUS_CLASSES:
+        REQUESTS.inc(endpoint=endpoint, status=status)
+    if 'request_start' in g:
+        REQUEST_LATENCY.observe(time.perf_counter() - g.request_start, endpoint=endpoint)
+    return response
+
+@app.route('/metrics', methods=['GET'], endpoint='metrics')
+def metrics_endpoint():
+    # Aggregated over every gunicorn worker on this host
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/')
+def home():
+    global index_page
+    if not static_assets.enabled:
+        return render_template('index.html')
+    if index_page is None:
+        index_page = Asset.from_bytes(render_template('index.html').encode('utf-8'), 'text/html', REVALIDATE)
+    return index_page.response(request)
+
+@app.route('/assets/<path:filename>', endpoint='assets')
+def serve_asset(filename):
+    asset = static_assets.files.get(filename)
+    if asset is None:
+        return jsonify({'error': 'Not found'}), 404
+    return asset.response(request)
+
+def parse_features(values):
+    """Read and validate the 12 inputs from a form, query string or JSON object.
+
+    Returns (features, errors): a float64 array in model feature order, and
+    None or a {field: message} dict with every failing field.
+    """
+    return feature_schema.parse(values)
+
+def request_values():
+    """The assessment inputs of the current request: its JSON object or its form"""
+    if request.is_json:
+        return load_json_object(request.get_data())
+    return request.form
+
+def build_result(probability, prediction, features, recommendations=None, factors=None):
+    """Build the /predict response body for one scored patient"""
+    # Calculate model confidence (simplified for demonstration)
+    confidence = 85 + (5 * abs(probability - 0.5) * 2)  # Higher confidence the further from 0.5
     
-    # Cholesterol-specific recommendations
-    if cholesterol > 200:
-        lifestyle_recs.append("Focus on reducing saturated fat and increasing fiber in your diet")
-        lifestyle_recs.append("Consider foods rich in omega-3 fatty acids")
-        monitoring_recs.append("Regular cholesterol monitoring every 3-6 months")
-        
-    # Blood sugar-specific recommendations
-    if blood_sugar == 1:
-        lifestyle_recs.append("Monitor carbohydrate intake and follow a balanced diet")
-        lifestyle_recs.append("Maintain regular meal times to help control blood sugar")
-        monitoring_recs.append("Regular blood glucose testing as advised by your doctor")
-    
-    # General recommendations based on risk
-    if risk_percentage < 30:
-        medical_recs.append("Discuss these results at your next regular check-up")
-        medical_recs.append("Continue preventive healthcare measures")
-    elif risk_percentage < 70:
-        medical_recs.append("Schedule an appointment with your doctor within the next month")
-        medical_recs.append("Consider discussing preventive medications with your healthcare provider")
-    else:
-        medical_recs.append("Seek prompt medical attention to discuss these results")
-        medical_recs.append("Consult with a cardiologist for specialized care")
-        
+    if recommendations is None:
+        recommendations = get_recommendations(probability, prediction, features)
+    if factors is None:
+        factors = get_contributing_factors(features, prediction)
     return {
-        "lifestyle": lifestyle_recs,
-        "monitoring": monitoring_recs,
-        "medical": medical_recs
+        'prediction': int(prediction),
+        'probability': float(probability),
+        'message': 'High risk of heart disease' if prediction == 1 else 'Low risk of heart disease',
+        'recommendations': recommendations,
+        'contributing_factors': factors,
+        'confidence': float(confidence)
     }
 
-def get_contributing_factors(features, prediction):
-    """Identify key contributing factors for the prediction"""
-    # Extract features for easier reference
-    age, gender, chestpain, trestbps, chol, fbs, restecg, thalach, exang, oldpeak, slope, ca = features
-    
-    factors = []
-    
-    # Only include factors that significantly contribute to the prediction
-    if age > 60:
-        factors.append({
-            "name": "Age",
-            "value": f"{int(age)} years",
-            "description": "Age is a significant risk factor for heart disease.",
-            "impact": "high",
-            "icon": "👴"
-        })
-    
-    if chol > 240:
-        factors.append({
-            "name": "Cholesterol",
-            "value": f"{int(chol)} mg/dl",
-            "description": "Cholesterol is significantly above recommended levels.",
-            "impact": "high",
-            "icon": "🔴"
-        })
-    elif chol > 200:
-        factors.append({
-            "name": "Cholesterol",
-            "value": f"{int(chol)} mg/dl",
-            "description": "Cholesterol is above optimal levels.",
-            "impact": "medium",
-            "icon": "🟠"
-        })
-    
-    if trestbps >= 140:
-        factors.append({
-            "name": "Blood Pressure",
-            "value": f"{int(trestbps)} mm Hg",
-            "description": "Blood pressure is in the hypertension range.",
-            "impact": "high",
-            "icon": "📈"
-        })
-    
-    if exang == 1:
-        factors.append({
-            "name": "Exercise Angina",
-            "value": "Present",
-            "description": "Chest pain during exercise indicates restricted blood flow to the heart.",
-            "impact": "high",
-            "icon": "⚡"
-        })
-    
-    if ca > 0:
-        factors.append({
-            "name": "Major Vessels",
-            "value": f"{int(ca)}",
-            "description": f"{int(ca)} major blood vessel(s) show significant blockage.",
-            "impact": "high",
-            "icon": "🚧"
-        })
-    
-    if oldpeak > 2:
-        factors.append({
-            "name": "ST Depression",
-            "value": f"{oldpeak:.1f}",
-            "description": "Significant ST depression indicates abnormal heart activity during exercise.",
-            "impact": "high", 
-            "icon": "📉"
-        })
-    
-    return factors
+def attributions(contributions, base_logit):
+    """Per-row attribution bodies for an N x 12 contributions matrix (see LogisticRegression.explain).
+    
+    Each lists every feature's contribution to the logit, largest absolute
+    effect first; base_logit plus their sum is the row's logit.
+    """
+    base_logit = float(base_logit)
+    if len(contributions) == 1:
+        # /predict: sorting 12 Python floats costs less than the NumPy calls below
+        ranked = sorted(zip(feature_names, contributions[0].tolist()), key=lambda item: -abs(item[1]))
+        names, values = [[name for name, _ in ranked]], [[value for _, value in ranked]]
+    else:
+        order = np.argsort(-np.abs(contributions), axis=1, kind='stable')
+        names = feature_name_array[order].tolist()
+        values = np.take_along_axis(contributions, order, axis=1).tolist()
+    return [{
+        'base_logit': base_logit,
+        'contributions': [{'feature': name, 'contribution': value} for name, value in zip(row_names, row_values)]
+    } for row_names, row_values in zip(names, values)]
 
-@app.route('/')
-def home():
-    return render_template('index.html')
+def report_url(features, version):
+    """URL of the server-rendered PDF report for these inputs"""
+    # repr round-trips every float exactly, so the report is rendered for the very inputs assessed
+    query = {name: repr(value) for name, value in zip(feature_names, features)}
+    # Only to give each model version its own URL in browser caches; /report ignores it
+    query['model'] = version
+    return '/report?' + urlencode(query)
+
+def assess(features):
+    """Score one validated patient and build its /predict response, using the result cache"""
+    # One consistent (version, model) pair for the whole request, even if a reload lands meanwhile
+    version, model = models.current()
+    X = np.asarray(features, dtype=float).reshape(1, -1)
+    # The rules, cache key and report URL work on plain floats
+    features = X[0].tolist()
+    
+    # Serve repeated submissions of the same inputs from the result cache
+    with PREDICT_STAGE_LATENCY.time(stage='cache'):
+        key = cache_key(features, version)
+        cached = prediction_cache.get(key)
+    if cached is not None:
+        PREDICTION_CACHE_LOOKUPS.inc(result='hit')
+        with PREDICT_STAGE_LATENCY.time(stage='drift'):
+            drift_monitor.observe(version, model, X, cached['probability'])
+        return cached
+    PREDICTION_CACHE_LOOKUPS.inc(result='miss')
+    
+    # Log the features for debugging - only format them when debug logging is on
+    debug = logger.isEnabledFor(logging.DEBUG)
+    if debug:
+        logger.debug(f"Attempting prediction with features: {features}")
+    
+    # Get model prediction, probability of class 1 and per-feature contributions in one pass
+    with PREDICT_STAGE_LATENCY.time(stage='score'):
+        labels, probabilities, contributions = model.explain(X)
+    prediction = int(labels[0])
+    probability = float(probabilities[0])
+    with PREDICT_STAGE_LATENCY.time(stage='drift'):
+        drift_monitor.observe(version, model, X, probabilities)
+    if debug:
+        logger.debug(f"Prediction result: {prediction}, probability: {probability}")
+    
+    # Generate personalized recommendations and contributing factors
+    with PREDICT_STAGE_LATENCY.time(stage='rules'):
+        result = build_result(probability, prediction, features)
+        result['attribution'] = attributions(contributions, model.base_logit)[0]
+    result['model_version'] = version
+    # The server renders the PDF report for these inputs on request
+    result['report_url'] = report_url(features, version)
+    prediction_cache.put(key, result)
+    return result
+
+def get_report(features):
+    """Return the PDF report for these inputs, rendering it only on a cache miss"""
+    version, model = models.current()
+    key = report_key(features, version)
+    pdf = report_cache.get(key)
+    if pdf is None:
+        labels, probabilities = model.score(np.array([features]))
+        result = build_result(float(probabilities[0]), int(labels[0]), features)
+        pdf = render_report(features, result)
+        report_cache.put(key, pdf)
+    return key, pdf
 
 @app.route('/predict', methods=['POST'])
 def predict():
     try:
-        # Expected feature names (must match the model's training features)
-        feature_names = ['age', 'gender', 'chestpain', 'trestbps', 'chol', 'fbs', 
-                         'restecg', 'thalach', 'exang', 'oldpeak', 'slope', 'ca']
-        
-        # Get form data
-        features = []
-        for feature in feature_names:
-            value = request.form.get(feature)
-            # Check if value exists and is not empty
-            if value is None or value == '':
-                return jsonify({
-                    'error': f"Missing required parameter: {feature}"
-                }), 400
-            
-            # Convert value to float
+        # Get the form or JSON body
+        with PREDICT_STAGE_LATENCY.time(stage='parse'):
             try:
-                value = float(value)
-            except ValueError:
-                return jsonify({
-                    'error': f"Invalid value for {feature}: {value}. Must be a number."
-                }), 400
-                
-            # Validate the range
-            min_val, max_val = validation_ranges.get(feature, (float('-inf'), float('inf')))
-            if value < min_val or value > max_val:
-                return jsonify({
-                    'error': f"Value for {feature} must be between {min_val} and {max_val}."
-                }), 400
-                
-            features.append(value)
-        
-        # Log the features for debugging
-        logger.info(f"Attempting prediction with features: {features}")
+                values = request_values()
+            except ValueError as parse_error:
+                return jsonify({'error': f"Could not parse JSON body: {str(parse_error)}"}), 400
+        with PREDICT_STAGE_LATENCY.time(stage='validate'):
+            features, errors = parse_features(values)
+        if errors:
+            return jsonify(error_body(errors)), 400
         
         # Make prediction with detailed error handling
         try:
-            features_array = np.array([features])
-            logger.info(f"Features shape: {features_array.shape}")
-            logger.info(f"Feature values: {features_array}")
-            
-            # Get model prediction
-            prediction = int(model.predict(features_array)[0])
-            logger.info(f"Prediction result: {prediction}")
-            
-            # Get probabilities
-            probabilities = model.predict_proba(features_array)[0]
-            logger.info(f"Probability values: {probabilities}")
-            probability = float(probabilities[1])  # Probability of class 1
-            
-            # Generate personalized recommendations and contributing factors
-            recommendations = get_recommendations(probability, prediction, features)
-            contributing_factors = get_contributing_factors(features, prediction)
-            
-            # Calculate model confidence (simplified for demonstration)
-            confidence = 85 + (5 * abs(probability - 0.5) * 2)  # Higher confidence the further from 0.5
-            
-            result = {
-                'prediction': int(prediction),
-                'probability': float(probability),
-                'message': 'High risk of heart disease' if prediction == 1 else 'Low risk of heart disease',
-                'recommendations': recommendations,
-                'contributing_factors': contributing_factors,
-                'confidence': float(confidence)
-            }
-            
-            return jsonify(result)
+            result = assess(features)
+            with PREDICT_STAGE_LATENCY.time(stage='serialize'):
+                return jsonify(result)
             
         except Exception as predict_error:
             logger.error(f"Prediction error: {str(predict_error)}")
@@ -324,10 +365,12 @@ def predict():
                 logger.info("Attempting direct prediction calculation as fallback")
                 
                 # Ensure we have the weights and bias from the model
+                model = models.current().model
                 if not hasattr(model, 'weights') or not hasattr(model, 'bias'):
                     raise ValueError("Model doesn't have required weights or bias attributes")
                 
                 # Direct calculation of logistic regression formula
+                features_array = np.array([features])
                 z = np.dot(features_array, model.weights) + model.bias
                 logger.info(f"z value: {z}")
                 probability = float(1 / (1 + np.exp(-z)))
@@ -363,168 +406,445 @@ def predict():
         app.logger.error(f"Traceback: {traceback.format_exc()}")
         return jsonify({'error': str(e), 'error_trace': traceback.format_exc()}), 500
 
-@app.route('/send-email', methods=['POST'])
-def send_email():
+class BatchError(ValueError):
+    """A batch request that cannot be scored; carries the HTTP status to return"""
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+def parse_batch_rows(data, is_json):
+    """Parse a batch body (JSON array or CSV bytes) into a list of row dicts"""
     try:
-        # Get form data
-        patient_id = request.form.get('patientid', 'Not provided')
-        doctor_email = request.form.get('doctorEmail', DOCTOR_EMAIL)
-        message = request.form.get('message', '')
-        prediction_result = request.form.get('predictionResult', '')
-        probability = request.form.get('probability', '')
-        pdf_attachment = request.form.get('pdfAttachment', None)
-        
-        # Log the email request
-        logger.info(f"Email request received for patient {patient_id} to {doctor_email}")
+        if is_json:
+            rows = json.loads(data)
+            if not isinstance(rows, list):
+                raise ValueError("JSON body must be an array of patient objects")
+            return rows
+        return list(csv.DictReader(io.StringIO(data.decode('utf-8'))))
+    except (ValueError, csv.Error) as parse_error:
+        raise BatchError(f"Could not parse batch body: {str(parse_error)}")
+
+def build_feature_matrix(rows):
+    """Convert row dicts into an N x 12 float matrix plus per-row errors.
+
+    Each row may use either the form field names (age, trestbps, ...) or the
+    dataset column names (restingBP, serumcholestrol, ...). Cells that are
+    missing or not numeric become NaN and are reported in the row's errors.
+    """
+    n_rows = len(rows)
+    X = np.full((n_rows, len(feature_names)), np.nan)
+    invalid = np.zeros(X.shape, dtype=bool)
+    errors = [[] for _ in range(n_rows)]
+    for i, row in enumerate(rows):
+        if not isinstance(row, dict):
+            errors[i].append("Row must be an object")
+            invalid[i] = True
+            continue
+        for column, value in row.items():
+            name = dataset_columns.get(column, column)
+            j = feature_index.get(name)
+            if j is None or value is None or value == '':
+                continue
+            if isinstance(value, bool):
+                # JSON true/false, which float() would take as 1.0/0.0
+                invalid[i, j] = True
+                errors[i].append(f"Invalid value for {name}: {json.dumps(value)}. Must be a number.")
+                continue
+            try:
+                X[i, j] = float(value)
+            except (TypeError, ValueError):
+                invalid[i, j] = True
+                errors[i].append(f"Invalid value for {name}: {value}. Must be a number.")
+    # Validate every cell against validation_ranges in one pass
+    missing = np.isnan(X)
+    out_of_range = ~missing & ((X < range_min) | (X > range_max))
+    for i, j in zip(*np.nonzero(missing & ~invalid)):
+        errors[i].append(f"Missing required parameter: {feature_names[j]}")
+    for i, j in zip(*np.nonzero(out_of_range)):
+        min_val, max_val = validation_ranges[feature_names[j]]
+        errors[i].append(f"Value for {feature_names[j]} must be between {min_val} and {max_val}.")
+    return X, errors
+
+def score_batch(rows, attribution=False):
+    """Validate and score a list of row dicts; return the /predict/batch response body.
+    
+    With attribution, every scored row also carries its ranked per-feature
+    contributions, as in /predict.
+    """
+    if not rows:
+        raise BatchError("Batch body contains no rows")
+    if len(rows) > MAX_BATCH_ROWS:
+        raise BatchError(f"Batch is limited to {MAX_BATCH_ROWS} rows, got {len(rows)}", 413)
+    
+    X, errors = build_feature_matrix(rows)
+    valid = np.array([not row_errors for row_errors in errors])
+    
+    # Score all valid rows with a single matrix multiply
+    probabilities = np.zeros(len(rows))
+    predictions = np.zeros(len(rows), dtype=int)
+    version, model = models.current()
+    row_attributions = []
+    if valid.any():
+        if attribution:
+            predictions[valid], probabilities[valid], contributions = model.explain(X[valid])
+            row_attributions = attributions(contributions, model.base_logit)
+        else:
+            predictions[valid], probabilities[valid] = model.score(X[valid])
+        drift_monitor.observe(version, model, X[valid], probabilities[valid])
+    
+    # Evaluate the rule table over all valid rows at once
+    recommendations, factors = evaluate_rules(X[valid], probabilities[valid])
+    rule_output = iter(zip(recommendations, factors))
+    attribution_output = iter(row_attributions)
+    
+    results = []
+    for i, row in enumerate(rows):
+        patient_id = row.get('patientid') if isinstance(row, dict) else None
+        if errors[i]:
+            results.append({'row': i, 'patientid': patient_id, 'errors': errors[i]})
+            continue
+        row_recommendations, row_factors = next(rule_output)
+        result = build_result(float(probabilities[i]), int(predictions[i]), None, row_recommendations, row_factors)
+        if attribution:
+            result['attribution'] = next(attribution_output)
+        results.append({'row': i, 'patientid': patient_id, **result})
+    
+    logger.info(f"Batch prediction: {int(valid.sum())} scored, {int((~valid).sum())} rejected")
+    BATCH_ROWS.inc(int(valid.sum()), outcome='scored')
+    BATCH_ROWS.inc(int((~valid).sum()), outcome='rejected')
+    
+    return {
+        'count': len(rows),
+        'scored': int(valid.sum()),
+        'failed': int((~valid).sum()),
+        'model_version': version,
+        'results': results
+    }
+
+def wants_attribution(value):
+    """Whether the attribution query parameter of a batch request asks for per-row contributions"""
+    return (value or '').lower() in ('1', 'true', 'yes')
+
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    try:
+        rows = parse_batch_rows(request.get_data(), request.is_json)
+        return jsonify(score_batch(rows, wants_attribution(request.args.get('attribution'))))
+    
+    except BatchError as batch_error:
+        return jsonify({'error': str(batch_error)}), batch_error.status
+    
+    except Exception as e:
+        logger.error(f"Error during batch prediction: {str(e)}")
+        import traceback
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify(prediction_cache.stats())
+
+@app.route('/drift', methods=['GET'])
+def drift():
+    """Live feature and probability distributions of the served model version vs the training data"""
+    version, model = models.current()
+    return jsonify(drift_monitor.report(version, model))
+
+def is_admin(req):
+    """True if the request carries the ADMIN_TOKEN bearer token"""
+    supplied = req.headers.get('Authorization', '')
+    return ADMIN_TOKEN is not None and hmac.compare_digest(supplied.encode(), f"Bearer {ADMIN_TOKEN}".encode())
+
+@app.route('/admin/model', methods=['GET', 'POST'])
+def admin_model():
+    """Show the served model version, or switch every worker to another registry version"""
+    if ADMIN_TOKEN is None:
+        return jsonify({'error': 'Admin endpoints are disabled; set ADMIN_TOKEN to enable them'}), 404
+    if not is_admin(request):
+        return jsonify({'error': 'Invalid or missing admin token'}), 401
+    
+    current = models.current().version
+    if request.method == 'GET':
+        return jsonify({'version': current, 'versions': models.versions()})
+    
+    data = request.get_json(silent=True) or request.form
+    version = data.get('version')
+    try:
+        active = models.activate(version)
+    except KeyError as e:
+        return jsonify({'error': e.args[0], 'versions': models.versions()}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 409
+    except Exception as e:
+        logger.error(f"Failed to activate model version {version}: {str(e)}")
+        return jsonify({'error': f"Could not load model version {version}: {str(e)}"}), 500
+    
+    logger.info(f"Model version {active.version} activated (was {current})")
+    # Other workers notice the new CURRENT within MODEL_RELOAD_INTERVAL seconds
+    return jsonify({'version': active.version, 'previous': current,
+                    'reload_interval': models.check_interval})
+
+@app.route('/report', methods=['GET', 'POST'])
+def report():
+    try:
+        features, errors = parse_features(request.values)
+        if errors:
+            return jsonify(error_body(errors)), 400
         
-        # Create the email
-        msg = MIMEMultipart('alternative')
-        msg['Subject'] = f"Heart Health Assessment Results - Patient ID: {patient_id}"
-        msg['From'] = EMAIL_SENDER
-        msg['To'] = doctor_email
+        key, pdf = get_report(features.tolist())
+        if request.if_none_match.contains(key):
+            return Response(status=304)
         
-        # Create HTML email content
-        html_content = f"""
-        <html>
-        <head>
-            <style>
-                body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                .header {{ background-color: #007bff; color: white; padding: 10px; text-align: center; }}
-                .content {{ padding: 20px; }}
-                .result {{ font-weight: bold; font-size: 18px; color: {'#d9534f' if 'High risk' in prediction_result else '#5cb85c'}; }}
-                .footer {{ font-size: 12px; color: #777; border-top: 1px solid #eee; padding-top: 10px; margin-top: 20px; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h2>Heart Health Assessment Results</h2>
-                </div>
-                <div class="content">
-                    <p>Dear Doctor,</p>
-                    <p>Please find the heart health assessment results for your patient (ID: {patient_id}):</p>
-                    
-                    <p class="result">{prediction_result}</p>
-                    <p>Probability: {probability}</p>
-                    
-                    <p>Patient's message:</p>
-                    <p>{message if message else 'No additional message provided.'}</p>
-                    
-                    <p>For more detailed information, please see the attached PDF report.</p>
-                    
-                    <p>Please review these results and advise the patient on next steps.</p>
-                    <p>Thank you,</p>
-                    <p>Heart Health Assessment Tool</p>
-                </div>
-                <div class="footer">
-                    <p>This is an automated message. Please do not reply to this email.</p>
-                    <p>The information contained in this email is for the exclusive use of the intended recipient and may contain confidential information. If you are not the intended recipient, please notify the sender immediately and destroy all copies.</p>
-                </div>
+        response = Response(pdf, mimetype='application/pdf')
+        response.headers['Content-Disposition'] = 'inline; filename="Heart_Assessment_Report.pdf"'
+        response.headers['Cache-Control'] = 'private, max-age=86400'
+        response.set_etag(key)
+        return response
+    
+    except Exception as e:
+        logger.error(f"Error rendering report: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+class AttachmentTooLarge(ValueError):
+    """Raised when an uploaded PDF is bigger than MAX_PDF_BYTES"""
+
+def attach_pdf(msg, stream, filename):
+    """Attach a PDF read from a file object to msg.
+    
+    The file is base64-encoded chunk by chunk, so the raw bytes are never held
+    in memory as a whole. Returns the size in bytes and the first chunk's
+    leading bytes (for the %PDF- signature check).
+    """
+    encoded = []
+    size = 0
+    head = b''
+    while True:
+        chunk = stream.read(PDF_ENCODE_CHUNK)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > MAX_PDF_BYTES:
+            raise AttachmentTooLarge(f"PDF attachment exceeds the {MAX_PDF_BYTES} byte limit")
+        if not head:
+            head = chunk[:1024]
+        encoded.append(base64.encodebytes(chunk).decode('ascii'))
+    
+    pdf_part = MIMEBase('application', 'pdf')
+    pdf_part.set_payload(''.join(encoded))
+    pdf_part['Content-Transfer-Encoding'] = 'base64'
+    pdf_part.add_header('Content-Disposition', f'attachment; filename="{filename}"')
+    msg.attach(pdf_part)
+    return size, head
+
+class InvalidEmailRequest(ValueError):
+    """Raised when /send-email receives assessment inputs that fail validation"""
+
+def compose_email(form, files):
+    """Build the MIME message for a /send-email form; return (message, recipient)"""
+    # Get form data
+    patient_id = form.get('patientid', 'Not provided')
+    doctor_email = form.get('doctorEmail', DOCTOR_EMAIL)
+    message = form.get('message', '')
+    prediction_result = form.get('predictionResult', '')
+    probability = form.get('probability', '')
+    pdf_attachment = form.get('pdfAttachment', None)
+    # Werkzeug streams file parts into a SpooledTemporaryFile, so large reports are not held in memory
+    pdf_file = files.get('pdfFile')
+    
+    # Clients that send the 12 assessment inputs get the server-rendered report attached by reference
+    report_features = None
+    if any(name in form for name in feature_names):
+        report_features, errors = parse_features(form)
+        if errors:
+            raise InvalidEmailRequest(error_body(errors)['error'])
+        report_features = report_features.tolist()
+    
+    # Log the email request
+    logger.info(f"Email request received for patient {patient_id} to {doctor_email}")
+    
+    # Create the email
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = f"Heart Health Assessment Results - Patient ID: {patient_id}"
+    msg['From'] = EMAIL_SENDER
+    msg['To'] = doctor_email
+    
+    # Create HTML email content
+    html_content = f"""
+    <html>
+    <head>
+        <style>
+            body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
+            .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
+            .header {{ background-color: #007bff; color: white; padding: 10px; text-align: center; }}
+            .content {{ padding: 20px; }}
+            .result {{ font-weight: bold; font-size: 18px; color: {'#d9534f' if 'High risk' in prediction_result else '#5cb85c'}; }}
+            .footer {{ font-size: 12px; color: #777; border-top: 1px solid #eee; padding-top: 10px; margin-top: 20px; }}
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <div class="header">
+                <h2>Heart Health Assessment Results</h2>
             </div>
-        </body>
-        </html>
-        """
-        
-        # Attach HTML content
-        msg.attach(MIMEText(html_content, 'html'))
-        
-        # Attach PDF if available
-        if pdf_attachment:
-            try:
-                # Check if there's actual data in the attachment
-                if len(pdf_attachment) < 100:
-                    logger.error(f"PDF attachment data too short: {pdf_attachment}")
-                    raise ValueError("Invalid PDF data")
+            <div class="content">
+                <p>Dear Doctor,</p>
+                <p>Please find the heart health assessment results for your patient (ID: {patient_id}):</p>
                 
-                logger.info(f"PDF attachment data received. Length: {len(pdf_attachment)}")
+                <p class="result">{prediction_result}</p>
+                <p>Probability: {probability}</p>
                 
-                # Extract the base64 data from the data URL
-                if 'data:application/pdf;base64,' in pdf_attachment:
-                    # Standard data URI format
-                    pdf_data = re.sub('^data:application/pdf;base64,', '', pdf_attachment)
-                else:
-                    # Try alternate format that might be used
-                    pdf_data = re.sub('^data:base64,', '', pdf_attachment)
-                    if pdf_data == pdf_attachment:  # If no substitution was made
-                        # Just take everything after the comma if present
-                        if ',' in pdf_attachment:
-                            pdf_data = pdf_attachment.split(',', 1)[1]
-                        else:
-                            # Use as is, assuming it's already base64
-                            pdf_data = pdf_attachment
+                <p>Patient's message:</p>
+                <p>{message if message else 'No additional message provided.'}</p>
                 
-                logger.info(f"PDF base64 data extracted. Length: {len(pdf_data)}")
+                <p>For more detailed information, please see the attached PDF report.</p>
                 
-                try:
-                    # Try to decode the base64 data
-                    pdf_bytes = base64.b64decode(pdf_data)
-                    logger.info(f"PDF successfully decoded. Size: {len(pdf_bytes)} bytes")
-                    
-                    # Verify we have a valid PDF (check for PDF signature)
-                    if not pdf_bytes.startswith(b'%PDF-'):
-                        logger.warning("PDF does not start with %PDF- signature")
-                        # Sometimes the signature might be in a different encoding or have extra bytes
-                        # Try to find the PDF signature anywhere in the first 1024 bytes
-                        if b'%PDF-' not in pdf_bytes[:1024]:
-                            logger.error("Invalid PDF format - cannot find %PDF- signature")
-                            # We'll still try to attach it
-                
-                    # Create the attachment
-                    pdf_part = MIMEBase('application', 'pdf')
-                    pdf_part.set_payload(pdf_bytes)
-                    
-                    # Encode and add headers
-                    encoders.encode_base64(pdf_part)
-                    pdf_part.add_header(
-                        'Content-Disposition',
-                        f'attachment; filename="Heart_Assessment_Report_{patient_id}.pdf"'
-                    )
-                    
-                    # Add the attachment to the message
-                    msg.attach(pdf_part)
-                    
-                    logger.info("PDF attachment successfully added to email")
-                except Exception as decode_error:
-                    logger.error(f"Error decoding PDF base64 data: {str(decode_error)}")
-                    logger.error(f"First 100 chars of PDF data: {pdf_data[:100]}")
-                    raise
+                <p>Please review these results and advise the patient on next steps.</p>
+                <p>Thank you,</p>
+                <p>Heart Health Assessment Tool</p>
+            </div>
+            <div class="footer">
+                <p>This is an automated message. Please do not reply to this email.</p>
+                <p>The information contained in this email is for the exclusive use of the intended recipient and may contain confidential information. If you are not the intended recipient, please notify the sender immediately and destroy all copies.</p>
+            </div>
+        </div>
+    </body>
+    </html>
+    """
+    
+    # Attach HTML content
+    msg.attach(MIMEText(html_content, 'html'))
+    
+    # Attach PDF if available - prefer the server-rendered report for the submitted
+    # inputs, then a multipart file part, then the base64 data URI field sent by older clients
+    if report_features:
+        _, pdf = get_report(report_features)
+        attach_pdf(msg, io.BytesIO(pdf), f"Heart_Assessment_Report_{patient_id}.pdf")
+        logger.info(f"Server-rendered PDF report attached. Size: {len(pdf)} bytes")
+    elif pdf_file:
+        size, head = attach_pdf(msg, pdf_file.stream, f"Heart_Assessment_Report_{patient_id}.pdf")
+        logger.info(f"PDF file part attached. Size: {size} bytes")
+        if b'%PDF-' not in head:
+            logger.warning("Uploaded file does not contain a %PDF- signature")
+    elif pdf_attachment:
+        try:
+            # Check if there's actual data in the attachment
+            if len(pdf_attachment) < 100:
+                logger.error(f"PDF attachment data too short: {pdf_attachment}")
+                raise ValueError("Invalid PDF data")
+            
+            logger.info(f"PDF attachment data received. Length: {len(pdf_attachment)}")
+            
+            # Extract the base64 data from the data URL
+            if 'data:application/pdf;base64,' in pdf_attachment:
+                # Standard data URI format
+                pdf_data = re.sub('^data:application/pdf;base64,', '', pdf_attachment)
+            else:
+                # Try alternate format that might be used
+                pdf_data = re.sub('^data:base64,', '', pdf_attachment)
+                if pdf_data == pdf_attachment:  # If no substitution was made
+                    # Just take everything after the comma if present
+                    if ',' in pdf_attachment:
+                        pdf_data = pdf_attachment.split(',', 1)[1]
+                    else:
+                        # Use as is, assuming it's already base64
+                        pdf_data = pdf_attachment
+            
+            logger.info(f"PDF base64 data extracted. Length: {len(pdf_data)}")
+            if len(pdf_data) * 3 // 4 > MAX_PDF_BYTES:
+                raise AttachmentTooLarge(f"PDF attachment exceeds the {MAX_PDF_BYTES} byte limit")
+            
+            try:
+                # Try to decode the base64 data
+                pdf_bytes = base64.b64decode(pdf_data)
+                logger.info(f"PDF successfully decoded. Size: {len(pdf_bytes)} bytes")
                 
-            except Exception as pdf_error:
-                logger.error(f"Error attaching PDF: {str(pdf_error)}")
-                # Continue with the email even if PDF attachment fails
+                # Verify we have a valid PDF (check for PDF signature)
+                if not pdf_bytes.startswith(b'%PDF-'):
+                    logger.warning("PDF does not start with %PDF- signature")
+                    # Sometimes the signature might be in a different encoding or have extra bytes
+                    # Try to find the PDF signature anywhere in the first 1024 bytes
+                    if b'%PDF-' not in pdf_bytes[:1024]:
+                        logger.error("Invalid PDF format - cannot find %PDF- signature")
+                        # We'll still try to attach it
+            
+                # Create the attachment
+                pdf_part = MIMEBase('application', 'pdf')
+                pdf_part.set_payload(pdf_bytes)
                 
-        # Connect to Gmail SMTP server and send the email
-        try:
-            context = ssl.create_default_context()
-            with smtplib.SMTP_SSL('smtp.gmail.com', 465, context=context) as server:
-                # Login to sender email
-                server.login(EMAIL_SENDER, EMAIL_PASSWORD)
+                # Encode and add headers
+                encoders.encode_base64(pdf_part)
+                pdf_part.add_header(
+                    'Content-Disposition',
+                    f'attachment; filename="Heart_Assessment_Report_{patient_id}.pdf"'
+                )
                 
-                # Send email
-                server.sendmail(EMAIL_SENDER, doctor_email, msg.as_string())
+                # Add the attachment to the message
+                msg.attach(pdf_part)
                 
-                logger.info(f"Email sent successfully to {doctor_email}")
+                logger.info("PDF attachment successfully added to email")
+            except Exception as decode_error:
+                logger.error(f"Error decoding PDF base64 data: {str(decode_error)}")
+                logger.error(f"First 100 chars of PDF data: {pdf_data[:100]}")
+                raise
             
-            # Create success response
-            response = {
-                'success': True,
-                'message': f'Results sent to {doctor_email} with PDF attachment',
-            }
+        except AttachmentTooLarge:
+            raise
+        except Exception as pdf_error:
+            logger.error(f"Error attaching PDF: {str(pdf_error)}")
+            # Continue with the email even if PDF attachment fails
+    
+    return msg, doctor_email
+
+def email_accepted(job_id, doctor_email):
+    """Response body for an email job that has been queued"""
+    return {
+        'success': True,
+        'message': f'Results with PDF attachment are being sent to {doctor_email}',
+        'job_id': job_id,
+        'status_url': f'/send-email/{job_id}'
+    }
+
+@app.route('/send-email', methods=['POST'])
+def send_email():
+    try:
+        msg, doctor_email = compose_email(request.form, request.files)
+        
+        # Hand the message to the background queue and return straight away
+        try:
+            job_id = email_queue.submit(EMAIL_SENDER, doctor_email, msg)
+            logger.info(f"Email job {job_id} queued for {doctor_email}")
             
-            return jsonify(response)
+            return jsonify(email_accepted(job_id, doctor_email)), 202
             
-        except Exception as smtp_error:
-            logger.error(f"SMTP error: {str(smtp_error)}")
+        except Exception as queue_error:
+            logger.error(f"Email queue error: {str(queue_error)}")
             return jsonify({
                 'success': False, 
-                'error': f"Email sending failed: {str(smtp_error)}"
+                'error': f"Email sending failed: {str(queue_error)}"
             }), 500
     
+    except InvalidEmailRequest as request_error:
+        return jsonify({'error': str(request_error), 'success': False}), 400
+    
+    except AttachmentTooLarge as size_error:
+        logger.error(f"Rejected email request: {str(size_error)}")
+        return jsonify({'error': str(size_error), 'success': False}), 413
+    
+    except RequestEntityTooLarge:
+        logger.error(f"Rejected email request: body of {request.content_length} bytes exceeds {MAX_REQUEST_BYTES}")
+        return jsonify({'error': f"Request body exceeds the {MAX_REQUEST_BYTES} byte limit", 'success': False}), 413
+    
     except Exception as e:
         logger.error(f"Error sending email: {str(e)}")
         return jsonify({'error': str(e), 'success': False}), 500
 
+@app.route('/send-email/<job_id>', methods=['GET'])
+def send_email_status(job_id):
+    job = email_queue.status(job_id)
+    if job is None:
+        return jsonify({'error': f"Unknown email job: {job_id}"}), 404
+    return jsonify(job)
+
 if __name__ == '__main__':
     # For development only
     app.run(host="0.0.0.0", debug=True)
@@ -0,0 +1,228 @@
+"""Prometheus-style counters and latency histograms shared across gunicorn workers.
+
+Every worker process writes its values into its own memory-mapped file
+(STATE_DIR/metrics/<pid>.dat), so recording a sample is a couple of in-memory
+additions with no locks or syscalls (threads of one worker can, rarely, lose
+an increment to a race; that is the price of not locking). /metrics sums the
+files of all workers, live and exited, and renders the Prometheus text
+exposition format.
+
+All series are declared up front in this module, so every process agrees on
+the file layout. Call clear() once when the server starts (see
+gunicorn_conf.on_starting) to drop the files of a previous run.
+"""
+import glob
+import itertools
+import os
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+import numpy as np
+
+from state import state_dir
+
+METRICS_DIR = state_dir('metrics')
+
+# Latency buckets in seconds, from 10 microseconds to 10 seconds
+LATENCY_BUCKETS = (1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3,
+                   1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_metrics = []
+_size = 0
+_values = None
+
+
+def _allocate(n):
+    # Reserve n slots in the per-process array and return the first slot
+    global _size
+    offset = _size
+    _size += n
+    return offset
+
+
+def _array():
+    global _values
+    if _values is None:
+        path = os.path.join(METRICS_DIR, f"{os.getpid()}.dat")
+        _values = np.memmap(path, dtype=np.float64, mode='w+', shape=(_size,))
+    return _values
+
+
+def _reset_after_fork():
+    # A forked worker must not write into its parent's file
+    global _values
+    _values = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class _Metric:
+    def __init__(self, name, help, labels, slots_per_series):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.series = list(itertools.product(*labels.values())) or [()]
+        self.slots = slots_per_series
+        self.offset = _allocate(len(self.series) * slots_per_series)
+        self._index = {values: self.offset + i * slots_per_series for i, values in enumerate(self.series)}
+        _metrics.append(self)
+
+    def _slot(self, labels):
+        return self._index[tuple(labels[name] for name in self.label_names)]
+
+    def _label_text(self, values, extra=()):
+        pairs = list(zip(self.label_names, values)) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{k}="{v}"' for k, v in pairs) + '}'
+
+
+class Counter(_Metric):
+    """Monotonic counter; label values must be declared up front"""
+    def __init__(self, name, help, labels=None):
+        super().__init__(name, help, labels or {}, 1)
+
+    def inc(self, amount=1, **labels):
+        _array()[self._slot(labels)] += amount
+
+    def render(self, values):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for series in self.series:
+            slot = self._index[series]
+            yield f"{self.name}{self._label_text(series)} {values[slot]:g}"
+
+
+class Histogram(_Metric):
+    """Fixed-bucket histogram; stores per-bucket counts plus sum and count"""
+    def __init__(self, name, help, labels=None, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        super().__init__(name, help, labels or {}, len(self.buckets) + 3)
+
+    def observe(self, value, **labels):
+        values = _array()
+        slot = self._slot(labels)
+        values[slot + bisect_left(self.buckets, value)] += 1
+        values[slot + len(self.buckets) + 1] += value
+        values[slot + len(self.buckets) + 2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self, values):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        n = len(self.buckets)
+        for series in self.series:
+            slot = self._index[series]
+            cumulative = np.cumsum(values[slot:slot + n + 1])
+            for bound, count in zip(self.buckets + (float('inf'),), cumulative):
+                le = '+Inf' if bound == float('inf') else f"{bound:g}"
+                yield f"{self.name}_bucket{self._label_text(series, [('le', le)])} {count:g}"
+            yield f"{self.name}_sum{self._label_text(series)} {values[slot + n + 1]:.9g}"
+            yield f"{self.name}_count{self._label_text(series)} {values[slot + n + 2]:g}"
+
+
+def set_model_version(version):
+    """Record the model version this process serves, for the heart_model_info gauge"""
+    with open(os.path.join(METRICS_DIR, f"{os.getpid()}.version"), 'w') as f:
+        f.write(version)
+
+
+def _model_info():
+    # Count live processes per served version; files of exited workers are skipped
+    counts = {}
+    for path in glob.glob(os.path.join(METRICS_DIR, '*.version')):
+        pid = int(os.path.basename(path).split('.')[0])
+        try:
+            os.kill(pid, 0)
+            with open(path) as f:
+                version = f.read().strip()
+        except (OSError, ValueError):
+            continue
+        counts[version] = counts.get(version, 0) + 1
+    yield "# HELP heart_model_info Live worker processes by the model version they serve"
+    yield "# TYPE heart_model_info gauge"
+    for version, count in sorted(counts.items()):
+        yield f'heart_model_info{{version="{version}"}} {count}'
+
+
+def collect():
+    """Sum the values written by every worker process"""
+    total = np.zeros(_size)
+    for path in glob.glob(os.path.join(METRICS_DIR, '*.dat')):
+        values = np.fromfile(path, dtype=np.float64)
+        # Files left by a build with a different set of metrics cannot be merged
+        if values.shape == total.shape:
+            total += values
+    return total
+
+
+def render():
+    """Aggregate all workers and render the Prometheus text format"""
+    values = collect()
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render(values))
+    lines.extend(_model_info())
+    return '\n'.join(lines) + '\n'
+
+
+def clear():
+    """Remove the files of previous runs; call once before workers start"""
+    global _values
+    _values = None
+    for path in glob.glob(os.path.join(METRICS_DIR, '*.dat')) + glob.glob(os.path.join(METRICS_DIR, '*.version')):
+        os.remove(path)
+
+
+# Routes served by the app; anything else is counted as 'other'
+ENDPOINTS = ('home', 'predict', 'predict_batch', 'report', 'send_email', 'send_email_status',
+             'cache_stats', 'drift', 'admin_model', 'metrics', 'static', 'assets', 'other')
+STATUS_CLASSES = ('2xx', '3xx', '4xx', '5xx')
+PREDICT_STAGES = ('parse', 'validate', 'cache', 'score', 'drift', 'rules', 'serialize')
+
+REQUESTS = Counter(
+    'heart_http_requests_total', 'HTTP requests by endpoint and status class',
+    {'endpoint': ENDPOINTS, 'status': STATUS_CLASSES}
+)
+REQUEST_LATENCY = Histogram(
+    'heart_http_request_duration_seconds', 'HTTP request latency by endpoint',
+    {'endpoint': ENDPOINTS}
+)
+PREDICT_STAGE_LATENCY = Histogram(
+    'heart_predict_stage_duration_seconds',
+    'Latency of each /predict stage (the scaler is folded into the weights, so scoring is one dot product and sigmoid)',
+    {'stage': PREDICT_STAGES}
+)
+PREDICTION_CACHE_LOOKUPS = Counter(
+    'heart_prediction_cache_lookups_total', 'Prediction cache lookups by result',
+    {'result': ('hit', 'miss')}
+)
+BATCH_ROWS = Counter(
+    'heart_batch_rows_total', 'Rows received by /predict/batch by outcome',
+    {'outcome': ('scored', 'rejected')}
+)
+SMTP_SEND_LATENCY = Histogram(
+    'heart_smtp_send_duration_seconds', 'Time to deliver one email attempt, including connecting if needed',
+    {'outcome': ('sent', 'error')}
+)
+EMAIL_JOBS = Counter(
+    'heart_email_jobs_total', 'Email jobs by final status',
+    {'status': ('sent', 'failed')}
+)
+MODEL_RELOADS = Counter(
+    'heart_model_reloads_total', 'Model version switches in this worker by outcome',
+    {'outcome': ('ok', 'error')}
+)
+ADMISSION_REJECTIONS = Counter(
+    'heart_admission_rejections_total', 'Requests turned away by admission control (see limits.py)',
+    {'endpoint': ('predict', 'predict_batch', 'send_email'), 'reason': ('rate', 'concurrency')}
+)
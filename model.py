@@ -0,0 +1,208 @@
+"""Serving-side model: the custom LogisticRegression and its artifact loaders.
+
+Only NumPy is imported here. scikit-learn is needed solely to unpickle the
+original heart_disease_model4.pkl (its scaler is a StandardScaler); the
+exported .npz and .npy artifacts load without it. A .npy artifact is a
+single structured record that is memory-mapped rather than read, so every
+process serving it shares the same page-cache pages.
+"""
+import pickle
+import sys
+
+import numpy as np
+
+
+class ArrayScaler:
+    """NumPy-only stand-in for a fitted StandardScaler (mean_ and scale_ only)"""
+    def __init__(self, mean, scale):
+        self.mean_ = np.asarray(mean, dtype=float)
+        self.scale_ = np.asarray(scale, dtype=float)
+    
+    def transform(self, X):
+        return (np.asarray(X, dtype=float) - self.mean_) / self.scale_
+
+
+# Define a custom LogisticRegression class that EXACTLY matches the notebook implementation
+class LogisticRegression:
+    def __init__(self, learning_rate=0.01, max_iter=1000, lambda_=0.01, verbose=False, scaler=None):
+        self.learning_rate = learning_rate
+        self.max_iter = max_iter
+        self.lambda_ = lambda_
+        self.verbose = verbose
+        self.scaler = scaler
+        self.weights = None
+        self.bias = None
+    
+    def __setstate__(self, state):
+        # Called when the model is unpickled - precompute the fused weights once
+        self.__dict__.update(state)
+        self.fold_scaler()
+    
+    def fold_scaler(self):
+        """Fold the scaler's mean_/scale_ into effective weights and bias.
+        
+        (X - mean) / scale . W + b == X . (W / scale) + (b - mean / scale . W),
+        so scoring needs a single dot product and no sklearn call.
+        """
+        weights = np.asarray(self.weights, dtype=float)
+        bias = float(self.bias)
+        scaler = getattr(self, 'scaler', None)
+        if scaler is not None:
+            mean = scaler.mean_ if getattr(scaler, 'with_mean', True) else 0.0
+            scale = scaler.scale_ if getattr(scaler, 'with_std', True) else 1.0
+            weights = weights / scale
+            bias = bias - np.dot(mean, weights)
+        self.effective_weights = weights
+        self.effective_bias = bias
+        self.set_reference(mean if scaler is not None else 0.0)
+        return self
+    
+    def set_reference(self, mean):
+        """Precompute the logit contributions of the training mean, the attribution baseline"""
+        self.reference_contributions = self.effective_weights * mean
+        self.base_logit = self.effective_bias + float(np.sum(self.reference_contributions))
+    
+    def score(self, X):
+        """Return (labels, probabilities of class 1) from a single forward pass"""
+        X = np.asarray(X, dtype=float)
+        if getattr(self, 'effective_weights', None) is None:
+            self.fold_scaler()
+        # Calculate z = X.W + b with the scaler folded into W and b
+        z = np.dot(X, self.effective_weights) + self.effective_bias
+        # Apply sigmoid function
+        y_pred = 1 / (1 + np.exp(-z))
+        # Convert to binary predictions (0 or 1)
+        return (y_pred > 0.5).astype(int), y_pred
+    
+    def explain(self, X):
+        """Return (labels, probabilities, contributions) for X.
+        
+        contributions[i, j] = W[j] / scale[j] * (X[i, j] - mean[j]) is feature
+        j's additive share of row i's logit relative to the training mean, so
+        base_logit + contributions.sum(axis=1) is the logit. For a linear model
+        these are the exact Shapley values in log-odds.
+        """
+        X = np.asarray(X, dtype=float)
+        if getattr(self, 'reference_contributions', None) is None:
+            self.fold_scaler()
+        labels, probabilities = self.score(X)
+        return labels, probabilities, X * self.effective_weights - self.reference_contributions
+    
+    def predict(self, X):
+        return self.score(X)[0]
+    
+    def predict_proba(self, X):
+        y_pred = self.score(X)[1]
+        # Return probabilities for both classes [P(0), P(1)]
+        return np.column_stack([1 - y_pred, y_pred])
+
+
+def load_model(path):
+    """Load a model from a .npy or .npz artifact or from the original pickle"""
+    if path.endswith('.npy'):
+        return load_npy(path)
+    if path.endswith('.npz'):
+        return load_npz(path)
+    return load_pickle(path)
+
+
+def load_pickle(path):
+    # Register the LogisticRegression class in the main module
+    # This is crucial - we need to make the class available with the EXACT same name
+    # that was used when the model was pickled
+    sys.modules['__main__'].LogisticRegression = LogisticRegression
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def load_npz(path):
+    """Load the dependency-free artifact written by export_npz()"""
+    with np.load(path, allow_pickle=False) as data:
+        model = LogisticRegression(
+            learning_rate=float(data['learning_rate']),
+            max_iter=int(data['max_iter']),
+            lambda_=float(data['lambda_']),
+            scaler=ArrayScaler(data['mean'], data['scale'])
+        )
+        model.weights = data['weights'].astype(float)
+        model.bias = float(data['bias'])
+    return model.fold_scaler()
+
+
+def export_npz(model, path):
+    """Write weights, bias and scaler statistics to a NumPy-only .npz file"""
+    weights, bias, mean, scale = _artifact_arrays(model)
+    np.savez(
+        path,
+        weights=weights,
+        bias=np.float64(bias),
+        mean=mean,
+        scale=scale,
+        learning_rate=np.float64(model.learning_rate),
+        max_iter=np.int64(model.max_iter),
+        lambda_=np.float64(model.lambda_)
+    )
+
+
+def _artifact_arrays(model):
+    # Weights, bias and scaler statistics as plain float arrays
+    n_features = len(model.weights)
+    mean = np.zeros(n_features)
+    scale = np.ones(n_features)
+    scaler = getattr(model, 'scaler', None)
+    if scaler is not None:
+        if getattr(scaler, 'with_mean', True):
+            mean = np.asarray(scaler.mean_, dtype=float)
+        if getattr(scaler, 'with_std', True):
+            scale = np.asarray(scaler.scale_, dtype=float)
+    return np.asarray(model.weights, dtype=float), float(model.bias), mean, scale
+
+
+def npy_dtype(n_features):
+    """Record layout of a .npy artifact for a model with n_features inputs"""
+    return np.dtype([
+        ('weights', np.float64, (n_features,)),
+        ('bias', np.float64),
+        ('mean', np.float64, (n_features,)),
+        ('scale', np.float64, (n_features,)),
+        ('effective_weights', np.float64, (n_features,)),
+        ('effective_bias', np.float64),
+        ('learning_rate', np.float64),
+        ('max_iter', np.int64),
+        ('lambda_', np.float64),
+    ])
+
+
+def export_npy(model, path):
+    """Write the model as one structured .npy record, folded weights included"""
+    weights, bias, mean, scale = _artifact_arrays(model)
+    model.fold_scaler()
+    record = np.zeros(1, dtype=npy_dtype(len(weights)))
+    record['weights'] = weights
+    record['bias'] = bias
+    record['mean'] = mean
+    record['scale'] = scale
+    record['effective_weights'] = model.effective_weights
+    record['effective_bias'] = model.effective_bias
+    record['learning_rate'] = model.learning_rate
+    record['max_iter'] = model.max_iter
+    record['lambda_'] = model.lambda_
+    np.save(path, record, allow_pickle=False)
+
+
+def load_npy(path):
+    """Memory-map a .npy artifact written by export_npy(); the arrays are read-only views of the file"""
+    record = np.load(path, mmap_mode='r', allow_pickle=False)
+    model = LogisticRegression(
+        learning_rate=float(record['learning_rate'][0]),
+        max_iter=int(record['max_iter'][0]),
+        lambda_=float(record['lambda_'][0]),
+        scaler=ArrayScaler(record['mean'][0], record['scale'][0])
+    )
+    model.weights = record['weights'][0]
+    model.bias = float(record['bias'][0])
+    # Folded at export time, so scoring reads the mapped pages directly
+    model.effective_weights = record['effective_weights'][0]
+    model.effective_bias = float(record['effective_bias'][0])
+    model.set_reference(record['mean'][0])
+    return model
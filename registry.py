@@ -0,0 +1,213 @@
+"""Versioned model registry with hot reload.
+
+The registry is a directory of immutable artifacts, one memory-mapped .npy
+file per version (see model.export_npy), plus a CURRENT file that names the
+version to serve:
+
+    models/
+        CURRENT                      -> "heart_disease_model4"
+        heart_disease_model4.npy
+        retrained-2026-10-18.npy
+
+Activating a version rewrites CURRENT atomically (write to a temp file, then
+os.replace). Every worker stats CURRENT at most once per
+MODEL_RELOAD_INTERVAL seconds while serving requests; when it has changed,
+the worker maps the new file and swaps its active (version, model) pair in
+one assignment. Requests already running keep the pair they started with,
+so nothing is dropped and no restart is needed. POST /admin/model activates
+a version and swaps the calling worker immediately.
+
+With MODEL_PATH set, that single file is served and never reloaded.
+
+Usage:
+    python registry.py list
+    python registry.py publish heart_disease_model4.npz --version heart_disease_model4 [--activate]
+    python registry.py activate heart_disease_model4
+"""
+import argparse
+import logging
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+
+import metrics
+from metrics import MODEL_RELOADS
+from model import export_npy, load_model
+from state import atomic_replace, write_atomic
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_REGISTRY = os.path.join(BASE_DIR, 'models')
+# Served when there is neither MODEL_PATH nor a registry with a CURRENT version
+FALLBACK_MODEL = os.path.join(BASE_DIR, 'heart_disease_model4.pkl')
+
+VERSION_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9._-]{0,63}$')
+
+ActiveModel = namedtuple('ActiveModel', 'version model')
+
+
+def current_model_path():
+    """The file a server started now would serve: MODEL_PATH, the registry's CURRENT version, or the fallback"""
+    model_path = os.getenv("MODEL_PATH")
+    if model_path is not None:
+        return model_path
+    root = os.getenv("MODEL_REGISTRY", DEFAULT_REGISTRY)
+    try:
+        with open(os.path.join(root, 'CURRENT')) as f:
+            return os.path.join(root, f"{f.read().strip()}.npy")
+    except FileNotFoundError:
+        return FALLBACK_MODEL
+
+
+class ModelRegistry:
+    """The model a worker serves, reloaded when the registry's CURRENT version changes"""
+
+    def __init__(self, root=None, model_path=None, check_interval=1.0, load=True):
+        self.root = root
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._next_check = 0.0
+        self._pointer_stat = None
+        self._reported = None
+        self._active = None
+        if root is None:
+            version = os.path.splitext(os.path.basename(model_path))[0]
+            self._active = ActiveModel(version, load_model(model_path))
+        elif load:
+            self._check()
+            if self._active is None:
+                raise RuntimeError(f"Model registry {root} has no CURRENT version")
+
+    @classmethod
+    def from_env(cls):
+        """MODEL_PATH pins one file; otherwise serve MODEL_REGISTRY (default ./models)"""
+        model_path = os.getenv("MODEL_PATH")
+        root = os.getenv("MODEL_REGISTRY", DEFAULT_REGISTRY)
+        if model_path is None and not os.path.exists(os.path.join(root, 'CURRENT')):
+            model_path = FALLBACK_MODEL
+        if model_path is not None:
+            return cls(model_path=model_path)
+        return cls(root=root, check_interval=float(os.getenv("MODEL_RELOAD_INTERVAL", "1.0")))
+
+    def path(self, version):
+        return os.path.join(self.root, f"{version}.npy")
+
+    def versions(self):
+        if self.root is None:
+            return [self._active.version]
+        return sorted(name[:-4] for name in os.listdir(self.root) if name.endswith('.npy') and not name.startswith('.'))
+
+    def current(self):
+        """The (version, model) pair to score this request with"""
+        if self.root is not None and time.monotonic() >= self._next_check:
+            self._check()
+        active = self._active
+        if self._reported != (os.getpid(), active.version):
+            # Per process, so forked workers report their own version
+            self._reported = (os.getpid(), active.version)
+            metrics.set_model_version(active.version)
+        return active
+
+    def _check(self):
+        # Reload if CURRENT was replaced since the last look
+        self._next_check = time.monotonic() + self.check_interval
+        pointer = os.path.join(self.root, 'CURRENT')
+        try:
+            stat = os.stat(pointer)
+        except FileNotFoundError:
+            return
+        if (stat.st_ino, stat.st_mtime_ns) == self._pointer_stat:
+            return
+        with self._lock:
+            if (stat.st_ino, stat.st_mtime_ns) == self._pointer_stat:
+                return
+            try:
+                with open(pointer) as f:
+                    version = f.read().strip()
+                self._swap(version)
+                self._pointer_stat = (stat.st_ino, stat.st_mtime_ns)
+            except Exception as e:
+                # Keep serving the current model; retry at the next check
+                MODEL_RELOADS.inc(outcome='error')
+                logger.error(f"Failed to reload model from {pointer}: {str(e)}")
+                if self._active is None:
+                    raise
+
+    def _swap(self, version):
+        if self._active is not None and self._active.version == version:
+            return
+        model = load_model(self.path(version))
+        previous = self._active
+        self._active = ActiveModel(version, model)
+        if previous is not None:
+            MODEL_RELOADS.inc(outcome='ok')
+        logger.info(f"Serving model version {version}"
+                    + (f" (was {previous.version})" if previous is not None else ''))
+
+    def activate(self, version):
+        """Point CURRENT at an existing version and switch this worker to it"""
+        if self.root is None:
+            raise ValueError("MODEL_PATH pins a single model; set MODEL_REGISTRY to switch versions")
+        if not VERSION_PATTERN.match(version or '') or not os.path.exists(self.path(version)):
+            raise KeyError(f"Unknown model version: {version}")
+        with self._lock:
+            # Load before publishing the pointer, so a broken artifact is never activated
+            self._swap(version)
+            write_atomic(os.path.join(self.root, 'CURRENT'), f"{version}\n".encode())
+            stat = os.stat(os.path.join(self.root, 'CURRENT'))
+            self._pointer_stat = (stat.st_ino, stat.st_mtime_ns)
+        return self._active
+
+    def publish(self, model, version):
+        """Add a new immutable version to the registry"""
+        if not VERSION_PATTERN.match(version):
+            raise ValueError(f"Invalid version name: {version}")
+        path = self.path(version)
+        if os.path.exists(path):
+            raise ValueError(f"Version {version} already exists")
+        # np.save appends .npy to any other name
+        with atomic_replace(path, suffix='.npy') as tmp:
+            export_npy(model, tmp)
+        return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the versioned model registry")
+    parser.add_argument('--registry', default=os.getenv("MODEL_REGISTRY", DEFAULT_REGISTRY))
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help="show the versions and which one is active")
+    publish = commands.add_parser('publish', help="add a .pkl, .npz or .npy model as a new version")
+    publish.add_argument('model')
+    publish.add_argument('--version', required=True)
+    publish.add_argument('--activate', action='store_true')
+    activate = commands.add_parser('activate', help="serve an existing version")
+    activate.add_argument('version')
+    args = parser.parse_args()
+
+    # Registry maintenance works on the directory alone, without loading the active model
+    registry = ModelRegistry(root=args.registry, load=False)
+
+    if args.command == 'publish':
+        path = registry.publish(load_model(args.model), args.version)
+        print(f"Published {args.model} as {args.version} -> {path}")
+    if args.command == 'activate' or (args.command == 'publish' and args.activate):
+        version = args.version
+        try:
+            registry.activate(version)
+        except KeyError as e:
+            raise SystemExit(str(e.args[0]))
+        print(f"Activated {version}; workers switch within MODEL_RELOAD_INTERVAL seconds")
+    if args.command == 'list':
+        current = None
+        if os.path.exists(os.path.join(args.registry, 'CURRENT')):
+            with open(os.path.join(args.registry, 'CURRENT')) as f:
+                current = f.read().strip()
+        for version in registry.versions() if os.path.isdir(args.registry) else []:
+            print(f"{'*' if version == current else ' '} {version}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+"""Server-side PDF report for a heart disease assessment.
+
+The report is built from the same result dict that predict() returns, with a
+small hand-written PDF writer (standard Helvetica fonts, no extra
+dependencies). Rendered bytes are kept in an LRU cache keyed by a hash of the
+model version and the 12 inputs, so repeat downloads and emails of the same
+assessment are free.
+"""
+import hashlib
+import textwrap
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# A4 in PDF points
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+MARGIN = 50
+
+# Labels for the 12 model inputs, in feature order
+INPUT_LABELS = [
+    ('Age', 'years'),
+    ('Gender (1 = male)', ''),
+    ('Chest pain type', ''),
+    ('Resting blood pressure', 'mm Hg'),
+    ('Serum cholesterol', 'mg/dl'),
+    ('Fasting blood sugar > 120 mg/dl', ''),
+    ('Resting ECG', ''),
+    ('Maximum heart rate', 'bpm'),
+    ('Exercise induced angina', ''),
+    ('ST depression (oldpeak)', ''),
+    ('Slope of peak exercise ST', ''),
+    ('Major vessels (0-3)', ''),
+]
+
+DISCLAIMER = [
+    "Disclaimer: This assessment is for informational purposes only and is not a substitute for professional medical advice.",
+    "Always consult with a qualified healthcare provider regarding any medical condition.",
+]
+
+
+def report_key(features, version=''):
+    """Cache key for a report: a hash of the model version and the 12 inputs as float64"""
+    digest = hashlib.sha256(version.encode('utf-8') + b'\0')
+    digest.update(np.asarray(features, dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+class ReportCache:
+    """Thread-safe LRU cache of rendered report bytes"""
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            pdf = self._items.get(key)
+            if pdf is not None:
+                self._items.move_to_end(key)
+            return pdf
+
+    def put(self, key, pdf):
+        with self._lock:
+            self._items[key] = pdf
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+
+def _pdf_text(text):
+    # Standard fonts only cover Latin-1; drop anything else (emoji icons) and escape PDF specials
+    text = text.encode('latin-1', 'ignore').decode('latin-1').strip()
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def _format_value(value, unit):
+    text = f"{value:g}"
+    return f"{text} {unit}" if unit else text
+
+
+class _Page:
+    """Accumulates text drawing operators for one page, top to bottom"""
+    def __init__(self):
+        self.ops = []
+        self.y = PAGE_HEIGHT - MARGIN
+
+    def text(self, text, size=10, bold=False, x=MARGIN, gap=4, center=False):
+        font = 'F2' if bold else 'F1'
+        if center:
+            # Helvetica averages roughly half an em per character
+            x = max(MARGIN, (PAGE_WIDTH - len(text) * size * 0.5) / 2)
+        self.y -= size
+        self.ops.append(f"BT /{font} {size} Tf {x:.1f} {self.y:.1f} Td ({_pdf_text(text)}) Tj ET")
+        self.y -= gap
+
+    def row(self, left, right, size=10, offset=250):
+        self.y -= size
+        for x, text in ((MARGIN, left), (MARGIN + offset, right)):
+            self.ops.append(f"BT /F1 {size} Tf {x:.1f} {self.y:.1f} Td ({_pdf_text(text)}) Tj ET")
+        self.y -= 4
+
+    def wrapped(self, text, size=10, indent=0, bullet=''):
+        width = int((PAGE_WIDTH - 2 * MARGIN - indent) / (size * 0.5))
+        lines = textwrap.wrap(text, width) or ['']
+        for i, line in enumerate(lines):
+            self.text((bullet if i == 0 else ' ' * len(bullet) * 2) + line, size=size, x=MARGIN + indent, gap=2)
+        self.y -= 2
+
+    def space(self, points):
+        self.y -= points
+
+
+def _build_pdf(page_streams):
+    """Assemble content streams into a complete PDF document"""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in below
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>",
+    ]
+    page_ids = []
+    for stream in page_streams:
+        content = stream.encode('latin-1')
+        objects.append(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] "
+            b"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents %d 0 R >>"
+            % (PAGE_WIDTH, PAGE_HEIGHT, len(objects))
+        )
+        page_ids.append(len(objects))
+    kids = b" ".join(b"%d 0 R" % i for i in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % len(page_ids)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def render_report(features, result):
+    """Render the assessment report for the 12 inputs and predict()'s result dict as PDF bytes"""
+    pages = [_Page()]
+
+    def page():
+        # Start a new page when the current one is nearly full
+        if pages[-1].y < MARGIN + 60:
+            pages.append(_Page())
+        return pages[-1]
+
+    page().text("Heart Health Assessment Report", size=18, bold=True, center=True, gap=16)
+
+    page().text("Assessment Result", size=13, bold=True, gap=6)
+    page().text(result['message'], size=12, bold=True)
+    page().text(f"Probability: {result['probability'] * 100:.2f}%")
+    if 'confidence' in result:
+        page().text(f"Model confidence: {result['confidence']:.1f}%")
+    page().space(10)
+
+    page().text("Assessment Inputs", size=13, bold=True, gap=6)
+    for (label, unit), value in zip(INPUT_LABELS, features):
+        page().row(label, _format_value(float(value), unit))
+    page().space(10)
+
+    factors = result.get('contributing_factors') or []
+    page().text("Key Contributing Factors", size=13, bold=True, gap=6)
+    if not factors:
+        page().text("No significant risk factors identified.")
+    for factor in factors:
+        page().wrapped(f"{factor['name']} ({factor['value']}, {factor['impact']} impact): {factor['description']}",
+                       indent=10, bullet='- ')
+    page().space(10)
+
+    recommendations = result.get('recommendations') or {}
+    page().text("Personalized Recommendations", size=13, bold=True, gap=6)
+    for section, title in (('lifestyle', 'Lifestyle Changes'), ('monitoring', 'Monitoring'), ('medical', 'Medical Advice')):
+        items = recommendations.get(section) or []
+        if not items:
+            continue
+        page().text(title, size=11, bold=True)
+        for item in items:
+            page().wrapped(item, indent=10, bullet='- ')
+    page().space(14)
+
+    for line in DISCLAIMER:
+        page().wrapped(line, size=7)
+
+    return _build_pdf(["\n".join(p.ops) for p in pages])
@@ -0,0 +1,207 @@
+"""Recommendation and contributing-factor rules as a declarative table.
+
+Each rule is a list of (field, op, threshold) conditions that must all hold,
+where field is one of the 12 feature names or 'risk' (the probability in
+percent). The same table is evaluated two ways:
+
+- one patient: plain Python comparisons on floats (/predict);
+- many patients: one NumPy comparison per condition over an N x 12 matrix
+  (/predict/batch).
+
+Either way every distinct condition is checked once into a bit mask, and a
+rule fires when all of its bits are set.
+
+The output is identical to the original if-chains, with tuples for its
+lists. Recommendations and factor dicts are built once and shared between
+responses, so callers must not modify what they get back.
+"""
+import operator
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+
+# Columns of the feature matrix, in the order the model expects them
+FEATURE_NAMES = ('age', 'gender', 'chestpain', 'trestbps', 'chol', 'fbs',
+                 'restecg', 'thalach', 'exang', 'oldpeak', 'slope', 'ca')
+
+# Work on Python scalars and on NumPy arrays alike
+OPS = {'>': operator.gt, '>=': operator.ge, '<': operator.lt, '<=': operator.le, '==': operator.eq}
+
+Recommendation = namedtuple('Recommendation', 'section conditions message')
+Factor = namedtuple('Factor', 'field conditions convert name value description impact icon')
+
+SECTIONS = ('lifestyle', 'monitoring', 'medical')
+
+# In output order within each section
+RECOMMENDATIONS = (
+    # Age-specific recommendations
+    Recommendation('lifestyle', [('age', '>', 60)], "Consider low-impact exercises like swimming or walking"),
+    Recommendation('monitoring', [('age', '>', 60), ('risk', '>', 50)],
+                   "More frequent check-ups recommended for seniors with elevated risk"),
+    Recommendation('lifestyle', [('age', '<=', 60)], "Regular moderate to vigorous exercise is recommended"),
+    # Cholesterol-specific recommendations
+    Recommendation('lifestyle', [('chol', '>', 200)], "Focus on reducing saturated fat and increasing fiber in your diet"),
+    Recommendation('lifestyle', [('chol', '>', 200)], "Consider foods rich in omega-3 fatty acids"),
+    Recommendation('monitoring', [('chol', '>', 200)], "Regular cholesterol monitoring every 3-6 months"),
+    # Blood sugar-specific recommendations
+    Recommendation('lifestyle', [('fbs', '==', 1)], "Monitor carbohydrate intake and follow a balanced diet"),
+    Recommendation('lifestyle', [('fbs', '==', 1)], "Maintain regular meal times to help control blood sugar"),
+    Recommendation('monitoring', [('fbs', '==', 1)], "Regular blood glucose testing as advised by your doctor"),
+    # General recommendations based on risk
+    Recommendation('medical', [('risk', '<', 30)], "Discuss these results at your next regular check-up"),
+    Recommendation('medical', [('risk', '<', 30)], "Continue preventive healthcare measures"),
+    Recommendation('medical', [('risk', '>=', 30), ('risk', '<', 70)],
+                   "Schedule an appointment with your doctor within the next month"),
+    Recommendation('medical', [('risk', '>=', 30), ('risk', '<', 70)],
+                   "Consider discussing preventive medications with your healthcare provider"),
+    Recommendation('medical', [('risk', '>=', 70)], "Seek prompt medical attention to discuss these results"),
+    Recommendation('medical', [('risk', '>=', 70)], "Consult with a cardiologist for specialized care"),
+)
+
+# In output order; value and description are formatted with convert(feature value)
+FACTORS = (
+    Factor('age', [('age', '>', 60)], int, "Age", "{} years",
+           "Age is a significant risk factor for heart disease.", "high", "👴"),
+    Factor('chol', [('chol', '>', 240)], int, "Cholesterol", "{} mg/dl",
+           "Cholesterol is significantly above recommended levels.", "high", "🔴"),
+    Factor('chol', [('chol', '>', 200), ('chol', '<=', 240)], int, "Cholesterol", "{} mg/dl",
+           "Cholesterol is above optimal levels.", "medium", "🟠"),
+    Factor('trestbps', [('trestbps', '>=', 140)], int, "Blood Pressure", "{} mm Hg",
+           "Blood pressure is in the hypertension range.", "high", "📈"),
+    Factor('exang', [('exang', '==', 1)], int, "Exercise Angina", "Present",
+           "Chest pain during exercise indicates restricted blood flow to the heart.", "high", "⚡"),
+    Factor('ca', [('ca', '>', 0)], int, "Major Vessels", "{}",
+           "{} major blood vessel(s) show significant blockage.", "high", "🚧"),
+    Factor('oldpeak', [('oldpeak', '>', 2)], float, "ST Depression", "{:.1f}",
+           "Significant ST depression indicates abnormal heart activity during exercise.", "high", "📉"),
+)
+
+# 'risk' is the column after the 12 features
+_FIELDS = FEATURE_NAMES + ('risk',)
+# Factors only look at these features; a row's factors depend on nothing else
+_FACTOR_FIELDS = tuple(dict.fromkeys(factor.field for factor in FACTORS))
+_factor_values = operator.itemgetter(*[FEATURE_NAMES.index(field) for field in _FACTOR_FIELDS])
+
+
+def _compile(rules, fields):
+    """Distinct conditions of some rules as (column, comparison, threshold, bit), and the bits each rule needs.
+
+    Columns index fields. A row's condition mask has bit k set when
+    condition k holds; a rule fires when all the bits it needs are set.
+    """
+    conditions = list(dict.fromkeys(condition for rule in rules for condition in rule.conditions))
+    compiled = [(fields.index(field), OPS[op], threshold, 1 << bit)
+                for bit, (field, op, threshold) in enumerate(conditions)]
+    required = [sum(1 << conditions.index(condition) for condition in rule.conditions) for rule in rules]
+    return compiled, required
+
+
+_RECOMMENDATION_CONDITIONS, _RECOMMENDATION_REQUIRED = _compile(RECOMMENDATIONS, _FIELDS)
+_FACTOR_CONDITIONS, _FACTOR_REQUIRED = _compile(FACTORS, _FACTOR_FIELDS)
+_FACTOR_COLUMNS = [_FACTOR_FIELDS.index(factor.field) for factor in FACTORS]
+
+
+# Batches smaller than this are evaluated row by row, as /predict does
+VECTORIZE_MIN_ROWS = 128
+
+
+def _row_mask(conditions, values):
+    """Condition mask of one row of values"""
+    mask = 0
+    for column, compare, threshold, bit in conditions:
+        if compare(values[column], threshold):
+            mask |= bit
+    return mask
+
+
+def _masks(conditions, columns):
+    """Condition masks of many rows; columns holds one array per field"""
+    masks = np.zeros(columns.shape[1], dtype=np.int64)
+    for column, compare, threshold, bit in conditions:
+        masks[compare(columns[column], threshold)] |= bit
+    return masks
+
+
+@lru_cache(maxsize=None)
+def _recommendations(mask):
+    """The shared recommendations of one condition mask: a tuple of messages per section"""
+    sections = {section: [] for section in SECTIONS}
+    for rule, required in zip(RECOMMENDATIONS, _RECOMMENDATION_REQUIRED):
+        if mask & required == required:
+            sections[rule.section].append(rule.message)
+    return {section: tuple(messages) for section, messages in sections.items()}
+
+
+@lru_cache(maxsize=4096)
+def _factor(i, value):
+    """The shared factor dict of one rule and converted feature value"""
+    factor = FACTORS[i]
+    return {
+        "name": factor.name,
+        "value": factor.value.format(value),
+        "description": factor.description.format(value),
+        "impact": factor.impact,
+        "icon": factor.icon
+    }
+
+
+@lru_cache(maxsize=None)
+def _fired_factors(mask):
+    """(index, column, convert) of every factor one condition mask fires"""
+    return tuple((i, column, FACTORS[i].convert)
+                 for i, (required, column) in enumerate(zip(_FACTOR_REQUIRED, _FACTOR_COLUMNS))
+                 if mask & required == required)
+
+
+def _factors(mask, values):
+    """The factor tuple of one row's condition mask and _FACTOR_FIELDS values"""
+    return tuple(_factor(i, convert(values[column])) for i, column, convert in _fired_factors(mask))
+
+
+@lru_cache(maxsize=4096)
+def _row_factors(values):
+    # /predict inputs repeat (the factor features are small integers and a
+    # one-decimal ST depression), so a row's factors are cached by its values
+    return _factors(_row_mask(_FACTOR_CONDITIONS, values), values)
+
+
+def get_recommendations(probability, prediction, features):
+    """Generate personalized recommendations based on risk level and features"""
+    return _recommendations(_row_mask(_RECOMMENDATION_CONDITIONS, (*features, probability * 100)))
+
+
+def get_contributing_factors(features, prediction):
+    """Identify key contributing factors for the prediction"""
+    return _row_factors(_factor_values(features))
+
+
+def _shared(objects, inverse):
+    # Expand one object per distinct key into one reference per row
+    holder = np.empty(len(objects), dtype=object)
+    holder[:] = objects
+    return holder[inverse.ravel()].tolist()
+
+
+def evaluate_rules(X, probabilities):
+    """Recommendations and contributing factors for every row of an N x 12 matrix.
+
+    Returns two lists of length N, equal element by element to calling
+    get_recommendations and get_contributing_factors on each row. Rows that
+    fire the same recommendations, or have the same factor features, share
+    one object.
+    """
+    X = np.asarray(X, dtype=float)
+    if len(X) < VECTORIZE_MIN_ROWS:
+        rows = X.tolist()
+        return ([get_recommendations(p, None, row) for p, row in zip(np.ravel(probabilities).tolist(), rows)],
+                [get_contributing_factors(row, None) for row in rows])
+    columns = np.vstack([X.T, np.asarray(probabilities, dtype=float) * 100])
+    unique, inverse = np.unique(_masks(_RECOMMENDATION_CONDITIONS, columns), return_inverse=True)
+    recommendations = _shared([_recommendations(mask) for mask in unique.tolist()], inverse)
+
+    values = X[:, [FEATURE_NAMES.index(field) for field in _FACTOR_FIELDS]]
+    masks = _masks(_FACTOR_CONDITIONS, values.T)
+    _, first, inverse = np.unique(values, axis=0, return_index=True, return_inverse=True)
+    factors = [_factors(mask, row) for mask, row in zip(masks[first].tolist(), values[first].tolist())]
+    return recommendations, _shared(factors, inverse)
@@ -0,0 +1,98 @@
+"""Validation of the 12 assessment inputs, compiled once from the range table.
+
+FeatureSchema turns (name, min, max) entries into a flat list of field specs
+with their error messages already formatted, so checking a request is one
+pass of dict lookups, float() and a chained comparison per field. It reads
+any mapping with .get: a Flask/Werkzeug form, a query string or a decoded
+JSON object, where values may be numbers or numeric strings but not
+booleans. The values are written straight into a float64 array in model
+feature order, and every failing field is reported, not just the first one.
+"""
+import json
+
+import numpy as np
+
+# Valid range of each input, based on the dataset
+VALIDATION_RANGES = {
+    'age': (20, 80),
+    'gender': (0, 1),
+    'chestpain': (0, 3),
+    'trestbps': (94, 200),
+    'chol': (0, 602),
+    'fbs': (0, 1),
+    'restecg': (0, 2),
+    'thalach': (71, 202),
+    'exang': (0, 1),
+    'oldpeak': (0, 6.2),
+    'slope': (0, 3),
+    'ca': (0, 3)
+}
+
+
+class FeatureSchema:
+    """Parse and validate named inputs into a float64 feature vector"""
+
+    def __init__(self, names, ranges):
+        self.names = tuple(names)
+        self._fields = []
+        bounds = [ranges.get(name, (float('-inf'), float('inf'))) for name in self.names]
+        # In feature order, for checking whole matrices
+        self.min = np.array([min_val for min_val, _ in bounds], dtype=float)
+        self.max = np.array([max_val for _, max_val in bounds], dtype=float)
+        for i, (name, (min_val, max_val)) in enumerate(zip(self.names, bounds)):
+            self._fields.append((i, name, float(min_val), float(max_val),
+                                 f"Missing required parameter: {name}",
+                                 f"Value for {name} must be between {min_val} and {max_val}."))
+
+    def parse(self, values, out=None):
+        """Return (features, errors): a float64 array and a {field: message} dict, or None if valid.
+
+        The array is out when given (one row of a preallocated matrix, say),
+        otherwise a new one. Fields that fail leave their slot undefined.
+        """
+        if out is None:
+            out = np.empty(len(self._fields))
+        errors = None
+        if hasattr(values, 'to_dict'):
+            # Werkzeug MultiDicts: one copy to a plain dict beats 12 MultiDict.get calls
+            values = values.to_dict()
+        get = values.get
+        for i, name, min_val, max_val, missing, out_of_range in self._fields:
+            value = get(name)
+            if value is None or value == '':
+                message = missing
+            elif isinstance(value, bool):
+                # JSON true/false, which float() would take as 1.0/0.0
+                message = f"Invalid value for {name}: {json.dumps(value)}. Must be a number."
+            else:
+                try:
+                    number = float(value)
+                except (TypeError, ValueError):
+                    message = f"Invalid value for {name}: {value}. Must be a number."
+                else:
+                    # Also false for NaN
+                    if min_val <= number <= max_val:
+                        out[i] = number
+                        continue
+                    message = out_of_range
+            if errors is None:
+                errors = {}
+            errors[name] = message
+        return out, errors
+
+    def valid_rows(self, X):
+        """Boolean mask of the rows of X (rows x features) with every value in range; NaN is out of range"""
+        return ((X >= self.min) & (X <= self.max)).all(axis=1)
+
+
+def load_json_object(data):
+    """Decode a JSON request body that must hold one object; raise ValueError otherwise"""
+    values = json.loads(data)
+    if not isinstance(values, dict):
+        raise ValueError("JSON body must be an object with the assessment inputs")
+    return values
+
+
+def error_body(errors):
+    """The 400 response body for a failed validation"""
+    return {'error': '; '.join(errors.values()), 'errors': errors}
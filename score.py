@@ -0,0 +1,232 @@
+"""Score a large CSV with the serving model in constant memory.
+
+The input has the Cardiovascular_Disease_Dataset.csv schema: an id column
+(patientid) plus the 12 features under their dataset names (restingBP,
+serumcholestrol, noofmajorvessels, ...), in any order; other columns such as
+target are ignored. The file is read about --chunk-rows lines at a time
+(ending on a record boundary found by the csv module, so quoted fields may
+hold newlines). Each chunk is scored with one vectorized model.score call,
+and patientid, probability and label are written out with csv.writer
+before the next chunk is read. Rows with a missing or non-numeric feature,
+or a value outside the ranges /predict accepts (schema.VALIDATION_RANGES),
+are written with an empty probability and label.
+
+The model defaults to the one the server would load: MODEL_PATH, else the
+registry's CURRENT version (see registry.py).
+
+With --workers N the chunks are parsed, scored and formatted in a pool of N
+processes; at most 2N chunks are in flight, so memory stays bounded and the
+output keeps the input order.
+
+Output is CSV, or Parquet when OUTPUT ends in .parquet (needs pyarrow).
+Probabilities are rounded to PROBABILITY_DECIMALS decimals, so the output
+is the same for any chunk size and worker count; unrounded, the last bits
+would vary with them.
+
+Usage: python score.py INPUT.csv OUTPUT.csv [--workers 4] [--chunk-rows 100000] [--model models/<version>.npy]
+"""
+import argparse
+import csv
+import io
+import itertools
+import resource
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from model import load_model
+from registry import current_model_path
+from rules import FEATURE_NAMES
+from schema import VALIDATION_RANGES, FeatureSchema
+from train import FEATURE_COLUMNS
+
+schema = FeatureSchema(FEATURE_NAMES, VALIDATION_RANGES)
+
+# The dot product behind a probability sums in an order that depends on the
+# chunk's shape, so the last bits vary with --chunk-rows and --workers;
+# rounding to this many decimals makes repeated runs write the same file
+PROBABILITY_DECIMALS = 12
+
+_model = None
+
+
+def _init_worker(model_path):
+    global _model
+    _model = load_model(model_path)
+
+
+def parse_chunk(text, columns):
+    """Parse CSV text into (ids, X); unparseable cells become NaN"""
+    id_index, feature_indexes = columns
+    if '"' not in text:
+        # Fast path: plain numeric CSV, parsed by NumPy's C reader
+        try:
+            X = np.loadtxt(io.StringIO(text), delimiter=',', usecols=feature_indexes, ndmin=2)
+            if id_index is None:
+                return [''] * len(X), X
+            return [line.split(',', id_index + 1)[id_index] for line in text.splitlines() if line], X
+        except ValueError:
+            pass
+    # A quoted field, short row, blank or non-numeric cell somewhere; convert cell by cell
+    records = [record for record in csv.reader(io.StringIO(text)) if record]
+    ids = [record[id_index] if id_index is not None and len(record) > id_index else '' for record in records]
+    X = np.full((len(records), len(feature_indexes)), np.nan)
+    for i, record in enumerate(records):
+        for k, j in enumerate(feature_indexes):
+            try:
+                X[i, k] = float(record[j])
+            except (IndexError, ValueError):
+                pass
+    return ids, X
+
+
+def score_chunk(text, columns, fmt):
+    """Parse and score one chunk; return (CSV text, rows) or Parquet-ready columns"""
+    ids, X = parse_chunk(text, columns)
+    labels, probabilities = _model.score(X)
+    probabilities = np.round(probabilities, PROBABILITY_DECIMALS)
+    valid = schema.valid_rows(X)
+    if fmt == 'parquet':
+        return ids, np.where(valid, probabilities, np.nan), np.where(valid, labels, -1)
+    probabilities = probabilities.tolist()
+    labels = labels.tolist()
+    for i in np.flatnonzero(~valid).tolist():
+        probabilities[i] = labels[i] = ''
+    out = io.StringIO()
+    csv.writer(out, lineterminator='\n').writerows(zip(ids, probabilities, labels))
+    return out.getvalue(), len(ids)
+
+
+def resolve_columns(header, id_column):
+    """Map the dataset column names in the header to the model's feature order"""
+    missing = [name for name in FEATURE_COLUMNS if name not in header]
+    if missing:
+        raise SystemExit(f"Input is missing feature columns: {', '.join(missing)}")
+    id_index = header.index(id_column) if id_column in header else None
+    return id_index, [header.index(name) for name in FEATURE_COLUMNS]
+
+
+def _read_to_record_end(lines, f):
+    """lines plus what the csv module reads from f to finish the record the last line belongs to"""
+    read = []
+
+    def source():
+        for line in itertools.chain(lines, f):
+            read.append(line)
+            yield line
+
+    # csv.reader only reads on past a line while inside a quoted field, so
+    # once a record ends at or after the last of lines, read ends on a record
+    for _ in csv.reader(source()):
+        if len(read) >= len(lines):
+            break
+    return read
+
+
+def iter_text_chunks(f, chunk_rows):
+    """Yield the raw text of about chunk_rows lines at a time, ending on a record boundary"""
+    while True:
+        lines = list(itertools.islice(f, chunk_rows))
+        if not lines:
+            return
+        text = ''.join(lines)
+        if '"' in text:
+            # A quoted field may hold newlines
+            text = ''.join(_read_to_record_end(lines, f))
+        yield text
+
+
+class CSVWriter:
+    def __init__(self, path):
+        self.file = open(path, 'w', newline='')
+        csv.writer(self.file, lineterminator='\n').writerow(['patientid', 'probability', 'label'])
+
+    def write(self, chunk):
+        text, rows = chunk
+        self.file.write(text)
+        return rows
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter:
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Parquet output needs pyarrow (pip install pyarrow)") from None
+        self.pa = pa
+        self.schema = pa.schema([('patientid', pa.string()), ('probability', pa.float64()), ('label', pa.int8())])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, chunk):
+        ids, probabilities, labels = chunk
+        pa = self.pa
+        invalid = np.isnan(probabilities)
+        self.writer.write_table(pa.table({
+            'patientid': pa.array(ids, pa.string()),
+            'probability': pa.array(probabilities, pa.float64(), mask=invalid),
+            'label': pa.array(labels.astype(np.int8), pa.int8(), mask=invalid),
+        }, schema=self.schema))
+        return len(ids)
+
+    def close(self):
+        self.writer.close()
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process and of the largest finished child"""
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    return own, children
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a large CSV with the heart disease model")
+    parser.add_argument('input')
+    parser.add_argument('output', help="output path; .parquet writes Parquet, anything else CSV")
+    parser.add_argument('--model', default=None, help="model file (default: the one the server would serve)")
+    parser.add_argument('--chunk-rows', type=int, default=100000)
+    parser.add_argument('--workers', type=int, default=0, help="score chunks in this many processes (0 = inline)")
+    parser.add_argument('--id-column', default='patientid')
+    args = parser.parse_args()
+
+    model_path = args.model or current_model_path()
+    fmt = 'parquet' if args.output.endswith('.parquet') else 'csv'
+    writer = ParquetWriter(args.output) if fmt == 'parquet' else CSVWriter(args.output)
+    rows = 0
+    start = time.perf_counter()
+    with open(args.input, newline='') as f:
+        columns = resolve_columns(next(csv.reader([f.readline()])), args.id_column)
+        chunks = iter_text_chunks(f, args.chunk_rows)
+        if args.workers > 0:
+            with ProcessPoolExecutor(args.workers, initializer=_init_worker, initargs=(model_path,)) as pool:
+                pending = deque()
+                for text in chunks:
+                    pending.append(pool.submit(score_chunk, text, columns, fmt))
+                    # Bound the chunks in flight; write results in input order
+                    while len(pending) >= 2 * args.workers:
+                        rows += writer.write(pending.popleft().result())
+                while pending:
+                    rows += writer.write(pending.popleft().result())
+        else:
+            _init_worker(model_path)
+            for text in chunks:
+                rows += writer.write(score_chunk(text, columns, fmt))
+    writer.close()
+    elapsed = time.perf_counter() - start
+
+    own, children = peak_rss_mb()
+    print(f"Scored {rows} rows with {model_path} in {elapsed:.2f} s ({rows / elapsed:,.0f} rows/s) -> {args.output}",
+          file=sys.stderr)
+    print(f"Peak RSS: {own:.0f} MB" + (f" (largest worker {children:.0f} MB)" if args.workers > 0 else ''),
+          file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Location of the small on-disk stores shared by all gunicorn workers on a host.
+
+Everything that must be visible to every worker (email job status and the
+like) lives under STATE_DIR, which defaults to a directory in the system
+temp dir. SQLiteConnections hands out the connections to the SQLite
+databases kept there. Files that workers read while another process may
+rewrite them (the model registry, built assets) are replaced with
+write_atomic or atomic_replace.
+"""
+import os
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+
+STATE_DIR = os.getenv("STATE_DIR", os.path.join(tempfile.gettempdir(), "heart-disease-state"))
+
+
+def state_path(*parts):
+    """Return a path under STATE_DIR, creating its parent directory if needed"""
+    path = os.path.join(STATE_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+def state_dir(*parts):
+    """Return a directory under STATE_DIR, creating it if needed"""
+    path = os.path.join(STATE_DIR, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+@contextmanager
+def atomic_replace(path, suffix=''):
+    """Yield a temporary path next to path, which replaces path in one rename if the block succeeds.
+
+    Readers see either the old file or the new one, never a partial write.
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix=suffix)
+    os.close(fd)
+    try:
+        yield tmp
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def write_atomic(path, data):
+    """Replace the file at path with data atomically"""
+    with atomic_replace(path) as tmp:
+        with open(tmp, 'wb') as f:
+            f.write(data)
+
+
+class SQLiteConnections:
+    """One connection to a SQLite database per thread and process, opened on first use.
+
+    sqlite3 connections must not be shared between threads or carried
+    across a fork. Calling the object returns the current thread's.
+    """
+
+    def __init__(self, path, timeout=5, isolation_level='', synchronous=None):
+        self.path = path
+        self.timeout = timeout
+        self.isolation_level = isolation_level
+        self.synchronous = synchronous
+        self._local = threading.local()
+
+    def __call__(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=self.isolation_level)
+            if self.synchronous:
+                conn.execute(f"PRAGMA synchronous={self.synchronous}")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
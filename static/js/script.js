@@ -22,6 +22,10 @@ document.addEventListener('DOMContentLoaded', function() {
     const reminderModal = document.getElementById('reminder-modal');
     const feedbackButtons = document.querySelectorAll('.feedback-button');
 
+    // Inputs and server report URL of the last successful assessment
+    let lastAssessmentInputs = null;
+    let lastReportUrl = null;
+
     // Define mappings for all dropdowns
     const dropdownMappings = {
         'gender': {  // Gender
@@ -122,7 +126,12 @@ document.addEventListener('DOMContentLoaded', function() {
 
     // Setup event handlers for action buttons
     printButton.addEventListener('click', function() {
-        generatePDF();
+        // The server renders (and caches) the report for the last assessment
+        if (lastReportUrl) {
+            window.open(lastReportUrl, '_blank');
+        } else {
+            generatePDF();
+        }
     });
 
     emailButton.addEventListener('click', function() {
@@ -162,23 +171,29 @@ document.addEventListener('DOMContentLoaded', function() {
         this.disabled = true;
         
         try {
-            // Generate PDF and get it as a data URL
-            const pdfDataUrl = await generatePDFForEmail();
+            // Create form data for sending
+            const emailData = new FormData();
             
-            // Log a sample of the PDF data (first 100 chars) to verify it's not empty
-            console.log("PDF data URL (sample):", pdfDataUrl.substring(0, 100) + "...");
+            if (lastAssessmentInputs) {
+                // Send the assessment inputs; the server attaches its own rendered report
+                Object.entries(lastAssessmentInputs).forEach(([name, value]) => emailData.append(name, value));
+            } else {
+                // Generate PDF and get it as a Blob
+                const pdfBlob = await generatePDFForEmail();
+                
+                // Log the PDF size to verify it's not empty
+                console.log("PDF size (bytes):", pdfBlob.size);
+                emailData.append('pdfFile', pdfBlob, 'Heart_Assessment_Report.pdf');  // Upload the PDF as a file part
+            }
             
             // Update button text
             this.textContent = "Sending Email...";
-            
-            // Create form data for sending
-            const emailData = new FormData();
+
             emailData.append('doctorEmail', doctorEmail);
             emailData.append('message', userMessage);
             emailData.append('predictionResult', resultMessage.textContent);
             emailData.append('probability', resultProbability.textContent);
             emailData.append('patientid', document.getElementById('patientid').value || 'Not provided');
-            emailData.append('pdfAttachment', pdfDataUrl);  // Add the PDF data
             
             // Send to backend
             fetch('/send-email', {
@@ -375,10 +390,9 @@ document.addEventListener('DOMContentLoaded', function() {
             yPos += 4;
             doc.text('Always consult with a qualified healthcare provider regarding any medical condition.', pageWidth/2, yPos, { align: 'center' });
             
-            // Return the PDF as a data URL
-            // Make sure to return the raw base64 data without any modifications
-            const pdfData = doc.output('datauristring');
-            console.log("PDF data URL length:", pdfData.length);
+            // Return the PDF as a Blob so it is uploaded as a binary file part, not base64 text
+            const pdfData = doc.output('blob');
+            console.log("PDF blob size:", pdfData.size);
             return pdfData;
             
         } catch (error) {
@@ -675,6 +689,10 @@ document.addEventListener('DOMContentLoaded', function() {
             return response.json();
         })
         .then(data => {
+            // Remember the inputs so the report can be fetched or emailed by reference
+            lastAssessmentInputs = formValues;
+            lastReportUrl = data.report_url || null;
+
             // Display basic result
             resultMessage.textContent = data.message;
             resultDiv.className = data.prediction === 1 ? 'high-risk' : 'low-risk';
@@ -0,0 +1,62 @@
+"""rules.py shares its recommendation and factor objects between responses
+instead of copying them. These tests check that the app never modifies
+what it gets back.
+
+Run with: python -m pytest tests
+"""
+import copy
+import csv
+import os
+import sys
+import tempfile
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+os.environ.update(STATE_DIR=tempfile.mkdtemp(prefix='heart-rules-'), ADMISSION_CONTROL='off',
+                  DRIFT_MONITOR='off', PREDICTION_CACHE='memory')
+
+import main  # noqa: E402
+import rules  # noqa: E402
+from train import FEATURE_COLUMNS  # noqa: E402
+
+DATASET = os.path.join(BASE_DIR, 'Cardiovascular_Disease_Dataset.csv')
+
+
+def dataset_rows(limit=300):
+    with open(DATASET, newline='') as f:
+        return [row for row, _ in zip(csv.DictReader(f), range(limit))]
+
+
+def rule_outputs(rows):
+    """The shared objects rules.py returns for every row, and deep copies of them"""
+    X = [[float(row[col]) for col in FEATURE_COLUMNS] for row in rows]
+    probabilities = main.models.current()[1].score(X)[1].tolist()
+    shared = [(rules.get_recommendations(p, None, x), rules.get_contributing_factors(x, None))
+              for p, x in zip(probabilities, X)]
+    shared.append(rules.evaluate_rules(X, probabilities))
+    return shared, copy.deepcopy(shared)
+
+
+def test_results_are_shared():
+    x = [65.0, 1.0, 2.0, 150.0, 250.0, 1.0, 1.0, 120.0, 1.0, 2.5, 2.0, 2.0]
+    assert rules.get_recommendations(0.8, 1, x) is rules.get_recommendations(0.8, 1, list(x))
+    assert rules.get_contributing_factors(x, 1) is rules.get_contributing_factors(list(x), 1)
+    assert all(isinstance(messages, tuple) for messages in rules.get_recommendations(0.8, 1, x).values())
+    assert isinstance(rules.get_contributing_factors(x, 1), tuple)
+
+
+def test_app_does_not_modify_results():
+    rows = dataset_rows()
+    shared, expected = rule_outputs(rows)
+    client = main.app.test_client()
+    fields = [dict(zip(main.feature_names, (row[col] for col in FEATURE_COLUMNS))) for row in rows]
+    for body in fields:
+        assert client.post('/predict', data=body).status_code == 200
+        assert client.post('/predict', json=body).status_code == 200
+    assert client.get('/report', query_string=fields[0]).status_code == 200
+    for attribution in ('', '1'):
+        response = client.post(f'/predict/batch?attribution={attribution}', json=fields)
+        assert response.status_code == 200
+    assert shared == expected
+    # And the objects served now are the ones checked above
+    assert rule_outputs(rows)[1] == expected
@@ -0,0 +1,273 @@
+"""Cross-validated hyperparameter search for the heart disease model.
+
+Replaces the notebook's single train_test_split(random_state=2) and
+hard-coded learning_rate=0.01, max_iter=1000, lambda_=0.01. Every point
+of a grid is scored by stratified k-fold cross-validation (validation log
+loss, accuracy and ROC AUC, each fold standardized with its own training
+rows), and the winner is retrained on all rows and written as a serving
+.npz artifact.
+
+The folds are fitted in a process pool. The data matrix is copied once
+into a shared memory block that the workers map, so no task pickles it.
+Grid points are grouped into warm-start chains that run in one task:
+
+- gd (the notebook's full-batch gradient descent): for each fold,
+  learning_rate and lambda_, the max_iter values run in increasing order,
+  each continuing from the previous one's weights. Only the extra
+  iterations are computed, and the weights are exactly those of a run from
+  zeros.
+- newton: for each fold the lambda_ values run in increasing order, each
+  starting from the previous solution (learning_rate and max_iter do not
+  apply).
+
+The search runs once, with --workers processes. The report gives its wall
+time and parallel efficiency: the fit time summed over tasks divided by
+workers x wall time. --scaling 1 2 4 ... also reruns it at each listed
+worker count and tabulates wall time, speedup and efficiency. That costs a
+full search per count, so it is opt-in.
+
+Usage: python tune.py [--solver gd] [--folds 5] [--learning-rate 0.01 0.1 1] [--max-iter 250 1000 4000]
+                      [--lambda 0 0.01 1 10] [--workers 4] [--output heart_disease_model_tuned.npz]
+"""
+import argparse
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from model import export_npz, load_model
+from train import fit_gd, fit_newton, fit_scaler, load_training_data, sigmoid, train
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# The notebook's settings, always part of the grid so the report can compare against them
+NOTEBOOK = {'learning_rate': 0.01, 'max_iter': 1000, 'lambda_': 0.01}
+
+# Lower is better for log_loss, higher for the others
+METRICS = ('log_loss', 'accuracy', 'auc')
+
+# Set in each pool worker by _attach: read-only views of the shared block
+_shared = None
+_data = None
+# The standardized split of the fold a worker last used; tasks are submitted fold by fold
+_fold_cache = None
+
+
+def stratified_folds(y, k, seed):
+    """Assign each row to one of k folds, keeping the class balance in every fold"""
+    rng = np.random.default_rng(seed)
+    folds = np.empty(len(y), dtype=np.int64)
+    for label in np.unique(y):
+        idx = rng.permutation(np.flatnonzero(y == label))
+        folds[idx] = np.arange(len(idx)) % k
+    return folds
+
+
+def _attach(name, shape):
+    global _shared, _data, _fold_cache
+    _shared = shared_memory.SharedMemory(name=name)
+    block = np.ndarray(shape, dtype=np.float64, buffer=_shared.buf)
+    # Columns: the features, then the target, then the fold number
+    _data = block[:, :-2], block[:, -2], block[:, -1]
+    _fold_cache = None
+
+
+def _fold_data(fold):
+    """(X_train, y_train, X_val, y_val) for one fold, standardized with its training rows"""
+    global _fold_cache
+    if _fold_cache is None or _fold_cache[0] != fold:
+        X, y, folds = _data
+        train_rows = folds != fold
+        scaler = fit_scaler(X[train_rows])
+        _fold_cache = (fold, scaler.transform(X[train_rows]), y[train_rows],
+                       scaler.transform(X[~train_rows]), y[~train_rows])
+    return _fold_cache[1:]
+
+
+def roc_auc(y, scores):
+    """Area under the ROC curve from the rank-sum statistic (ties get average ranks)"""
+    order = np.argsort(scores, kind='mergesort')
+    ranks = np.empty(len(scores))
+    sorted_scores = scores[order]
+    # Average the ranks of tied scores
+    _, first, counts = np.unique(sorted_scores, return_index=True, return_counts=True)
+    ranks[order] = np.repeat(first + (counts + 1) / 2, counts)
+    positives = y == 1
+    n_pos, n_neg = positives.sum(), (~positives).sum()
+    if n_pos == 0 or n_neg == 0:
+        return float('nan')
+    return float((ranks[positives].sum() - n_pos * (n_pos + 1) / 2) / (n_pos * n_neg))
+
+
+def evaluate(weights, bias, X, y):
+    p = sigmoid(X @ weights + bias)
+    clipped = np.clip(p, 1e-10, 1 - 1e-10)
+    return {
+        'log_loss': float(-np.mean(y * np.log(clipped) + (1 - y) * np.log(1 - clipped))),
+        'accuracy': float(np.mean((p > 0.5) == y)),
+        'auc': roc_auc(y, p),
+    }
+
+
+def run_chain(solver, fold, chain):
+    """Fit the grid points of one warm-start chain on one fold.
+
+    Returns [(params, fold, scores, CPU seconds, iterations)], where iterations
+    counts only the ones this point ran itself.
+    """
+    X_train, y_train, X_val, y_val = _fold_data(fold)
+    results = []
+    init = None
+    done = 0
+    for params in chain:
+        start = time.process_time()
+        if solver == 'gd':
+            # Continue the previous point of the chain: only the extra iterations are needed
+            weights, bias, iterations = fit_gd(X_train, y_train, params['lambda_'], params['learning_rate'],
+                                               params['max_iter'] - done, init)
+            done = params['max_iter']
+        else:
+            weights, bias, iterations = fit_newton(X_train, y_train, params['lambda_'], init=init)
+        init = (weights, bias)
+        results.append((params, fold, evaluate(weights, bias, X_val, y_val), time.process_time() - start, iterations))
+    return results
+
+
+def make_chains(solver, grid, warm_start):
+    """Split the grid into chains, each run in one task from one starting point"""
+    if solver == 'gd':
+        groups = [[{'learning_rate': lr, 'max_iter': max_iter, 'lambda_': lambda_}
+                   for max_iter in sorted(grid['max_iter'])]
+                  for lr, lambda_ in itertools.product(grid['learning_rate'], grid['lambda_'])]
+    else:
+        groups = [[{'lambda_': lambda_} for lambda_ in sorted(grid['lambda_'])]]
+    if not warm_start:
+        return [[params] for group in groups for params in group]
+    return groups
+
+
+def search(X, y, folds, solver, grid, workers, warm_start=True):
+    """Cross-validate every grid point; return (results, wall seconds)"""
+    chains = make_chains(solver, grid, warm_start)
+    n_folds = int(folds.max()) + 1
+    block = np.column_stack([X, y, folds]).astype(np.float64)
+    shared = shared_memory.SharedMemory(create=True, size=block.nbytes)
+    try:
+        np.ndarray(block.shape, dtype=np.float64, buffer=shared.buf)[:] = block
+        start = time.perf_counter()
+        with ProcessPoolExecutor(workers, initializer=_attach, initargs=(shared.name, block.shape)) as pool:
+            # Fold by fold, so a worker mostly reuses the split it standardized last
+            futures = [pool.submit(run_chain, solver, fold, chain) for fold in range(n_folds) for chain in chains]
+            results = [result for future in futures for result in future.result()]
+        return results, time.perf_counter() - start
+    finally:
+        shared.close()
+        shared.unlink()
+
+
+def summarize(results, metric):
+    """Mean and standard deviation of every metric per grid point, best first"""
+    by_point = {}
+    for params, fold, scores, seconds, iterations in results:
+        key = tuple(sorted(params.items()))
+        by_point.setdefault(key, []).append(scores)
+    rows = []
+    for key, fold_scores in by_point.items():
+        row = {'params': dict(key), 'folds': len(fold_scores)}
+        for name in METRICS:
+            values = np.array([scores[name] for scores in fold_scores])
+            row[name] = float(values.mean())
+            row[f'{name}_std'] = float(values.std())
+        rows.append(row)
+    sign = 1 if metric == 'log_loss' else -1
+    return sorted(rows, key=lambda row: sign * row[metric])
+
+
+def format_params(params):
+    return ' '.join(f"{name}={value:g}" for name, value in params.items())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cross-validated hyperparameter search; writes the best model")
+    parser.add_argument('--data', default=os.path.join(BASE_DIR, 'Cardiovascular_Disease_Dataset.csv'))
+    parser.add_argument('--output', default=os.path.join(BASE_DIR, 'heart_disease_model_tuned.npz'))
+    parser.add_argument('--solver', choices=('gd', 'newton'), default='gd')
+    parser.add_argument('--learning-rate', nargs='+', type=float, default=[0.01, 0.03, 0.1, 0.3, 1.0])
+    parser.add_argument('--max-iter', nargs='+', type=int, default=[250, 500, 1000, 2000, 4000])
+    parser.add_argument('--lambda', dest='lambda_', nargs='+', type=float, default=[0.0, 0.01, 0.1, 1.0, 10.0])
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--metric', choices=METRICS, default='log_loss', help="validation metric that picks the winner")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--scaling', nargs='+', type=int, default=[],
+                        help="also time the whole search at these worker counts (one extra search each)")
+    parser.add_argument('--no-warm-start', dest='warm_start', action='store_false')
+    parser.add_argument('--seed', type=int, default=2)
+    parser.add_argument('--top', type=int, default=10, help="grid points to list in the report")
+    args = parser.parse_args()
+
+    X, y = load_training_data(args.data)
+    folds = stratified_folds(y, args.folds, args.seed)
+    grid = {'learning_rate': args.learning_rate, 'max_iter': args.max_iter, 'lambda_': args.lambda_}
+    if args.solver == 'gd':
+        for name, value in NOTEBOOK.items():
+            if value not in grid[name]:
+                grid[name] = grid[name] + [value]
+    n_points = len(make_chains(args.solver, grid, False))
+    print(f"{len(y)} rows, {args.folds}-fold CV, solver {args.solver}, {n_points} grid points "
+          f"({n_points * args.folds} fits), warm starts {'on' if args.warm_start else 'off'}")
+
+    results, wall = search(X, y, folds, args.solver, grid, args.workers, args.warm_start)
+    timings = {args.workers: wall}
+    # The results do not depend on the worker count; only the timing is kept
+    for workers in sorted(set(args.scaling) - {args.workers}):
+        timings[workers] = search(X, y, folds, args.solver, grid, workers, args.warm_start)[1]
+
+    table = summarize(results, args.metric)
+    fit_seconds = sum(result[3] for result in results)
+    print(f"\nTop {min(args.top, len(table))} by validation {args.metric} (mean ± std over folds):")
+    print(f"  {'params':46s} {'log loss':>17s} {'accuracy':>17s} {'auc':>17s}")
+    for row in table[:args.top]:
+        print(f"  {format_params(row['params']):46s}" + ''.join(
+            f" {row[name]:8.4f} ± {row[f'{name}_std']:6.4f}" for name in METRICS))
+    if args.solver == 'gd':
+        notebook = next(row for row in table if row['params'] == NOTEBOOK)
+        rank = table.index(notebook) + 1
+        print(f"  notebook settings ({format_params(NOTEBOOK)}): rank {rank} of {len(table)}, "
+              f"log loss {notebook['log_loss']:.4f}, accuracy {notebook['accuracy']:.4f}, auc {notebook['auc']:.4f}")
+
+    if args.solver == 'gd':
+        # What the same search costs when every point starts from zeros
+        cold = sum(params['max_iter'] for params, *_ in results)
+        ran = sum(result[4] for result in results)
+        print(f"\nGradient-descent iterations run: {ran:,}; {cold:,} if every point started from zeros "
+              f"({cold / ran:.1f}x)")
+    print(f"Search: {wall:.2f} s wall with {args.workers} workers ({os.cpu_count()} CPUs available); "
+          f"fit CPU time summed over tasks {fit_seconds:.2f} s, "
+          f"parallel efficiency {fit_seconds / (args.workers * wall):.0%}")
+    if len(timings) > 1:
+        # Relative to the fewest workers timed, assumed to scale perfectly up to there
+        print("\nScaling:")
+        print(f"  {'workers':>7s} {'wall s':>8s} {'speedup':>8s} {'efficiency':>10s}")
+        base = timings[min(timings)] * min(timings)
+        for workers, seconds in sorted(timings.items()):
+            speedup = base / seconds
+            print(f"  {workers:7d} {seconds:8.2f} {speedup:7.2f}x {speedup / workers:9.0%}")
+
+    best = table[0]['params']
+    start = time.perf_counter()
+    options = {k: v for k, v in best.items() if k != 'lambda_'}
+    model = train(X, y, args.solver, best['lambda_'], **options)
+    export_npz(model, args.output)
+    # The written artifact must score exactly like the trained model
+    if not np.array_equal(load_model(args.output).score(X)[1], model.score(X)[1]):
+        raise SystemExit("Written artifact does not reproduce the trained model's scores")
+    print(f"\nBest: {format_params(best)}; retrained on all {len(y)} rows in {time.perf_counter() - start:.3f} s "
+          f"-> {args.output}")
+    print(f"Publish it with: python registry.py publish {args.output} --version <name> [--activate]")
+
+
+if __name__ == '__main__':
+    main()